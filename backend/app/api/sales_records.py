@@ -0,0 +1,69 @@
+from datetime import date
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session
+
+from app.core.config import get_settings
+from app.db.session import get_db
+from app.schemas.sales_record_schema import SalesRecordPage
+from app.services.sales_record_service import (
+    SalesRecordFilter,
+    list_sales_records,
+    resolve_fields,
+    sales_record_cache,
+)
+
+settings = get_settings()
+router = APIRouter(prefix="/sales-records", tags=["sales-records"])
+
+
+@router.get("", response_model=SalesRecordPage)
+def get_sales_records(
+    group_id: str | None = None,
+    record_date_from: date | None = None,
+    record_date_to: date | None = None,
+    vin_no: str | None = None,
+    invoice_no: str | None = None,
+    after_date: date | None = None,
+    after_id: int | None = Query(None, ge=0),
+    limit: int = Query(100, ge=1, le=settings.max_sales_record_page_size),
+    fields: str | None = Query(
+        None,
+        description=(
+            "Comma-separated columns to return. Defaults to the summary columns "
+            "covered by the listing indexes."
+        ),
+    ),
+    db: Session = Depends(get_db),
+) -> SalesRecordPage:
+    if (after_date is None) != (after_id is None):
+        raise HTTPException(
+            status_code=400, detail="after_date and after_id must be given together."
+        )
+    try:
+        columns = resolve_fields(
+            [name.strip() for name in fields.split(",") if name.strip()] if fields else None
+        )
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+    filters = SalesRecordFilter(
+        group_id=group_id,
+        record_date_from=record_date_from,
+        record_date_to=record_date_to,
+        vin_no=vin_no,
+        invoice_no=invoice_no,
+    )
+    after = (after_date, after_id) if after_date is not None else None
+    key = (filters, tuple(columns), after, limit)
+    page = sales_record_cache.get(key)
+    if page is None:
+        generation = sales_record_cache.generation
+        rows = list_sales_records(db, filters, columns, limit, after=after)
+        last = rows[-1] if len(rows) == limit else None
+        page = SalesRecordPage(
+            items=rows,
+            next_after_date=last["record_date"] if last else None,
+            next_after_id=last["id"] if last else None,
+        )
+        sales_record_cache.put(key, page, generation)
+    return page
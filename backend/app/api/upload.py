@@ -1,29 +1,86 @@
+import asyncio
+import csv
+import io
+import json
+import time
+from collections.abc import AsyncIterator, Iterator
+from contextlib import closing
+from enum import Enum
 from pathlib import Path
 from uuid import uuid4
 
-from fastapi import APIRouter, Depends, File, HTTPException, Request, UploadFile, status
+from fastapi import (
+    APIRouter,
+    Depends,
+    File,
+    Form,
+    HTTPException,
+    Query,
+    Request,
+    Response,
+    UploadFile,
+    status,
+)
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from sqlalchemy import text
 from sqlalchemy.orm import Session
 
 from app.core.config import get_settings
-from app.db.models import ImportError, ImportJob
-from app.db.session import get_db
-from app.schemas.import_schema import ImportErrorItem, ImportJobResponse, ImportResult
+from app.db.models import ImportJob
+from app.db.session import SessionLocal, get_db, pool_stats
+from app.schemas.import_schema import (
+    ImportErrorItem,
+    ImportErrorPage,
+    ImportErrorSummaryItem,
+    ImportJobResponse,
+    MappingPlanResponse,
+    PoolStatsResponse,
+    UploadSessionCreate,
+    UploadSessionResponse,
+)
 from app.services.excel_service import (
-    parse_excel_bytes,
-    validate_and_transform_rows,
-    validate_required_columns,
+    DELIMITED_FORMATS,
+    compile_mapping_plan,
+    file_extension,
+    iter_raw_chunks,
+    open_upload_source,
 )
 from app.services.import_service import (
     create_job,
-    finalize_job,
-    save_validation_errors,
-    set_job_failed,
-    upsert_sales_records,
+    expire_failed_job_sources,
+    find_finished_job,
+    get_error_summaries,
+    get_import_errors_page,
+    iter_import_errors,
+    queue_job_resume,
 )
+from app.services.job_runner import submit_import_job
+from app.services.upload_service import (
+    UploadChunkWriter,
+    UploadSession,
+    UploadSessionError,
+    UploadTooLargeError,
+    assemble_upload,
+    claim_upload_completion,
+    create_upload_session,
+    finish_upload_session,
+    load_upload_session,
+    purge_upload_sessions,
+    release_upload_completion,
+    spool_upload,
+)
+from app.services.progress import ProgressEvent, Subscription, progress_broker
 
 router = APIRouter(prefix="/imports", tags=["imports"])
 settings = get_settings()
+SSE_KEEPALIVE_SECONDS = 15
+EXPORT_BATCH_SIZE = 1000
+
+
+class ErrorExportFormat(str, Enum):
+    ndjson = "ndjson"
+    csv = "csv"
 
 
 @router.get("/health")
@@ -32,101 +89,451 @@ def health(db: Session = Depends(get_db)) -> dict[str, str]:
     return {"status": "ok"}
 
 
-@router.post("/upload", response_model=ImportResult, status_code=status.HTTP_201_CREATED)
-async def upload_excel(
-    request: Request, file: UploadFile = File(...), db: Session = Depends(get_db)
-) -> ImportResult:
-    ext = Path(file.filename or "").suffix.lower()
+@router.get("/pool", response_model=PoolStatsResponse)
+def get_pool_stats() -> PoolStatsResponse:
+    return PoolStatsResponse.model_validate(pool_stats())
+
+
+def _checked_extension(filename: str | None) -> str:
+    ext = file_extension(filename or "")
     if ext not in settings.allowed_extensions:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=f"File extension {ext or 'unknown'} is not allowed.",
         )
+    return ext
 
-    raw_bytes = await file.read()
-    max_size = settings.max_upload_size_mb * 1024 * 1024
-    if len(raw_bytes) > max_size:
+
+def _checked_sheets(sheets: list[str] | None, ext: str) -> list[str] | None:
+    sheets = [name.strip() for name in sheets or [] if name.strip()] or None
+    if sheets and ext in DELIMITED_FORMATS:
         raise HTTPException(
-            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
-            detail=f"File is too large. Max size is {settings.max_upload_size_mb} MB.",
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Sheet selection only applies to Excel workbooks.",
+        )
+    return sheets
+
+
+def _too_large() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        detail=f"File is too large. Max size is {settings.max_upload_size_mb} MB.",
+    )
+
+
+def _spool(file: UploadFile, ext: str) -> tuple[Path, str]:
+    try:
+        path, _, content_hash = spool_upload(
+            file.file,
+            settings.upload_dir,
+            suffix=ext,
+            max_bytes=settings.max_upload_size_mb * 1024 * 1024,
+            chunk_size=settings.upload_chunk_size,
         )
+    except UploadTooLargeError as exc:
+        raise _too_large() from exc
+    return path, content_hash
+
+
+def _queue_import(
+    request: Request,
+    response: Response,
+    db: Session,
+    path: Path,
+    content_hash: str,
+    filename: str,
+    sheets: list[str] | None,
+    force: bool,
+    upload_read_seconds: float,
+) -> ImportJob:
+    # A file identical to an earlier finished import returns that job (200)
+    # instead of importing it again.
+    previous = None if force else find_finished_job(db, content_hash, sheets)
+    if previous is not None:
+        path.unlink(missing_ok=True)
+        response.status_code = status.HTTP_200_OK
+        return previous
 
     correlation_id = getattr(request.state, "correlation_id", str(uuid4()))
-    job = create_job(db=db, filename=file.filename or "unknown.xlsx", correlation_id=correlation_id)
+    try:
+        # Sources kept for resuming old failed jobs are swept as new jobs arrive.
+        expire_failed_job_sources(db, settings.failed_job_source_ttl_hours * 3600)
+        job = create_job(
+            db=db,
+            filename=filename,
+            correlation_id=correlation_id,
+            status="queued",
+            stats={"stages": {"upload_read": round(upload_read_seconds, 4)}},
+            source_path=str(path),
+            source_sheets=sheets,
+            content_hash=content_hash,
+            instance_id=settings.instance_id,
+        )
+    except Exception:
+        path.unlink(missing_ok=True)
+        raise
+
+    submit_import_job(SessionLocal, job.id, path, sheets)
+    return job
+
+
+@router.post("/upload", response_model=ImportJobResponse, status_code=status.HTTP_202_ACCEPTED)
+def upload_excel(
+    request: Request,
+    response: Response,
+    file: UploadFile = File(...),
+    sheets: list[str] | None = Form(
+        None, description='Sheet names to import, or "*" for every sheet. Defaults to the first.'
+    ),
+    force: bool = Query(False, description="Import again even if this file was already imported."),
+    db: Session = Depends(get_db),
+) -> ImportJobResponse:
+    # Runs in FastAPI's threadpool; parsing and writing happen on the import
+    # worker pool, so the request returns as soon as the file is stored.
+    ext = _checked_extension(file.filename)
+    sheets = _checked_sheets(sheets, ext)
+
+    started = time.perf_counter()
+    path, content_hash = _spool(file, ext)
+    upload_read_seconds = time.perf_counter() - started
+
+    job = _queue_import(
+        request,
+        response,
+        db,
+        path,
+        content_hash,
+        file.filename or "unknown.xlsx",
+        sheets,
+        force,
+        upload_read_seconds,
+    )
+    return ImportJobResponse.model_validate(job)
+
+
+def _load_session(upload_id: str) -> UploadSession:
+    session = load_upload_session(settings.upload_session_dir, upload_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail=f"Upload {upload_id} not found.")
+    return session
+
+
+def _session_response(session: UploadSession) -> UploadSessionResponse:
+    return UploadSessionResponse(
+        upload_id=session.upload_id,
+        filename=session.filename,
+        size=session.size,
+        chunk_size=session.chunk_size,
+        total_chunks=session.total_chunks,
+        received=session.received(),
+        job_id=session.job_id,
+    )
+
+
+@router.post(
+    "/uploads", response_model=UploadSessionResponse, status_code=status.HTTP_201_CREATED
+)
+def start_upload_session(payload: UploadSessionCreate) -> UploadSessionResponse:
+    # Chunked alternative to /upload for slow links: PUT each chunk (retrying
+    # only failed ones), check progress with GET, then POST complete.
+    ext = _checked_extension(payload.filename)
+    sheets = _checked_sheets(payload.sheets, ext)
+    if payload.size > settings.max_upload_size_mb * 1024 * 1024:
+        raise _too_large()
+    # Abandoned sessions are swept here as well as at startup, so they cannot
+    # pile up in a long-running process.
+    purge_upload_sessions(settings.upload_session_dir, settings.upload_session_ttl_hours * 3600)
+    session = create_upload_session(
+        settings.upload_session_dir,
+        payload.filename,
+        payload.size,
+        settings.upload_session_chunk_size,
+        sheets,
+    )
+    return _session_response(session)
+
 
+@router.get("/uploads/{upload_id}", response_model=UploadSessionResponse)
+def get_upload_session(upload_id: str) -> UploadSessionResponse:
+    return _session_response(_load_session(upload_id))
+
+
+@router.put("/uploads/{upload_id}/chunks/{index}", response_model=UploadSessionResponse)
+async def put_upload_chunk(upload_id: str, index: int, request: Request) -> UploadSessionResponse:
+    session = await run_in_threadpool(_load_session, upload_id)
+    if session.job_id is not None:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT, detail=f"Upload {upload_id} is complete."
+        )
+    if int(request.headers.get("content-length") or 0) > session.chunk_size:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Chunks are at most {session.chunk_size} bytes.",
+        )
+    # Written as it arrives, so a body without Content-Length (chunked transfer
+    # encoding) is cut off as soon as it outgrows the chunk.
     try:
-        frame = parse_excel_bytes(raw_bytes)
+        writer = await run_in_threadpool(UploadChunkWriter, session, index)
+    except UploadSessionError as exc:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc)) from exc
+    try:
+        async for data in request.stream():
+            await run_in_threadpool(writer.write, data)
+        await run_in_threadpool(writer.commit)
+    except UploadSessionError as exc:
+        await run_in_threadpool(writer.discard)
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc)) from exc
+    except BaseException:
+        await run_in_threadpool(writer.discard)
+        raise
+    return await run_in_threadpool(_session_response, session)
+
+
+@router.post(
+    "/uploads/{upload_id}/complete",
+    response_model=ImportJobResponse,
+    status_code=status.HTTP_202_ACCEPTED,
+)
+def complete_upload_session(
+    upload_id: str,
+    request: Request,
+    response: Response,
+    force: bool = Query(False, description="Import again even if this file was already imported."),
+    db: Session = Depends(get_db),
+) -> ImportJobResponse:
+    session = _load_session(upload_id)
+    if session.job_id is not None:
+        # A repeated complete (e.g. after a lost response) returns the same job.
+        job = db.get(ImportJob, session.job_id)
+        if job:
+            response.status_code = status.HTTP_200_OK
+            return ImportJobResponse.model_validate(job)
+    if not claim_upload_completion(session):
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Upload {upload_id} is already being completed.",
+        )
+
+    ext = file_extension(session.filename)
+    started = time.perf_counter()
+    try:
+        try:
+            path, _, content_hash = assemble_upload(
+                session,
+                settings.upload_dir,
+                suffix=ext,
+                max_bytes=settings.max_upload_size_mb * 1024 * 1024,
+                chunk_size=settings.upload_chunk_size,
+            )
+        except UploadSessionError as exc:
+            raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(exc)) from exc
+        except UploadTooLargeError as exc:
+            raise _too_large() from exc
+        upload_read_seconds = time.perf_counter() - started
+
+        job = _queue_import(
+            request,
+            response,
+            db,
+            path,
+            content_hash,
+            session.filename,
+            session.sheets,
+            force,
+            upload_read_seconds,
+        )
+    except BaseException:
+        release_upload_completion(session)
+        raise
+    finish_upload_session(session, job.id)
+    return ImportJobResponse.model_validate(job)
+
+
+@router.post("/mapping-plan", response_model=MappingPlanResponse)
+def preview_mapping_plan(file: UploadFile = File(...)) -> MappingPlanResponse:
+    # Reads only the header of the uploaded file and reports how its columns
+    # would be mapped, without creating a job.
+    ext = _checked_extension(file.filename)
+    path, _ = _spool(file, ext)
+    try:
+        with open_upload_source(path) as source, closing(
+            iter_raw_chunks(source, ext, chunk_size=1)
+        ) as chunks:
+            header = next(chunks)
     except Exception as exc:  # noqa: BLE001
-        set_job_failed(db, job, f"Failed to parse excel file: {exc}")
-        raise HTTPException(status_code=400, detail="Invalid Excel file.") from exc
-
-    missing_columns = validate_required_columns(frame)
-    if missing_columns:
-        msg = f"Missing required columns: {', '.join(missing_columns)}"
-        set_job_failed(db, job, msg)
-        return ImportResult(
-            job_id=job.id,
-            status=job.status,
-            filename=job.filename,
-            total_rows=0,
-            imported_rows=0,
-            failed_rows=0,
-            message=msg,
-            errors=[],
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail=f"Failed to read header: {exc}"
+        ) from exc
+    finally:
+        path.unlink(missing_ok=True)
+    plan = compile_mapping_plan(tuple(header.columns))
+    return MappingPlanResponse.model_validate(plan.as_dict())
+
+
+@router.get("/{job_id}", response_model=ImportJobResponse)
+def get_import_job(job_id: int, db: Session = Depends(get_db)) -> ImportJobResponse:
+    job = db.get(ImportJob, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found.")
+    return ImportJobResponse.model_validate(job)
+
+
+@router.post(
+    "/{job_id}/resume", response_model=ImportJobResponse, status_code=status.HTTP_202_ACCEPTED
+)
+def resume_import_job(job_id: int, db: Session = Depends(get_db)) -> ImportJobResponse:
+    # Continues a failed job from its last committed checkpoint, using the
+    # upload kept on disk when it failed.
+    job = db.get(ImportJob, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found.")
+    if job.status != "failed":
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Job {job_id} is {job.status}; only failed jobs can be resumed.",
         )
+    if not job.source_path or not Path(job.source_path).exists():
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"The upload for job {job_id} is no longer available.",
+        )
+    resumed = queue_job_resume(db, job, settings.instance_id)
+    if resumed is None:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Job {job_id} is already being resumed.",
+        )
+    job = resumed
+    submit_import_job(SessionLocal, job.id, Path(job.source_path), job.source_sheets)
+    return ImportJobResponse.model_validate(job)
 
-    valid_rows, validation_errors = validate_and_transform_rows(frame)
-    save_validation_errors(db, job.id, validation_errors)
-    imported_rows = upsert_sales_records(db, valid_rows) if valid_rows else 0
-    total_rows = len(frame)
-    failed_rows = len({item.row_number for item in validation_errors})
-    updated = finalize_job(
-        db,
-        job,
-        total_rows=total_rows,
-        imported_rows=imported_rows,
-        failed_rows=failed_rows,
-        message="Import finished",
+
+def _load_job_event(job_id: int) -> ProgressEvent | None:
+    with SessionLocal() as db:
+        job = db.get(ImportJob, job_id)
+        return ProgressEvent.from_job(job) if job else None
+
+
+def _format_sse(event: ProgressEvent) -> str:
+    return f"event: progress\ndata: {json.dumps(event.as_dict())}\n\n"
+
+
+async def _progress_stream(
+    subscription: Subscription, initial: ProgressEvent
+) -> AsyncIterator[str]:
+    try:
+        event = initial
+        if not event.done:
+            event = progress_broker.latest(subscription.job_id) or initial
+        yield _format_sse(event)
+        while not event.done:
+            try:
+                event = await asyncio.wait_for(subscription.get(), SSE_KEEPALIVE_SECONDS)
+            except asyncio.TimeoutError:
+                yield ": keep-alive\n\n"
+                continue
+            yield _format_sse(event)
+    finally:
+        subscription.close()
+
+
+@router.get("/{job_id}/events")
+async def stream_import_events(job_id: int) -> StreamingResponse:
+    # Subscribe before reading the job so a finish published in between is not lost.
+    subscription = progress_broker.subscribe(job_id)
+    initial = await run_in_threadpool(_load_job_event, job_id)
+    if initial is None:
+        subscription.close()
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found.")
+    return StreamingResponse(
+        _progress_stream(subscription, initial),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
     )
 
-    return ImportResult(
-        job_id=updated.id,
-        status=updated.status,
-        filename=updated.filename,
-        total_rows=updated.total_rows,
-        imported_rows=updated.imported_rows,
-        failed_rows=updated.failed_rows,
-        message=updated.message,
-        errors=[
+
+@router.get("/{job_id}/errors", response_model=ImportErrorPage)
+def get_import_errors(
+    job_id: int,
+    after_id: int = Query(0, ge=0),
+    limit: int = Query(500, ge=1, le=settings.max_error_page_size),
+    db: Session = Depends(get_db),
+) -> ImportErrorPage:
+    job = db.get(ImportJob, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found.")
+    rows = get_import_errors_page(db, job_id, after_id=after_id, limit=limit)
+    return ImportErrorPage(
+        items=[
             ImportErrorItem(
+                id=item.id,
+                sheet_name=item.sheet_name,
                 row_number=item.row_number,
                 column_name=item.column_name,
                 error_message=item.error_message,
             )
-            for item in validation_errors
+            for item in rows
         ],
+        next_after_id=rows[-1].id if len(rows) == limit else None,
     )
 
 
-@router.get("/{job_id}", response_model=ImportJobResponse)
-def get_import_job(job_id: int, db: Session = Depends(get_db)) -> ImportJobResponse:
+@router.get("/{job_id}/errors/summary", response_model=list[ImportErrorSummaryItem])
+def get_import_error_summary(
+    job_id: int, db: Session = Depends(get_db)
+) -> list[ImportErrorSummaryItem]:
+    # Exact counts per column and message pattern, including errors beyond the
+    # stored details.
     job = db.get(ImportJob, job_id)
     if not job:
         raise HTTPException(status_code=404, detail=f"Job {job_id} not found.")
-    return ImportJobResponse.model_validate(job)
+    return [ImportErrorSummaryItem.model_validate(item) for item in get_error_summaries(db, job_id)]
+
 
+def _export_errors(job_id: int, export_format: ErrorExportFormat) -> Iterator[str]:
+    # Uses its own session: the response body is produced after the request's
+    # dependencies have been torn down.
+    with SessionLocal() as db:
+        if export_format is ErrorExportFormat.csv:
+            buffer = io.StringIO()
+            buffer.write("\ufeff")  # lets Excel detect UTF-8 for Thai text
+            writer = csv.writer(buffer)
+            writer.writerow(["id", "sheet_name", "row_number", "column_name", "error_message"])
+            for row in iter_import_errors(db, job_id, batch_size=EXPORT_BATCH_SIZE):
+                writer.writerow(row)
+                if buffer.tell() >= 64 * 1024:
+                    yield buffer.getvalue()
+                    buffer.seek(0)
+                    buffer.truncate()
+            yield buffer.getvalue()
+            return
+        for error_id, sheet_name, row_number, column_name, error_message in iter_import_errors(
+            db, job_id, batch_size=EXPORT_BATCH_SIZE
+        ):
+            item = {
+                "id": error_id,
+                "sheet_name": sheet_name,
+                "row_number": row_number,
+                "column_name": column_name,
+                "error_message": error_message,
+            }
+            yield json.dumps(item, ensure_ascii=False) + "\n"
 
-@router.get("/{job_id}/errors", response_model=list[ImportErrorItem])
-def get_import_errors(job_id: int, db: Session = Depends(get_db)) -> list[ImportErrorItem]:
+
+@router.get("/{job_id}/errors/export")
+def export_import_errors(
+    job_id: int,
+    format: ErrorExportFormat = Query(ErrorExportFormat.ndjson),
+    db: Session = Depends(get_db),
+) -> StreamingResponse:
     job = db.get(ImportJob, job_id)
     if not job:
         raise HTTPException(status_code=404, detail=f"Job {job_id} not found.")
-    rows = db.query(ImportError).filter(ImportError.job_id == job_id).all()
-    return [
-        ImportErrorItem(
-            row_number=item.row_number,
-            column_name=item.column_name,
-            error_message=item.error_message,
-        )
-        for item in rows
-    ]
+    media_type = "text/csv" if format is ErrorExportFormat.csv else "application/x-ndjson"
+    return StreamingResponse(
+        _export_errors(job_id, format),
+        media_type=media_type,
+        headers={
+            "Content-Disposition": f'attachment; filename="import-{job_id}-errors.{format.value}"'
+        },
+    )
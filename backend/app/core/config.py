@@ -1,6 +1,8 @@
+import socket
+import tempfile
 from functools import lru_cache
 from pathlib import Path
-from typing import List
+from typing import List, Literal
 
 from pydantic import Field
 from pydantic_settings import BaseSettings, SettingsConfigDict
@@ -19,8 +21,57 @@ class Settings(BaseSettings):
             "?driver=ODBC+Driver+17+for+SQL+Server&TrustServerCertificate=yes"
         )
     )
+    # Connection pool (ignored for SQLite). Pre-ping checks each connection on
+    # checkout; recycle replaces connections the server may have dropped while idle.
+    db_pool_size: int = 10
+    db_max_overflow: int = 20
+    db_pool_timeout: int = 30
+    db_pool_recycle: int = 1800
+    db_pool_pre_ping: bool = True
+    db_pool_warmup: bool = True
     max_upload_size_mb: int = 20
-    allowed_extensions: List[str] = [".xlsx", ".xls"]
+    # Headroom for multipart boundaries and form fields on top of the file itself.
+    max_request_overhead_kb: int = 64
+    upload_chunk_size: int = 1024 * 1024
+    # Chunked upload sessions: size of each PUT chunk, and how long an idle
+    # session is kept before its chunks are deleted.
+    upload_session_chunk_size: int = 4 * 1024 * 1024
+    upload_session_ttl_hours: int = 24
+    # A failed job's upload is kept this long so the job can be resumed.
+    failed_job_source_ttl_hours: int = 72
+    allowed_extensions: List[str] = [".xlsx", ".xls", ".csv", ".tsv", ".csv.gz"]
+    excel_chunk_size: int = 5000
+    upsert_batch_size: int = 5000
+    # Rows written per transaction; bounds lock duration and log growth.
+    commit_batch_size: int = 5000
+    # How repeated business keys in one import are resolved before writing.
+    duplicate_key_policy: Literal["last_wins", "first_wins", "reject"] = "last_wins"
+    # Above 1, each batch is split by business_key hash and the partitions are
+    # written concurrently, each on its own pooled connection.
+    write_partitions: int = 1
+    # Per-job cap on stored error rows; every error is still counted in the
+    # per-pattern summaries.
+    max_error_details: int = 1000
+    max_error_page_size: int = 1000
+    max_sales_record_page_size: int = 1000
+    # In-process cache of GET /sales-records pages; cleared when an import
+    # commits writes, so the TTL only bounds staleness from other processes.
+    sales_record_cache_ttl_seconds: float = 30.0
+    sales_record_cache_size: int = 512
+    import_workers: int = 2
+    # Owner recorded on each job; at startup only this instance's unfinished
+    # jobs are marked failed. Keep it stable across restarts and unique per
+    # running server. Import jobs run in-process, so run one uvicorn worker per
+    # instance (scale out with more instances, each with its own id), since
+    # workers of one instance would share the id and fail each other's jobs.
+    instance_id: str = Field(default_factory=socket.gethostname)
+    sheet_workers: int = 4
+    # Validation runs in-process unless more than one worker is configured.
+    validation_workers: int = 1
+    validation_shard_size: int = 10000
+    parse_cache_size: int = 50000
+    upload_dir: Path = Path(tempfile.gettempdir()) / "excel-imports"
+    upload_session_dir: Path = Path(tempfile.gettempdir()) / "excel-imports" / "sessions"
 
     model_config = SettingsConfigDict(env_file=str(ENV_FILE), env_file_encoding="utf-8")
 
@@ -0,0 +1,172 @@
+from __future__ import annotations
+
+import threading
+import time
+from collections import defaultdict
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from typing import TypeVar
+
+# Minimal Prometheus text-format metrics; enough for a scrape endpoint without
+# pulling in a client library.
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+THROUGHPUT_BUCKETS = (100, 500, 1_000, 5_000, 10_000, 25_000, 50_000, 100_000, 250_000)
+BYTE_RATE_BUCKETS = (1e4, 1e5, 5e5, 1e6, 5e6, 1e7, 5e7, 1e8)
+
+LabelKey = tuple[tuple[str, str], ...]
+
+
+def _format_labels(labels: LabelKey, extra: dict[str, str] | None = None) -> str:
+    pairs = list(labels) + list((extra or {}).items())
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{value}"' for name, value in pairs) + "}"
+
+
+def _format_value(value: float) -> str:
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class Counter:
+    def __init__(self, name: str, documentation: str) -> None:
+        self.name = name
+        self.documentation = documentation
+        self._lock = threading.Lock()
+        self._values: dict[LabelKey, float] = defaultdict(float)
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        with self._lock:
+            self._values[tuple(sorted(labels.items()))] += amount
+
+    def value(self, **labels: str) -> float:
+        with self._lock:
+            return self._values.get(tuple(sorted(labels.items())), 0.0)
+
+    def render(self) -> Iterator[str]:
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} counter"
+        with self._lock:
+            values = dict(self._values)
+        for labels, value in values.items():
+            yield f"{self.name}{_format_labels(labels)} {_format_value(value)}"
+
+
+class Gauge:
+    def __init__(self, name: str, documentation: str, callback: Callable[[], float]) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.callback = callback
+
+    def render(self) -> Iterator[str]:
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} gauge"
+        yield f"{self.name} {_format_value(self.callback())}"
+
+
+class Histogram:
+    def __init__(self, name: str, documentation: str, buckets: tuple[float, ...]) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self._counts: dict[LabelKey, list[int]] = {}
+        self._sums: dict[LabelKey, float] = defaultdict(float)
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            counts = self._counts.setdefault(key, [0] * (len(self.buckets) + 1))
+            for position, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[position] += 1
+            counts[-1] += 1
+            self._sums[key] += value
+
+    def totals(self, **labels: str) -> tuple[int, float]:
+        # (observation count, sum) for one label set.
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            counts = self._counts.get(key)
+            return (counts[-1], self._sums[key]) if counts else (0, 0.0)
+
+    def render(self) -> Iterator[str]:
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} histogram"
+        with self._lock:
+            snapshot = {key: (list(counts), self._sums[key]) for key, counts in self._counts.items()}
+        for labels, (counts, total) in snapshot.items():
+            for bound, count in zip(self.buckets, counts):
+                le = {"le": _format_value(bound)}
+                yield f"{self.name}_bucket{_format_labels(labels, le)} {count}"
+            yield f"{self.name}_bucket{_format_labels(labels, {'le': '+Inf'})} {counts[-1]}"
+            yield f"{self.name}_sum{_format_labels(labels)} {_format_value(total)}"
+            yield f"{self.name}_count{_format_labels(labels)} {counts[-1]}"
+
+
+Metric = TypeVar("Metric", Counter, Gauge, Histogram)
+REGISTRY: list[Counter | Gauge | Histogram] = []
+
+
+def register(metric: Metric) -> Metric:
+    REGISTRY.append(metric)
+    return metric
+
+
+def render_metrics() -> str:
+    return "\n".join(line for metric in REGISTRY for line in metric.render()) + "\n"
+
+
+IMPORT_STAGE_SECONDS = register(
+    Histogram(
+        "import_stage_duration_seconds",
+        "Time spent per import job in each pipeline stage.",
+        LATENCY_BUCKETS,
+    )
+)
+IMPORT_ROWS_PER_SECOND = register(
+    Histogram("import_rows_per_second", "Rows processed per second per import job.", THROUGHPUT_BUCKETS)
+)
+IMPORT_BYTES_PER_SECOND = register(
+    Histogram("import_bytes_per_second", "Upload bytes processed per second per import job.", BYTE_RATE_BUCKETS)
+)
+IMPORT_JOBS = register(Counter("import_jobs_total", "Import jobs finished, by final status."))
+DB_POOL_CHECKOUTS = register(Counter("db_pool_checkouts_total", "Connections checked out of the pool."))
+DB_POOL_CONNECTS = register(Counter("db_pool_connects_total", "New database connections opened."))
+DB_POOL_WAIT_SECONDS = register(
+    Histogram(
+        "db_pool_checkout_wait_seconds",
+        "Time spent waiting for a pooled connection.",
+        LATENCY_BUCKETS,
+    )
+)
+
+
+class StageTimings:
+    def __init__(self, initial: dict[str, float] | None = None, reported: bool = False) -> None:
+        # `reported` marks the initial durations as already observed, e.g. by
+        # an earlier run of a resumed job; they are kept in the totals only.
+        self.durations: dict[str, float] = dict(initial or {})
+        self._unreported: dict[str, float] = {} if reported else dict(self.durations)
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            self.durations[name] = self.durations.get(name, 0.0) + elapsed
+            self._unreported[name] = self._unreported.get(name, 0.0) + elapsed
+
+    @property
+    def total(self) -> float:
+        return sum(self.durations.values())
+
+    def as_dict(self) -> dict[str, float]:
+        return {name: round(seconds, 4) for name, seconds in self.durations.items()}
+
+    def observe(self) -> None:
+        for name, seconds in self._unreported.items():
+            IMPORT_STAGE_SECONDS.observe(seconds, stage=name)
+        self._unreported.clear()
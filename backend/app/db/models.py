@@ -1,7 +1,18 @@
 from datetime import date, datetime
 from decimal import Decimal
 
-from sqlalchemy import Boolean, Date, DateTime, ForeignKey, Integer, Numeric, String, Text
+from sqlalchemy import (
+    Boolean,
+    Date,
+    DateTime,
+    ForeignKey,
+    Index,
+    Integer,
+    JSON,
+    Numeric,
+    String,
+    Text,
+)
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
 
 
@@ -9,8 +20,36 @@ class Base(DeclarativeBase):
     pass
 
 
+# Columns GET /sales-records returns by default. The listing indexes include
+# them, so a default page is read from the index without key lookups.
+SALES_RECORD_LIST_FIELDS = [
+    "id",
+    "record_date",
+    "business_key",
+    "name",
+    "amount",
+    "invoice_no",
+    "vin_no",
+    "total_value",
+    "group_id",
+]
+
+
+def _listing_index(name: str, *keys: str) -> Index:
+    included = [field for field in SALES_RECORD_LIST_FIELDS if field not in keys]
+    return Index(name, *keys, mssql_include=included)
+
+
 class SalesRecord(Base):
     __tablename__ = "sales_records"
+    __table_args__ = (
+        _listing_index("IX_sales_records_record_date_id", "record_date", "id"),
+        _listing_index("IX_sales_records_group_id_record_date", "group_id", "record_date", "id"),
+        _listing_index("IX_sales_records_vin_no_record_date", "vin_no", "record_date", "id"),
+        _listing_index(
+            "IX_sales_records_invoice_no_record_date", "invoice_no", "record_date", "id"
+        ),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
     business_key: Mapped[str] = mapped_column(String(100), unique=True, index=True)
@@ -36,7 +75,8 @@ class SalesRecord(Base):
     com_value: Mapped[Decimal | None] = mapped_column(Numeric(18, 2), nullable=True)
     rule_applied: Mapped[str | None] = mapped_column(String(100), nullable=True)
     is_duplicate_tank: Mapped[bool | None] = mapped_column(Boolean, nullable=True)
-    group_id: Mapped[str | None] = mapped_column(String(150), nullable=True, index=True)
+    group_id: Mapped[str | None] = mapped_column(String(150), nullable=True)
+    content_hash: Mapped[str | None] = mapped_column(String(32), nullable=True)
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
     updated_at: Mapped[datetime] = mapped_column(
         DateTime, default=datetime.utcnow, onupdate=datetime.utcnow
@@ -49,11 +89,26 @@ class ImportJob(Base):
     id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
     correlation_id: Mapped[str] = mapped_column(String(64), index=True)
     filename: Mapped[str] = mapped_column(String(255))
+    # SHA-256 of the uploaded file; finds an earlier import of identical content.
+    content_hash: Mapped[str | None] = mapped_column(String(64), nullable=True, index=True)
     status: Mapped[str] = mapped_column(String(20), index=True)
+    # Server instance that runs the job (settings.instance_id).
+    instance_id: Mapped[str | None] = mapped_column(String(100), nullable=True)
     total_rows: Mapped[int] = mapped_column(default=0)
     imported_rows: Mapped[int] = mapped_column(default=0)
+    inserted_rows: Mapped[int] = mapped_column(default=0)
+    updated_rows: Mapped[int] = mapped_column(default=0)
+    unchanged_rows: Mapped[int] = mapped_column(default=0)
+    duplicate_rows: Mapped[int] = mapped_column(default=0)
     failed_rows: Mapped[int] = mapped_column(default=0)
+    error_count: Mapped[int] = mapped_column(default=0)
+    # Last committed sheet row for single-sheet imports; committed valid rows
+    # for multi-sheet imports, whose sheets are written as one stream.
+    checkpoint_row: Mapped[int] = mapped_column(default=0)
+    source_path: Mapped[str | None] = mapped_column(String(500), nullable=True)
+    source_sheets: Mapped[list | None] = mapped_column(JSON, nullable=True)
     message: Mapped[str | None] = mapped_column(Text, nullable=True)
+    stats: Mapped[dict | None] = mapped_column(JSON, nullable=True)
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
     updated_at: Mapped[datetime] = mapped_column(
         DateTime, default=datetime.utcnow, onupdate=datetime.utcnow
@@ -62,16 +117,38 @@ class ImportJob(Base):
     errors: Mapped[list["ImportError"]] = relationship(
         back_populates="job", cascade="all, delete-orphan"
     )
+    error_summaries: Mapped[list["ImportErrorSummary"]] = relationship(
+        back_populates="job", cascade="all, delete-orphan"
+    )
 
 
 class ImportError(Base):
     __tablename__ = "import_errors"
+    # Keyset pagination and exports read a job's errors in id order.
+    __table_args__ = (Index("IX_import_errors_job_id_id", "job_id", "id"),)
 
     id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
-    job_id: Mapped[int] = mapped_column(ForeignKey("import_jobs.id"), index=True)
+    job_id: Mapped[int] = mapped_column(ForeignKey("import_jobs.id"))
+    sheet_name: Mapped[str | None] = mapped_column(String(100), nullable=True)
     row_number: Mapped[int] = mapped_column()
     column_name: Mapped[str | None] = mapped_column(String(100), nullable=True)
     error_message: Mapped[str] = mapped_column(Text)
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
 
     job: Mapped["ImportJob"] = relationship(back_populates="errors")
+
+
+class ImportErrorSummary(Base):
+    # One row per (sheet, column, message pattern) with its exact count, so a
+    # job's errors stay reportable beyond the stored details.
+    __tablename__ = "import_error_summaries"
+
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+    job_id: Mapped[int] = mapped_column(ForeignKey("import_jobs.id"), index=True)
+    sheet_name: Mapped[str | None] = mapped_column(String(100), nullable=True)
+    column_name: Mapped[str | None] = mapped_column(String(100), nullable=True)
+    error_pattern: Mapped[str] = mapped_column(String(255))
+    occurrences: Mapped[int] = mapped_column()
+    sample_rows: Mapped[list] = mapped_column(JSON)
+
+    job: Mapped["ImportJob"] = relationship(back_populates="error_summaries")
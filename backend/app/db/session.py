@@ -1,19 +1,109 @@
+import time
 from collections.abc import Generator
 
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
 from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import QueuePool
 
 from app.core.config import get_settings
+from app.core.metrics import (
+    DB_POOL_CHECKOUTS,
+    DB_POOL_CONNECTS,
+    DB_POOL_WAIT_SECONDS,
+    Gauge,
+    register,
+)
 
 settings = get_settings()
 
-engine = create_engine(
-    settings.sqlserver_connection_string,
-    pool_pre_ping=True,
-)
+
+class InstrumentedQueuePool(QueuePool):
+    # Records how long callers wait for a connection (including new connects).
+    def _do_get(self):  # noqa: ANN202
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            DB_POOL_WAIT_SECONDS.observe(time.perf_counter() - started)
+
+
+url = make_url(settings.sqlserver_connection_string)
+engine_options: dict[str, object] = {"pool_pre_ping": settings.db_pool_pre_ping}
+if url.get_backend_name() != "sqlite":
+    engine_options.update(
+        poolclass=InstrumentedQueuePool,
+        pool_size=settings.db_pool_size,
+        max_overflow=settings.db_max_overflow,
+        pool_timeout=settings.db_pool_timeout,
+        pool_recycle=settings.db_pool_recycle,
+    )
+if url.drivername == "mssql+pyodbc":
+    # Sends executemany batches (e.g. the upsert staging load) as one round trip.
+    engine_options["fast_executemany"] = True
+
+engine = create_engine(url, **engine_options)
+
+
+@event.listens_for(engine, "checkout")
+def _count_checkout(*_: object) -> None:
+    DB_POOL_CHECKOUTS.inc()
+
+
+@event.listens_for(engine, "connect")
+def _count_connect(*_: object) -> None:
+    DB_POOL_CONNECTS.inc()
+
+
+if isinstance(engine.pool, QueuePool):
+    register(
+        Gauge(
+            "db_pool_checked_out",
+            "Connections currently checked out of the pool.",
+            engine.pool.checkedout,
+        )
+    )
+    register(Gauge("db_pool_overflow", "Current pool overflow.", engine.pool.overflow))
+
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 
+def warm_up_pool() -> int:
+    # Opens the pool's base connections at startup, so the first requests do not
+    # pay for connection setup. Holds them all at once to get distinct ones.
+    if not isinstance(engine.pool, QueuePool) or not settings.db_pool_warmup:
+        return 0
+    connections = []
+    try:
+        for _ in range(engine.pool.size()):
+            connections.append(engine.connect())
+    finally:
+        for connection in connections:
+            connection.close()
+    return len(connections)
+
+
+def pool_stats() -> dict[str, object]:
+    waits, wait_seconds = DB_POOL_WAIT_SECONDS.totals()
+    stats: dict[str, object] = {
+        "pool": type(engine.pool).__name__,
+        "checkouts": int(DB_POOL_CHECKOUTS.value()),
+        "connects": int(DB_POOL_CONNECTS.value()),
+        "wait_count": waits,
+        "wait_seconds_total": round(wait_seconds, 4),
+        "wait_seconds_avg": round(wait_seconds / waits, 6) if waits else 0.0,
+    }
+    if isinstance(engine.pool, QueuePool):
+        stats.update(
+            size=engine.pool.size(),
+            checked_in=engine.pool.checkedin(),
+            checked_out=engine.pool.checkedout(),
+            overflow=engine.pool.overflow(),
+            timeout=engine.pool.timeout(),
+        )
+    return stats
+
+
 def get_db() -> Generator[Session, None, None]:
     db = SessionLocal()
     try:
@@ -3,13 +3,19 @@ from uuid import uuid4
 
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, PlainTextResponse
 from fastapi.staticfiles import StaticFiles
 
+from app.api.sales_records import router as sales_records_router
 from app.api.upload import router as import_router
 from app.core.config import get_settings
+from app.core.limits import BodySizeLimitMiddleware
+from app.core.metrics import render_metrics
 from app.db.models import Base
-from app.db.session import engine
+from app.db.session import SessionLocal, engine, warm_up_pool
+from app.services.import_service import expire_failed_job_sources, fail_interrupted_jobs
+from app.services.job_runner import shutdown_executor
+from app.services.upload_service import purge_upload_sessions
 
 settings = get_settings()
 app = FastAPI(title=settings.app_name)
@@ -23,6 +29,13 @@ app.add_middleware(
 )
 
 
+app.add_middleware(
+    BodySizeLimitMiddleware,
+    max_body_size=settings.max_upload_size_mb * 1024 * 1024
+    + settings.max_request_overhead_kb * 1024,
+)
+
+
 @app.middleware("http")
 async def add_correlation_id(request: Request, call_next):
     request.state.correlation_id = request.headers.get("X-Correlation-ID", str(uuid4()))
@@ -34,9 +47,26 @@ async def add_correlation_id(request: Request, call_next):
 @app.on_event("startup")
 def on_startup() -> None:
     Base.metadata.create_all(bind=engine)
+    with SessionLocal() as db:
+        fail_interrupted_jobs(db, settings.instance_id)
+        expire_failed_job_sources(db, settings.failed_job_source_ttl_hours * 3600)
+    warm_up_pool()
+    purge_upload_sessions(settings.upload_session_dir, settings.upload_session_ttl_hours * 3600)
+
+
+@app.on_event("shutdown")
+def on_shutdown() -> None:
+    shutdown_executor()
 
 
 app.include_router(import_router, prefix=settings.api_prefix)
+app.include_router(sales_records_router, prefix=settings.api_prefix)
+
+
+@app.get("/metrics", include_in_schema=False)
+def metrics() -> PlainTextResponse:
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
 
 frontend_dir = Path(__file__).resolve().parents[2] / "frontend"
 if frontend_dir.exists():
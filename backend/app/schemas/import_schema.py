@@ -1,23 +1,73 @@
 from datetime import datetime
+from typing import Any
 
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
 
 class ImportErrorItem(BaseModel):
+    id: int | None = None
+    sheet_name: str | None = None
     row_number: int
     column_name: str | None = None
     error_message: str
 
 
-class ImportResult(BaseModel):
-    job_id: int
-    status: str
+class ImportErrorPage(BaseModel):
+    items: list[ImportErrorItem]
+    next_after_id: int | None = None
+
+
+class ImportErrorSummaryItem(BaseModel):
+    sheet_name: str | None = None
+    column_name: str | None = None
+    error_pattern: str
+    occurrences: int
+    sample_rows: list[int]
+
+    model_config = {"from_attributes": True}
+
+
+class UploadSessionCreate(BaseModel):
     filename: str
-    total_rows: int
-    imported_rows: int
-    failed_rows: int
-    message: str | None = None
-    errors: list[ImportErrorItem] = []
+    size: int = Field(gt=0)
+    sheets: list[str] | None = None
+
+
+class UploadSessionResponse(BaseModel):
+    upload_id: str
+    filename: str
+    size: int
+    chunk_size: int
+    total_chunks: int
+    received: list[int]
+    job_id: int | None = None
+
+
+class PoolStatsResponse(BaseModel):
+    pool: str
+    checkouts: int
+    connects: int
+    wait_count: int
+    wait_seconds_total: float
+    wait_seconds_avg: float
+    size: int | None = None
+    checked_in: int | None = None
+    checked_out: int | None = None
+    overflow: int | None = None
+    timeout: float | None = None
+
+
+class MappingTargetItem(BaseModel):
+    name: str
+    sources: list[str]
+    raw: bool
+
+
+class MappingPlanResponse(BaseModel):
+    columns: list[str]
+    layout: str
+    targets: list[MappingTargetItem]
+    missing_columns: list[str]
 
 
 class ImportJobResponse(BaseModel):
@@ -27,8 +77,15 @@ class ImportJobResponse(BaseModel):
     status: str
     total_rows: int
     imported_rows: int
+    inserted_rows: int
+    updated_rows: int
+    unchanged_rows: int
+    duplicate_rows: int
     failed_rows: int
+    error_count: int
+    checkpoint_row: int
     message: str | None = None
+    stats: dict[str, Any] | None = None
     created_at: datetime
     updated_at: datetime
 
@@ -0,0 +1,10 @@
+from datetime import date
+from typing import Any
+
+from pydantic import BaseModel
+
+
+class SalesRecordPage(BaseModel):
+    items: list[dict[str, Any]]
+    next_after_date: date | None = None
+    next_after_id: int | None = None
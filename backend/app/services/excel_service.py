@@ -1,14 +1,113 @@
 from __future__ import annotations
 
-from dataclasses import dataclass
+import hashlib
+import io
+import mmap
+from collections import Counter
+from collections.abc import Callable, Iterable, Iterator, Sequence
+from concurrent.futures import Executor
+from contextlib import contextmanager
+from dataclasses import dataclass, field
 from datetime import date
 from decimal import Decimal, InvalidOperation
+from functools import lru_cache
 from io import BytesIO
-from typing import Any
+from pathlib import Path
+from typing import IO, Any, overload
 
+import numpy as np
 import pandas as pd
+from openpyxl import load_workbook
 
 REQUIRED_COLUMNS = ["business_key", "name", "amount", "record_date"]
+NULL_TOKENS = ["nan", "none"]
+ROW_FIELDS = [
+    "business_key",
+    "name",
+    "amount",
+    "record_date",
+    "invoice_date",
+    "invoice_no",
+    "item_description",
+    "product_value",
+    "tax_value",
+    "total_value",
+    "vin_no",
+    "cancel_flag",
+    "cancel_product_value",
+    "cancel_tax_value",
+    "cancel_total_value",
+    "org_type_hq",
+    "org_type_branch_no",
+    "taxpayer_id",
+    "sale_price",
+    "com_fn",
+    "com_value",
+    "rule_applied",
+    "is_duplicate_tank",
+    "group_id",
+]
+# Everything a row writes except its key; hashed to detect unchanged records.
+CONTENT_HASH_FIELDS = ROW_FIELDS[1:]
+# Writers ignore row_number; it locates a row for later stages' errors.
+BATCH_FIELDS = [*ROW_FIELDS, "content_hash", "row_number"]
+STRING_FIELDS = [
+    "invoice_no",
+    "item_description",
+    "vin_no",
+    "cancel_flag",
+    "org_type_hq",
+    "rule_applied",
+    "group_id",
+]
+# Low-cardinality text whose repeated values are interned per job.
+INTERNED_FIELDS = ["name", "item_description", "cancel_flag", "org_type_hq", "rule_applied"]
+DECIMAL_FIELDS = [
+    "product_value",
+    "tax_value",
+    "total_value",
+    "cancel_product_value",
+    "cancel_tax_value",
+    "cancel_total_value",
+    "sale_price",
+    "com_fn",
+    "com_value",
+]
+# Delimited formats map to (separator, compression); Path.suffix alone would
+# report ".gz" for "feed.csv.gz".
+DELIMITED_FORMATS: dict[str, tuple[str, str | None]] = {
+    ".csv": (",", None),
+    ".tsv": ("\t", None),
+    ".csv.gz": (",", "gzip"),
+}
+# Target -> (positional fallback columns, keep raw cell values) for finance
+# screening files whose headers do not match any alias.
+FINANCE_SCREENING_TARGETS: dict[str, tuple[tuple[int, ...], bool]] = {
+    "business_key": ((7, 1), False),
+    "name": ((2,), False),
+    "amount": ((15, 6, 4), False),
+    "record_date": ((0,), True),
+    "invoice_date": ((0,), True),
+    "invoice_no": ((1,), False),
+    "item_description": ((), False),
+    "product_value": ((4,), True),
+    "tax_value": ((), True),
+    "total_value": ((6,), True),
+    "vin_no": ((7,), False),
+    "cancel_flag": ((), False),
+    "cancel_product_value": ((), True),
+    "cancel_tax_value": ((), True),
+    "cancel_total_value": ((), True),
+    "org_type_hq": ((), False),
+    "org_type_branch_no": ((), True),
+    "taxpayer_id": ((), False),
+    "sale_price": ((15,), True),
+    "com_fn": ((), True),
+    "com_value": ((), True),
+    "rule_applied": ((), False),
+    "is_duplicate_tank": ((), True),
+    "group_id": ((), False),
+}
 FINANCE_SCREENING_ALIASES: dict[str, list[str]] = {
     "business_key": ["business_key", "group_id", "เลขตัวถัง", "เลขที่ใบกำกับ"],
     "name": ["name", "ชื่อ-นามสกุล"],
@@ -37,11 +136,295 @@ FINANCE_SCREENING_ALIASES: dict[str, list[str]] = {
 }
 
 
+ALL_SHEETS = "*"
+ERROR_SAMPLE_ROWS = 5
+
+
 @dataclass
 class ValidationErrorItem:
     row_number: int
     column_name: str | None
     error_message: str
+    sheet_name: str | None = None
+
+
+@dataclass
+class ErrorPattern:
+    occurrences: int = 0
+    sample_rows: list[int] = field(default_factory=list)
+
+
+@dataclass
+class ValidationErrors:
+    # Per-job error accumulator: totals and per-pattern summaries are exact,
+    # while only the first `max_details` items are kept for storage and display.
+    max_details: int | None = None
+    sheet_name: str | None = None
+    items: list[ValidationErrorItem] = field(default_factory=list)
+    total: int = 0
+    patterns: dict[tuple[str | None, str | None, str], ErrorPattern] = field(
+        default_factory=dict
+    )
+    _failed_rows: set[tuple[str | None, int]] = field(default_factory=set, repr=False)
+    _saved: int = field(default=0, repr=False)
+
+    def add(
+        self,
+        row_number: int,
+        column_name: str | None,
+        error_message: str,
+        pattern: str | None = None,
+    ) -> None:
+        # `pattern` is the message without the offending value, so errors of
+        # one kind are summarised together.
+        self.total += 1
+        self._failed_rows.add((self.sheet_name, row_number))
+        summary = self.patterns.setdefault(
+            (self.sheet_name, column_name, pattern or error_message), ErrorPattern()
+        )
+        summary.occurrences += 1
+        if len(summary.sample_rows) < ERROR_SAMPLE_ROWS:
+            summary.sample_rows.append(row_number)
+        if self.max_details is None or len(self.items) < self.max_details:
+            self.items.append(
+                ValidationErrorItem(
+                    row_number=row_number,
+                    column_name=column_name,
+                    error_message=error_message,
+                    sheet_name=self.sheet_name,
+                )
+            )
+
+    def merge(self, other: ValidationErrors) -> None:
+        self.total += other.total
+        self._failed_rows |= other._failed_rows
+        for key, other_summary in other.patterns.items():
+            summary = self.patterns.setdefault(key, ErrorPattern())
+            summary.occurrences += other_summary.occurrences
+            room = ERROR_SAMPLE_ROWS - len(summary.sample_rows)
+            summary.sample_rows.extend(other_summary.sample_rows[:room])
+        room = len(other.items)
+        if self.max_details is not None:
+            room = max(self.max_details - len(self.items), 0)
+        self.items.extend(other.items[:room])
+
+    @property
+    def failed_rows(self) -> int:
+        return len(self._failed_rows)
+
+    @property
+    def truncated(self) -> bool:
+        return self.total > len(self.items)
+
+    def take_unsaved(self) -> list[ValidationErrorItem]:
+        pending = self.items[self._saved :]
+        self._saved = len(self.items)
+        return pending
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    def __iter__(self) -> Iterator[ValidationErrorItem]:
+        return iter(self.items)
+
+
+@dataclass
+class ParseCache:
+    # Per-job memo of parsed cell values, shared across chunks. Each parser keeps
+    # at most `max_entries` values; keys include the value's type because e.g.
+    # 1 and 1.0 parse differently. `cells`/`parsed` count non-empty cells seen
+    # and values actually parsed.
+    max_entries: int = 50_000
+    cells: Counter[str] = field(default_factory=Counter)
+    parsed: Counter[str] = field(default_factory=Counter)
+    _tables: dict[str, dict[tuple[type, Any], Any]] = field(default_factory=dict, repr=False)
+
+    def lookup(
+        self, kind: str, values: Any, parse: Callable[[list[Any]], list[Any]]
+    ) -> list[Any]:
+        table = self._tables.setdefault(kind, {})
+        results: list[Any] = [None] * len(values)
+        missing: list[int] = []
+        for pos, value in enumerate(values):
+            key = (value.__class__, value)
+            if key in table:
+                results[pos] = table[key]
+            else:
+                missing.append(pos)
+        if missing:
+            room = self.max_entries - len(table)
+            for pos, result in zip(missing, parse([values[pos] for pos in missing])):
+                results[pos] = result
+                if room > 0:
+                    table[(values[pos].__class__, values[pos])] = result
+                    room -= 1
+            self.parsed[kind] += len(missing)
+        return results
+
+    def counts(self) -> ParseCache:
+        return ParseCache(self.max_entries, Counter(self.cells), Counter(self.parsed))
+
+    def merge(self, other: ParseCache) -> None:
+        self.cells.update(other.cells)
+        self.parsed.update(other.parsed)
+
+    def stats(self) -> dict[str, dict[str, float]]:
+        return {
+            kind: {
+                "cells": cells,
+                "parsed": self.parsed[kind],
+                "hit_rate": round(1 - self.parsed[kind] / cells, 4),
+            }
+            for kind, cells in sorted(self.cells.items())
+            if cells
+        }
+
+
+def _canonical_value(value: Any) -> str:
+    if value is None:
+        return "\x00"
+    if isinstance(value, bool):
+        return "1" if value else "0"
+    if isinstance(value, Decimal):
+        # Stored as DECIMAL(18,2), so 25.5 and 25.50 are the same content.
+        return format(value, ".2f")
+    if isinstance(value, date):
+        return value.isoformat()
+    return str(value)
+
+
+def content_hashes(columns: dict[str, np.ndarray]) -> np.ndarray:
+    # Canonicalises each distinct value once per column, then digests the
+    # joined fields of every row.
+    parts = []
+    for name in CONTENT_HASH_FIELDS:
+        codes, uniques = pd.factorize(columns[name])
+        canonical = np.array([*(_canonical_value(value) for value in uniques), "\x00"], dtype=object)
+        parts.append(canonical[codes])
+    hashes = np.empty(len(columns["business_key"]), dtype=object)
+    hashes[:] = [
+        hashlib.blake2b("\x1f".join(values).encode(), digest_size=16).hexdigest()
+        for values in zip(*parts)
+    ]
+    return hashes
+
+
+class ValidatedBatch(Sequence[dict[str, Any]]):
+    # Valid rows stored column-wise, one object array per BATCH_FIELDS entry.
+    # Parsed values are shared between cells (see ParseCache), so a row costs a
+    # slot per field instead of a 24-key dict. Writers read `tuples()`;
+    # indexing and iteration build row dicts on demand.
+    __slots__ = ("columns",)
+
+    def __init__(self, columns: dict[str, np.ndarray] | None = None) -> None:
+        if columns is None:
+            columns = {name: np.empty(0, dtype=object) for name in BATCH_FIELDS}
+        self.columns = columns
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[dict[str, Any]]) -> ValidatedBatch:
+        rows = list(rows)
+        columns = {}
+        for name in ROW_FIELDS:
+            values = np.empty(len(rows), dtype=object)
+            values[:] = [row.get(name) for row in rows]
+            columns[name] = values
+        columns["content_hash"] = content_hashes(columns)
+        columns["row_number"] = np.array([row.get("row_number") for row in rows], dtype=object)
+        return cls(columns)
+
+    @classmethod
+    def concat(cls, batches: Iterable[ValidatedBatch]) -> ValidatedBatch:
+        batches = [batch for batch in batches if len(batch)]
+        if len(batches) == 1:
+            return batches[0]
+        if not batches:
+            return cls()
+        return cls(
+            {
+                name: np.concatenate([batch.columns[name] for batch in batches])
+                for name in BATCH_FIELDS
+            }
+        )
+
+    def take(self, positions: np.ndarray) -> ValidatedBatch:
+        return ValidatedBatch({name: values[positions] for name, values in self.columns.items()})
+
+    def tuples(
+        self, fields: Sequence[str] = BATCH_FIELDS, start: int = 0, stop: int | None = None
+    ) -> Iterator[tuple[Any, ...]]:
+        return zip(*(self.columns[name][start:stop] for name in fields))
+
+    def __len__(self) -> int:
+        return len(self.columns["business_key"])
+
+    @overload
+    def __getitem__(self, index: int) -> dict[str, Any]: ...
+
+    @overload
+    def __getitem__(self, index: slice) -> ValidatedBatch: ...
+
+    def __getitem__(self, index: int | slice) -> dict[str, Any] | ValidatedBatch:
+        if isinstance(index, slice):
+            return ValidatedBatch({name: values[index] for name, values in self.columns.items()})
+        return {name: self.columns[name][index] for name in BATCH_FIELDS}
+
+    def __iter__(self) -> Iterator[dict[str, Any]]:
+        for values in self.tuples():
+            yield dict(zip(BATCH_FIELDS, values))
+
+
+@dataclass
+class KeyDeduplicator:
+    # Per-job stage between validation and writing that keeps one row per
+    # business_key. Within a batch every policy is exact. Across batches, each
+    # key's first written row is remembered: first_wins and reject drop later
+    # rows of it, while last_wins still writes the latest one over the record
+    # but counts it as collapsed rather than imported.
+    policy: str = "last_wins"
+    collapsed: int = 0
+    _first_rows: dict[str, tuple[str | None, int]] = field(default_factory=dict, repr=False)
+
+    def apply(
+        self, rows: ValidatedBatch, errors: ValidationErrors
+    ) -> tuple[ValidatedBatch, ValidatedBatch]:
+        # Returns the rows of keys new to this job, and the last_wins rows that
+        # rewrite a record an earlier batch already wrote.
+        keys = rows.columns["business_key"]
+        if not len(keys):
+            return rows, rows
+        earlier = np.fromiter(
+            (key in self._first_rows for key in keys), dtype=bool, count=len(keys)
+        )
+        if self.policy == "last_wins":
+            keep = ~pd.Series(keys).duplicated(keep="last").to_numpy()
+            rewrites = keep & earlier
+        else:
+            keep = ~pd.Series(keys).duplicated(keep="first").to_numpy()
+            rewrites = np.zeros(len(keys), dtype=bool)
+        keep &= ~earlier
+        fresh = rows.take(np.flatnonzero(keep))
+        self.remember(fresh, errors.sheet_name)
+        dropped = np.flatnonzero(~keep & ~rewrites)
+        self.collapsed += len(dropped) + int(np.count_nonzero(rewrites))
+        if self.policy == "reject":
+            row_numbers = rows.columns["row_number"]
+            for pos in dropped:
+                sheet_name, first_row = self._first_rows[keys[pos]]
+                where = f"{sheet_name} row {first_row}" if sheet_name else f"row {first_row}"
+                errors.add(
+                    int(row_numbers[pos]),
+                    "business_key",
+                    f"business_key is duplicated: {keys[pos]} (first seen in {where})",
+                    "business_key is duplicated",
+                )
+        return fresh, rows.take(np.flatnonzero(rewrites))
+
+    def remember(self, rows: ValidatedBatch, sheet_name: str | None = None) -> None:
+        # Records first occurrences without collapsing anything, e.g. for the
+        # rows a resumed job skips.
+        for key, row_number in zip(rows.columns["business_key"], rows.columns["row_number"]):
+            self._first_rows.setdefault(key, (sheet_name, int(row_number)))
 
 
 def _as_clean_string(value: Any) -> str:
@@ -53,52 +436,26 @@ def _as_clean_string(value: Any) -> str:
     return text
 
 
-def _coalesce_columns(frame: pd.DataFrame, candidates: list[str]) -> pd.Series:
-    result = pd.Series([""] * len(frame), index=frame.index, dtype="object")
-    for col in candidates:
-        if col not in frame.columns:
-            continue
-        values = frame[col].map(_as_clean_string)
-        mask = (result == "") & (values != "")
-        result.loc[mask] = values.loc[mask]
-    return result
-
-
-def _coalesce_raw_columns(frame: pd.DataFrame, candidates: list[str]) -> pd.Series:
-    result = pd.Series([None] * len(frame), index=frame.index, dtype="object")
-    for col in candidates:
-        if col not in frame.columns:
-            continue
-        values = frame[col]
-        mask = result.isna() & values.notna()
-        result.loc[mask] = values.loc[mask]
-    return result
-
-
 def _parse_optional_decimal(value: Any) -> Decimal | None:
     text = _as_clean_string(value).replace(",", "")
     if text == "":
         return None
     try:
-        return Decimal(text)
+        value = Decimal(text)
     except (InvalidOperation, ValueError):
         return None
-
-
-def _parse_optional_date(value: Any) -> date | None:
-    if pd.isna(value):
-        return None
-    text = _as_clean_string(value)
-    if text == "":
-        return None
-    return pd.to_datetime(value).date()
+    # NaN and Infinity parse, but cannot be stored in a NUMERIC column.
+    return value if value.is_finite() else None
 
 
 def _parse_optional_int(value: Any) -> int | None:
     text = _as_clean_string(value)
     if text == "":
         return None
-    return int(float(text))
+    try:
+        return int(float(text))
+    except (OverflowError, ValueError):
+        return None
 
 
 def _parse_optional_bool(value: Any) -> bool | None:
@@ -114,81 +471,350 @@ def _parse_optional_bool(value: Any) -> bool | None:
     return None
 
 
-def _map_finance_screening_format(frame: pd.DataFrame) -> pd.DataFrame:
+def _column_values(frame: pd.DataFrame, column: str) -> pd.Series:
+    if column not in frame.columns:
+        return pd.Series([None] * len(frame), index=frame.index, dtype="object")
+    return frame[column].astype("object")
+
+
+def _clean_string_column(values: pd.Series) -> pd.Series:
+    # Column-wise equivalent of `_as_clean_string`.
+    text = values.astype(str).str.strip()
+    blank = values.isna() | text.str.lower().isin(NULL_TOKENS)
+    return text.where(~blank, "").astype("object")
+
+
+def _map_unique(
+    values: pd.Series,
+    parse: Callable[[list[Any]], list[Any]],
+    cache: ParseCache,
+    kind: str,
+) -> np.ndarray:
+    # Parses each distinct value once (and only if the job has not seen it) and
+    # broadcasts the results back; missing values (factorize code -1) map to
+    # None through the trailing slot, as do blank strings.
+    codes, uniques = pd.factorize(values)
+    if "" in uniques:
+        blank = uniques.get_loc("")
+        codes = np.where(codes == blank, -1, codes - (codes > blank))
+        uniques = uniques.delete(blank)
+    parsed = np.empty(len(uniques) + 1, dtype=object)
+    parsed[: len(uniques)] = cache.lookup(kind, uniques, parse)
+    parsed[-1] = None
+    cache.cells[kind] += int(np.count_nonzero(codes >= 0))
+    return parsed[codes]
+
+
+def _each(parser: Callable[[Any], Any]) -> Callable[[list[Any]], list[Any]]:
+    return lambda values: [parser(value) for value in values]
+
+
+def _parse_date(value: Any) -> date | None:
+    timestamp = pd.to_datetime(value, errors="coerce")
+    return None if pd.isna(timestamp) else timestamp.date()
+
+
+def _parse_dates(values: list[Any]) -> list[date | None]:
+    try:
+        timestamps = pd.to_datetime(
+            pd.Series(values, dtype="object"), errors="coerce", format="mixed"
+        )
+    except ValueError:
+        # Values with different UTC offsets (or mixing aware and naive) cannot
+        # share one series; each then keeps its own local date, as when parsed alone.
+        return [_parse_date(value) for value in values]
+    return [None if pd.isna(ts) else ts.date() for ts in timestamps]
+
+
+def _blank_to_none(values: list[str]) -> list[str | None]:
+    return [value or None for value in values]
+
+
+def _optional_strings(text: pd.Series) -> np.ndarray:
+    values = text.to_numpy(dtype=object)
+    return np.where(values == "", None, values)
+
+
+def _normalize_headers(header: tuple[Any, ...]) -> list[str]:
+    # Mirrors pd.read_excel: blank headers become "Unnamed: <n>" and repeated
+    # headers get a ".<n>" suffix, then everything is stripped and lower-cased.
+    columns: list[str] = []
+    seen: dict[str, int] = {}
+    for position, value in enumerate(header):
+        name = f"Unnamed: {position}" if value is None else str(value)
+        if name in seen:
+            seen[name] += 1
+            name = f"{name}.{seen[name]}"
+        else:
+            seen[name] = 0
+        columns.append(name.strip().lower())
+    return columns
+
+
+@dataclass(frozen=True)
+class MappingTarget:
+    name: str
+    sources: tuple[str, ...]
+    raw: bool
+
+
+@dataclass(frozen=True)
+class MappingPlan:
+    columns: tuple[str, ...]
+    layout: str
+    targets: tuple[MappingTarget, ...] = ()
+
+    @property
+    def missing_columns(self) -> list[str]:
+        if self.layout == "standard":
+            return []
+        if self.layout == "unrecognized":
+            return [column for column in REQUIRED_COLUMNS if column not in self.columns]
+        mapped = {target.name for target in self.targets if target.sources}
+        return [column for column in REQUIRED_COLUMNS if column not in mapped]
+
+    def apply(self, frame: pd.DataFrame) -> pd.DataFrame:
+        if self.layout != "finance_screening":
+            return frame
+        cleaned: dict[str, pd.Series] = {}
+        data: dict[str, Any] = {}
+        for target in self.targets:
+            if target.raw:
+                data[target.name] = _coalesce_raw(frame, target.sources)
+            else:
+                data[target.name] = _coalesce_clean(frame, target.sources, cleaned)
+        return pd.DataFrame(data, index=frame.index, dtype="object")
+
+    def as_dict(self) -> dict[str, Any]:
+        return {
+            "columns": list(self.columns),
+            "layout": self.layout,
+            "targets": [
+                {"name": target.name, "sources": list(target.sources), "raw": target.raw}
+                for target in self.targets
+            ],
+            "missing_columns": self.missing_columns,
+        }
+
+
+def _coalesce_clean(
+    frame: pd.DataFrame, sources: tuple[str, ...], cleaned: dict[str, pd.Series]
+) -> np.ndarray:
+    # First non-blank cleaned value wins. Cleaned source columns are shared
+    # between targets that read the same column.
+    result = np.full(len(frame), "", dtype=object)
+    for source in reversed(sources):
+        if source not in cleaned:
+            cleaned[source] = _clean_string_column(frame[source].astype("object"))
+        values = cleaned[source].to_numpy(dtype=object)
+        result = np.where(values != "", values, result)
+    return result
+
+
+def _coalesce_raw(frame: pd.DataFrame, sources: tuple[str, ...]) -> np.ndarray:
+    # First non-missing cell wins; cell values are kept for the typed parsers.
+    result = np.full(len(frame), None, dtype=object)
+    for source in reversed(sources):
+        values = frame[source].to_numpy(dtype=object)
+        result = np.where(pd.notna(values), values, result)
+    return result
+
+
+@lru_cache(maxsize=256)
+def compile_mapping_plan(columns: tuple[str, ...]) -> MappingPlan:
+    # Resolves a (normalised) header once into the source columns feeding each
+    # target, so chunks and uploads that share a header skip the lookups.
+    present = set(columns)
+    if set(REQUIRED_COLUMNS) <= present:
+        targets = tuple(
+            MappingTarget(name, (name,) if name in present else (), raw=False)
+            for name in ROW_FIELDS
+        )
+        return MappingPlan(columns, "standard", targets)
     # `finance-screening-output.xlsx` may come with Thai or English headers.
-    if "group_id" not in frame.columns and "วันที่ใบกำกับ" not in frame.columns:
-        return frame
-
-    columns = list(frame.columns)
-    date_col = columns[0] if len(columns) > 0 else ""
-    invoice_col = columns[1] if len(columns) > 1 else ""
-    name_col = columns[2] if len(columns) > 2 else ""
-    vin_col = columns[7] if len(columns) > 7 else ""
-    sale_price_col = columns[15] if len(columns) > 15 else ""
-    total_col = columns[6] if len(columns) > 6 else ""
-    gross_col = columns[4] if len(columns) > 4 else ""
-
-    mapped = pd.DataFrame(index=frame.index)
-    mapped["business_key"] = _coalesce_columns(
-        frame, FINANCE_SCREENING_ALIASES["business_key"] + [vin_col, invoice_col]
-    )
-    mapped["name"] = _coalesce_columns(frame, FINANCE_SCREENING_ALIASES["name"] + [name_col])
-    mapped["amount"] = _coalesce_columns(
-        frame, FINANCE_SCREENING_ALIASES["amount"] + [sale_price_col, total_col, gross_col]
-    )
-    mapped["record_date"] = _coalesce_raw_columns(
-        frame, FINANCE_SCREENING_ALIASES["record_date"] + [date_col]
-    )
-    mapped["invoice_date"] = _coalesce_raw_columns(
-        frame, FINANCE_SCREENING_ALIASES["invoice_date"] + [date_col]
-    )
-    mapped["invoice_no"] = _coalesce_columns(
-        frame, FINANCE_SCREENING_ALIASES["invoice_no"] + [invoice_col]
-    )
-    mapped["item_description"] = _coalesce_columns(frame, FINANCE_SCREENING_ALIASES["item_description"])
-    mapped["product_value"] = _coalesce_raw_columns(
-        frame, FINANCE_SCREENING_ALIASES["product_value"] + [gross_col]
-    )
-    mapped["tax_value"] = _coalesce_raw_columns(frame, FINANCE_SCREENING_ALIASES["tax_value"])
-    mapped["total_value"] = _coalesce_raw_columns(
-        frame, FINANCE_SCREENING_ALIASES["total_value"] + [total_col]
-    )
-    mapped["vin_no"] = _coalesce_columns(frame, FINANCE_SCREENING_ALIASES["vin_no"] + [vin_col])
-    mapped["cancel_flag"] = _coalesce_columns(frame, FINANCE_SCREENING_ALIASES["cancel_flag"])
-    mapped["cancel_product_value"] = _coalesce_raw_columns(
-        frame, FINANCE_SCREENING_ALIASES["cancel_product_value"]
-    )
-    mapped["cancel_tax_value"] = _coalesce_raw_columns(
-        frame, FINANCE_SCREENING_ALIASES["cancel_tax_value"]
-    )
-    mapped["cancel_total_value"] = _coalesce_raw_columns(
-        frame, FINANCE_SCREENING_ALIASES["cancel_total_value"]
-    )
-    mapped["org_type_hq"] = _coalesce_columns(frame, FINANCE_SCREENING_ALIASES["org_type_hq"])
-    mapped["org_type_branch_no"] = _coalesce_raw_columns(
-        frame, FINANCE_SCREENING_ALIASES["org_type_branch_no"]
-    )
-    mapped["taxpayer_id"] = _coalesce_columns(frame, FINANCE_SCREENING_ALIASES["taxpayer_id"])
-    mapped["sale_price"] = _coalesce_raw_columns(
-        frame, FINANCE_SCREENING_ALIASES["sale_price"] + [sale_price_col]
-    )
-    mapped["com_fn"] = _coalesce_raw_columns(frame, FINANCE_SCREENING_ALIASES["com_fn"])
-    mapped["com_value"] = _coalesce_raw_columns(frame, FINANCE_SCREENING_ALIASES["com_value"])
-    mapped["rule_applied"] = _coalesce_columns(frame, FINANCE_SCREENING_ALIASES["rule_applied"])
-    mapped["is_duplicate_tank"] = _coalesce_raw_columns(
-        frame, FINANCE_SCREENING_ALIASES["is_duplicate_tank"]
-    )
-    mapped["group_id"] = _coalesce_columns(frame, FINANCE_SCREENING_ALIASES["group_id"])
-    return mapped
+    if "group_id" not in present and "วันที่ใบกำกับ" not in present:
+        return MappingPlan(columns, "unrecognized")
+
+    targets = []
+    for name, (positions, raw) in FINANCE_SCREENING_TARGETS.items():
+        candidates = FINANCE_SCREENING_ALIASES[name] + [
+            columns[position] for position in positions if position < len(columns)
+        ]
+        sources = tuple(dict.fromkeys(col for col in candidates if col in present))
+        targets.append(MappingTarget(name, sources, raw))
+    return MappingPlan(columns, "finance_screening", tuple(targets))
+
+
+def apply_column_mapping(frame: pd.DataFrame) -> pd.DataFrame:
+    return compile_mapping_plan(tuple(frame.columns)).apply(frame)
+
+
+class _MappedFile(io.RawIOBase):
+    # File-like view over an mmap; mmap itself lacks `seekable()` before 3.13.
+    def __init__(self, mapped: mmap.mmap) -> None:
+        self._mapped = mapped
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def readinto(self, buffer: Any) -> int:
+        data = self._mapped.read(len(buffer))
+        buffer[: len(data)] = data
+        return len(data)
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        self._mapped.seek(offset, whence)
+        return self._mapped.tell()
+
+    def tell(self) -> int:
+        return self._mapped.tell()
+
+
+def file_extension(filename: str) -> str:
+    suffixes = Path(filename.lower()).suffixes
+    compound = "".join(suffixes[-2:])
+    if compound in DELIMITED_FORMATS:
+        return compound
+    return suffixes[-1] if suffixes else ""
+
+
+@contextmanager
+def open_upload_source(path: str | Path) -> Iterator[IO[bytes]]:
+    # Memory-maps the upload so openpyxl's zip reads (and the CSV reader) are
+    # served from the page cache instead of per-read syscalls; falls back to a
+    # plain file handle for files that cannot be mapped (e.g. empty ones).
+    with open(path, "rb") as handle:
+        try:
+            mapped = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            yield handle
+            return
+        with mapped:
+            yield _MappedFile(mapped)
+
+
+def list_sheet_names(source: str | Path | IO[bytes]) -> list[str]:
+    workbook = load_workbook(source, read_only=True)
+    try:
+        return list(workbook.sheetnames)
+    finally:
+        workbook.close()
+
+
+def select_sheets(available: list[str], requested: list[str]) -> list[str]:
+    if ALL_SHEETS in requested:
+        return available
+    unknown = [name for name in requested if name not in available]
+    if unknown:
+        raise ValueError(f"Unknown sheets: {', '.join(unknown)}")
+    return list(dict.fromkeys(requested))
+
+
+def _trim_row(row: tuple[Any, ...]) -> tuple[Any, ...]:
+    # Drops trailing empty cells, which openpyxl reports up to the sheet's width.
+    end = len(row)
+    while end and row[end - 1] is None:
+        end -= 1
+    return tuple(row[:end])
+
+
+def iter_raw_excel_chunks(
+    source: str | Path | IO[bytes], chunk_size: int = 5000, sheet_name: str | None = None
+) -> Iterator[pd.DataFrame]:
+    # Streams one sheet (the first by default) with openpyxl's read-only mode so
+    # only one chunk of rows is materialised at a time. Chunk indexes continue
+    # across chunks, so `index + 2` is still the sheet row number. At least one
+    # (possibly empty) chunk is always yielded so callers can check the header.
+    # Headers are normalised but not mapped; see `apply_column_mapping`.
+    workbook = load_workbook(source, read_only=True, data_only=True)
+    try:
+        sheet = workbook.worksheets[0] if sheet_name is None else workbook[sheet_name]
+        sheet.reset_dimensions()
+        values = sheet.iter_rows(values_only=True)
+        header = _trim_row(next(values, None) or ())
+        columns = _normalize_headers(header)
+        width = len(columns)
+
+        rows: list[tuple[Any, ...]] = []
+        index: list[int] = []
+        pending_blank: list[int] = []
+        yielded = False
+        for position, raw in enumerate(values):
+            raw = _trim_row(raw)
+            if not raw:
+                # Like pd.read_excel, blank rows only count if data follows them.
+                pending_blank.append(position)
+                continue
+            if len(raw) > width:
+                # Data beyond the header gets "Unnamed: <n>" columns, as in
+                # pd.read_excel. Earlier chunks simply lack them.
+                width = len(raw)
+                columns = _normalize_headers(header + (None,) * (width - len(header)))
+                rows = [row + (None,) * (width - len(row)) for row in rows]
+            for blank_position in pending_blank:
+                rows.append((None,) * width)
+                index.append(blank_position)
+            pending_blank.clear()
+            rows.append(raw + (None,) * (width - len(raw)))
+            index.append(position)
+            if len(rows) >= chunk_size:
+                yield pd.DataFrame(rows, columns=columns, index=index, dtype="object")
+                yielded = True
+                rows, index = [], []
+        if rows or not yielded:
+            yield pd.DataFrame(rows, columns=columns, index=index, dtype="object")
+    finally:
+        workbook.close()
+
+
+def iter_raw_delimited_chunks(
+    source: str | Path | IO[bytes], extension: str = ".csv", chunk_size: int = 5000
+) -> Iterator[pd.DataFrame]:
+    # Same contract as `iter_raw_excel_chunks`: object-dtype chunks whose index
+    # continues across chunks and normalised headers (pandas already applies
+    # the "Unnamed: <n>" / ".<n>" rules). Only empty fields become missing so
+    # tokens like "NA" stay strings, as they do in a workbook.
+    separator, compression = DELIMITED_FORMATS[extension]
+    with pd.read_csv(
+        source,
+        sep=separator,
+        compression=compression,
+        encoding="utf-8-sig",
+        dtype=object,
+        keep_default_na=False,
+        na_values=[""],
+        chunksize=chunk_size,
+    ) as reader:
+        for frame in reader:
+            frame.columns = [str(column).strip().lower() for column in frame.columns]
+            yield frame
+
+
+def iter_raw_chunks(
+    source: str | Path | IO[bytes], extension: str = ".xlsx", chunk_size: int = 5000
+) -> Iterator[pd.DataFrame]:
+    if extension in DELIMITED_FORMATS:
+        return iter_raw_delimited_chunks(source, extension, chunk_size)
+    return iter_raw_excel_chunks(source, chunk_size)
+
+
+def iter_excel_chunks(
+    source: str | Path | IO[bytes], chunk_size: int = 5000
+) -> Iterator[pd.DataFrame]:
+    for frame in iter_raw_excel_chunks(source, chunk_size):
+        yield apply_column_mapping(frame)
 
 
 def parse_excel_bytes(file_bytes: bytes) -> pd.DataFrame:
-    frame = pd.read_excel(BytesIO(file_bytes), engine="openpyxl")
-    normalized = {col: str(col).strip().lower() for col in frame.columns}
-    frame = frame.rename(columns=normalized)
-    if not set(REQUIRED_COLUMNS).issubset(frame.columns):
-        frame = _map_finance_screening_format(frame)
-    return frame
+    return pd.concat(list(iter_excel_chunks(BytesIO(file_bytes))))
+
+
+def parse_excel_file(path: str | Path) -> pd.DataFrame:
+    with open_upload_source(path) as source:
+        return pd.concat(list(iter_excel_chunks(source)))
 
 
 def validate_required_columns(frame: pd.DataFrame) -> list[str]:
@@ -197,88 +823,175 @@ def validate_required_columns(frame: pd.DataFrame) -> list[str]:
 
 def validate_and_transform_rows(
     frame: pd.DataFrame,
-) -> tuple[list[dict[str, Any]], list[ValidationErrorItem]]:
-    valid_rows: list[dict[str, Any]] = []
-    errors: list[ValidationErrorItem] = []
-
-    for idx, row in frame.iterrows():
-        row_number = idx + 2
-        business_key = _as_clean_string(row.get("business_key"))
-        name = _as_clean_string(row.get("name"))
-        amount_value = row.get("amount")
-        record_date_value = row.get("record_date")
-
-        if not business_key:
-            errors.append(
-                ValidationErrorItem(
-                    row_number=row_number,
-                    column_name="business_key",
-                    error_message="business_key is required",
-                )
-            )
-        if not name:
-            errors.append(
-                ValidationErrorItem(
-                    row_number=row_number,
-                    column_name="name",
-                    error_message="name is required",
-                )
-            )
+    errors: ValidationErrors | None = None,
+    cache: ParseCache | None = None,
+) -> tuple[ValidatedBatch, ValidationErrors]:
+    if errors is None:
+        errors = ValidationErrors()
+    return ValidatedBatch(_validate_columns(frame, errors, cache or ParseCache())), errors
 
-        amount: Decimal | None = None
-        try:
-            amount = Decimal(_as_clean_string(amount_value).replace(",", ""))
-        except (InvalidOperation, TypeError, ValueError):
-            errors.append(
-                ValidationErrorItem(
-                    row_number=row_number,
-                    column_name="amount",
-                    error_message=f"amount is invalid: {amount_value}",
-                )
-            )
 
-        parsed_date: date | None = None
-        try:
-            parsed_date = pd.to_datetime(record_date_value).date()
-        except Exception:  # noqa: BLE001
-            errors.append(
-                ValidationErrorItem(
-                    row_number=row_number,
-                    column_name="record_date",
-                    error_message=f"record_date is invalid: {record_date_value}",
-                )
-            )
+def validate_and_transform_rows_sharded(
+    frame: pd.DataFrame,
+    executor: Executor,
+    shard_size: int,
+    errors: ValidationErrors | None = None,
+    cache: ParseCache | None = None,
+) -> tuple[ValidatedBatch, ValidationErrors]:
+    # Validates row-range shards on `executor` and merges them back in row
+    # order, giving the same rows and errors as `validate_and_transform_rows`.
+    # Workers memoise per shard, bounded like `cache`; only their counts come back.
+    if errors is None:
+        errors = ValidationErrors()
+    if len(frame) <= shard_size:
+        return validate_and_transform_rows(frame, errors, cache)
+    cache_size = cache.max_entries if cache is not None else ParseCache.max_entries
+    futures = [
+        executor.submit(
+            _validate_shard,
+            frame.iloc[start : start + shard_size],
+            errors.max_details,
+            errors.sheet_name,
+            cache_size,
+        )
+        for start in range(0, len(frame), shard_size)
+    ]
+    batches: list[ValidatedBatch] = []
+    for future in futures:
+        batch, shard_errors, shard_counts = future.result()
+        errors.merge(shard_errors)
+        if cache is not None:
+            cache.merge(shard_counts)
+        batches.append(batch)
+    return ValidatedBatch.concat(batches), errors
+
+
+def _validate_shard(
+    frame: pd.DataFrame, max_details: int | None, sheet_name: str | None, cache_size: int
+) -> tuple[ValidatedBatch, ValidationErrors, ParseCache]:
+    errors = ValidationErrors(max_details=max_details, sheet_name=sheet_name)
+    cache = ParseCache(max_entries=cache_size)
+    return ValidatedBatch(_validate_columns(frame, errors, cache)), errors, cache.counts()
+
+
+def _validate_columns(
+    frame: pd.DataFrame, errors: ValidationErrors, cache: ParseCache
+) -> dict[str, np.ndarray]:
+    # Each column is cleaned and parsed in one pass; rows are only visited for
+    # the per-row error report. Returns the valid rows' values per field.
+    business_key = _clean_string_column(_column_values(frame, "business_key"))
+    name = _clean_string_column(_column_values(frame, "name"))
+    amount_values = _column_values(frame, "amount")
+    record_date_values = _column_values(frame, "record_date")
+
+    amount = _map_unique(
+        _clean_string_column(amount_values).str.replace(",", "", regex=False),
+        _each(_parse_optional_decimal),
+        cache,
+        "decimal",
+    )
+    record_date = _map_unique(record_date_values, _parse_dates, cache, "date")
+
+    # (column, failing rows, message pattern, raw values appended to the message)
+    checks = [
+        ("business_key", (business_key == "").to_numpy(), "business_key is required", None),
+        ("name", (name == "").to_numpy(), "name is required", None),
+        ("amount", pd.isna(amount), "amount is invalid", amount_values),
+        ("record_date", pd.isna(record_date), "record_date is invalid", record_date_values),
+    ]
+    invalid = np.zeros(len(frame), dtype=bool)
+    for _, mask, _, _ in checks:
+        invalid |= mask
+
+    row_numbers = frame.index.to_numpy() + 2
+    for pos in np.flatnonzero(invalid):
+        for column_name, mask, pattern, values in checks:
+            if mask[pos]:
+                message = pattern if values is None else f"{pattern}: {values.iloc[pos]}"
+                errors.add(int(row_numbers[pos]), column_name, message, pattern)
+
+    columns: dict[str, np.ndarray] = {
+        "business_key": business_key.to_numpy(dtype=object),
+        "name": _map_unique(name, _blank_to_none, cache, "string"),
+        "amount": amount,
+        "record_date": record_date,
+        "invoice_date": _map_unique(
+            _column_values(frame, "invoice_date"), _parse_dates, cache, "date"
+        ),
+    }
+    for field_name in STRING_FIELDS:
+        text = _clean_string_column(_column_values(frame, field_name))
+        if field_name in INTERNED_FIELDS:
+            columns[field_name] = _map_unique(text, _blank_to_none, cache, "string")
+        else:
+            columns[field_name] = _optional_strings(text)
+    for field_name in DECIMAL_FIELDS:
+        columns[field_name] = _map_unique(
+            _clean_string_column(_column_values(frame, field_name)),
+            _each(_parse_optional_decimal),
+            cache,
+            "decimal",
+        )
+    columns["org_type_branch_no"] = _map_unique(
+        _clean_string_column(_column_values(frame, "org_type_branch_no")),
+        _each(_parse_optional_int),
+        cache,
+        "int",
+    )
+    columns["taxpayer_id"] = _optional_strings(
+        _clean_string_column(_column_values(frame, "taxpayer_id")).str.lstrip("'")
+    )
+    columns["is_duplicate_tank"] = _map_unique(
+        _clean_string_column(_column_values(frame, "is_duplicate_tank")),
+        _each(_parse_optional_bool),
+        cache,
+        "bool",
+    )
 
-        if any(error.row_number == row_number for error in errors):
-            continue
+    valid = ~invalid
+    columns = {field_name: columns[field_name][valid] for field_name in ROW_FIELDS}
+    columns["content_hash"] = content_hashes(columns)
+    columns["row_number"] = row_numbers[valid]
+    return columns
 
-        valid_rows.append(
-            {
-                "business_key": business_key,
-                "name": name,
-                "amount": amount,
-                "record_date": parsed_date,
-                "invoice_date": _parse_optional_date(row.get("invoice_date")),
-                "invoice_no": _as_clean_string(row.get("invoice_no")) or None,
-                "item_description": _as_clean_string(row.get("item_description")) or None,
-                "product_value": _parse_optional_decimal(row.get("product_value")),
-                "tax_value": _parse_optional_decimal(row.get("tax_value")),
-                "total_value": _parse_optional_decimal(row.get("total_value")),
-                "vin_no": _as_clean_string(row.get("vin_no")) or None,
-                "cancel_flag": _as_clean_string(row.get("cancel_flag")) or None,
-                "cancel_product_value": _parse_optional_decimal(row.get("cancel_product_value")),
-                "cancel_tax_value": _parse_optional_decimal(row.get("cancel_tax_value")),
-                "cancel_total_value": _parse_optional_decimal(row.get("cancel_total_value")),
-                "org_type_hq": _as_clean_string(row.get("org_type_hq")) or None,
-                "org_type_branch_no": _parse_optional_int(row.get("org_type_branch_no")),
-                "taxpayer_id": _as_clean_string(row.get("taxpayer_id")).lstrip("'") or None,
-                "sale_price": _parse_optional_decimal(row.get("sale_price")),
-                "com_fn": _parse_optional_decimal(row.get("com_fn")),
-                "com_value": _parse_optional_decimal(row.get("com_value")),
-                "rule_applied": _as_clean_string(row.get("rule_applied")) or None,
-                "is_duplicate_tank": _parse_optional_bool(row.get("is_duplicate_tank")),
-                "group_id": _as_clean_string(row.get("group_id")) or None,
-            }
-        )
 
-    return valid_rows, errors
+@dataclass
+class SheetResult:
+    sheet_name: str
+    errors: ValidationErrors
+    rows: ValidatedBatch = field(default_factory=ValidatedBatch)
+    total_rows: int = 0
+    missing_columns: list[str] = field(default_factory=list)
+    parse_counts: ParseCache = field(default_factory=ParseCache)
+
+
+def parse_sheet(
+    path: str | Path,
+    sheet_name: str,
+    chunk_size: int = 5000,
+    max_details: int | None = None,
+    cache_size: int = 50_000,
+) -> SheetResult:
+    # Process-pool entry point: parses and validates one sheet end to end and
+    # returns only picklable results. Sheets without any header are skipped.
+    result = SheetResult(
+        sheet_name=sheet_name,
+        errors=ValidationErrors(max_details=max_details, sheet_name=sheet_name),
+    )
+    cache = ParseCache(max_entries=cache_size)
+    batches: list[ValidatedBatch] = []
+    with open_upload_source(path) as source:
+        for frame in iter_raw_excel_chunks(source, chunk_size, sheet_name):
+            if frame.columns.empty:
+                break
+            frame = apply_column_mapping(frame)
+            if result.total_rows == 0:
+                result.missing_columns = validate_required_columns(frame)
+                if result.missing_columns:
+                    break
+            valid_rows, _ = validate_and_transform_rows(frame, result.errors, cache)
+            batches.append(valid_rows)
+            result.total_rows += len(frame)
+    result.rows = ValidatedBatch.concat(batches)
+    result.parse_counts = cache.counts()
+    return result
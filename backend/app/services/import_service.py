@@ -1,19 +1,97 @@
 from __future__ import annotations
 
+import time
+import zlib
+from collections.abc import Iterator
+from concurrent.futures import Executor, wait
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from pathlib import Path
 from typing import Any
 
-from sqlalchemy import select
+import numpy as np
+from sqlalchemy import String, bindparam, delete, func, insert, select, text, update
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import DBAPIError
 from sqlalchemy.orm import Session
 
-from app.db.models import ImportError, ImportJob, SalesRecord
-from app.services.excel_service import ValidationErrorItem
+from app.db.models import ImportError, ImportErrorSummary, ImportJob, SalesRecord
+from app.services.excel_service import ErrorPattern, ValidatedBatch, ValidationErrors
 
+UPDATABLE_FIELDS = [
+    "name",
+    "amount",
+    "record_date",
+    "invoice_date",
+    "invoice_no",
+    "item_description",
+    "product_value",
+    "tax_value",
+    "total_value",
+    "vin_no",
+    "cancel_flag",
+    "cancel_product_value",
+    "cancel_tax_value",
+    "cancel_total_value",
+    "org_type_hq",
+    "org_type_branch_no",
+    "taxpayer_id",
+    "sale_price",
+    "com_fn",
+    "com_value",
+    "rule_applied",
+    "is_duplicate_tank",
+    "group_id",
+    "content_hash",
+]
+SALES_RECORD_FIELDS = ["business_key", *UPDATABLE_FIELDS]
+PENDING_STATUSES = ("queued", "running")
+FINISHED_STATUSES = ("success", "completed_with_errors")
+STAGING_TABLE = "#sales_records_staging"
+# Keeps `IN (...)` lookups well below the SQL Server (2100) and SQLite parameter limits.
+LOOKUP_BATCH_SIZE = 500
+ERROR_INSERT_BATCH_SIZE = 1000
+# Attempts per partition write when SQL Server picks it as a deadlock victim.
+DEADLOCK_ATTEMPTS = 3
+DEADLOCK_BACKOFF_SECONDS = 0.1
 
-def create_job(db: Session, filename: str, correlation_id: str) -> ImportJob:
+
+@dataclass
+class UpsertResult:
+    inserted: int = 0
+    updated: int = 0
+    unchanged: int = 0
+
+    @property
+    def total(self) -> int:
+        return self.inserted + self.updated + self.unchanged
+
+    def add(self, other: UpsertResult) -> None:
+        self.inserted += other.inserted
+        self.updated += other.updated
+        self.unchanged += other.unchanged
+
+
+def create_job(
+    db: Session,
+    filename: str,
+    correlation_id: str,
+    status: str = "running",
+    stats: dict[str, Any] | None = None,
+    source_path: str | None = None,
+    source_sheets: list[str] | None = None,
+    content_hash: str | None = None,
+    instance_id: str | None = None,
+) -> ImportJob:
     job = ImportJob(
         filename=filename,
         correlation_id=correlation_id,
-        status="running",
+        status=status,
+        stats=stats,
+        source_path=source_path,
+        source_sheets=source_sheets,
+        content_hash=content_hash,
+        instance_id=instance_id,
     )
     db.add(job)
     db.commit()
@@ -21,6 +99,72 @@ def create_job(db: Session, filename: str, correlation_id: str) -> ImportJob:
     return job
 
 
+def find_finished_job(
+    db: Session, content_hash: str, sheets: list[str] | None = None
+) -> ImportJob | None:
+    # Latest finished import of the same file content and sheet selection.
+    jobs = db.scalars(
+        select(ImportJob)
+        .where(ImportJob.content_hash == content_hash, ImportJob.status.in_(FINISHED_STATUSES))
+        .order_by(ImportJob.id.desc())
+    )
+    return next((job for job in jobs if (job.source_sheets or None) == sheets), None)
+
+
+def mark_job_running(db: Session, job: ImportJob) -> ImportJob:
+    job.status = "running"
+    db.commit()
+    db.refresh(job)
+    return job
+
+
+def fail_interrupted_jobs(db: Session, instance_id: str) -> int:
+    # This instance's jobs still queued or running at startup were lost with its
+    # previous process. Jobs of other instances may still be running there.
+    jobs = db.scalars(
+        select(ImportJob).where(
+            ImportJob.status.in_(PENDING_STATUSES), ImportJob.instance_id == instance_id
+        )
+    ).all()
+    for job in jobs:
+        job.status = "failed"
+        job.message = "Import interrupted by a server restart"
+    db.commit()
+    return len(jobs)
+
+
+def expire_failed_job_sources(db: Session, max_age_seconds: float) -> int:
+    # Deletes uploads kept for resuming jobs that failed more than
+    # `max_age_seconds` ago; such jobs can then no longer be resumed. Each job
+    # is released with a conditional update, so one being resumed right now
+    # keeps its file.
+    cutoff = datetime.utcnow() - timedelta(seconds=max_age_seconds)
+    expired = db.execute(
+        select(ImportJob.id, ImportJob.source_path).where(
+            ImportJob.status == "failed",
+            ImportJob.source_path.is_not(None),
+            ImportJob.updated_at < cutoff,
+        )
+    ).all()
+    removed = 0
+    for job_id, source_path in expired:
+        released = db.execute(
+            update(ImportJob)
+            .where(
+                ImportJob.id == job_id,
+                ImportJob.status == "failed",
+                ImportJob.source_path == source_path,
+            )
+            .values(source_path=None)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        db.commit()
+        if released == 1:
+            Path(source_path).unlink(missing_ok=True)
+            removed += 1
+    return removed
+
+
 def set_job_failed(db: Session, job: ImportJob, message: str) -> ImportJob:
     job.status = "failed"
     job.message = message
@@ -29,64 +173,350 @@ def set_job_failed(db: Session, job: ImportJob, message: str) -> ImportJob:
     return job
 
 
+def queue_job_resume(db: Session, job: ImportJob, instance_id: str) -> ImportJob | None:
+    # One conditional update, so of concurrent resume requests only one moves
+    # the job out of "failed"; the others get None.
+    claimed = db.execute(
+        update(ImportJob)
+        .where(ImportJob.id == job.id, ImportJob.status == "failed")
+        .values(
+            status="queued",
+            instance_id=instance_id,
+            message=f"Resuming after row {job.checkpoint_row}",
+        )
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    db.commit()
+    if claimed != 1:
+        return None
+    db.refresh(job)
+    return job
+
+
+def reset_import_errors(db: Session, job_id: int, after_row: int = 0) -> int:
+    # Drops errors saved past the last checkpoint, which a resumed job reports
+    # again, and returns how many are kept.
+    db.execute(
+        delete(ImportError).where(ImportError.job_id == job_id, ImportError.row_number > after_row)
+    )
+    return db.scalar(
+        select(func.count()).select_from(ImportError).where(ImportError.job_id == job_id)
+    ) or 0
+
+
 def save_validation_errors(
-    db: Session, job_id: int, errors: list[ValidationErrorItem]
+    db: Session, job_id: int, errors: ValidationErrors, commit: bool = True
 ) -> None:
-    if not errors:
-        return
-    db.add_all(
-        [
-            ImportError(
-                job_id=job_id,
-                row_number=error.row_number,
-                column_name=error.column_name,
-                error_message=error.error_message,
+    # Only persists details not saved yet, so it can be called after every chunk.
+    # Written as plain executemany batches: no ORM objects and no identity
+    # fetch per row.
+    pending = errors.take_unsaved()
+    table = ImportError.__table__
+    for start in range(0, len(pending), ERROR_INSERT_BATCH_SIZE):
+        db.execute(
+            insert(table),
+            [
+                {
+                    "job_id": job_id,
+                    "sheet_name": error.sheet_name,
+                    "row_number": error.row_number,
+                    "column_name": error.column_name,
+                    "error_message": error.error_message,
+                }
+                for error in pending[start : start + ERROR_INSERT_BATCH_SIZE]
+            ],
+        )
+    if commit:
+        db.commit()
+
+
+def save_error_summaries(db: Session, job_id: int, errors: ValidationErrors) -> None:
+    # Replaces the job's summary rows; there is one per pattern, so this stays
+    # small however many rows failed.
+    table = ImportErrorSummary.__table__
+    db.execute(delete(table).where(table.c.job_id == job_id))
+    if errors.patterns:
+        db.execute(
+            insert(table),
+            [
+                {
+                    "job_id": job_id,
+                    "sheet_name": sheet_name,
+                    "column_name": column_name,
+                    "error_pattern": pattern[:255],
+                    "occurrences": summary.occurrences,
+                    "sample_rows": summary.sample_rows,
+                }
+                for (sheet_name, column_name, pattern), summary in errors.patterns.items()
+            ],
+        )
+
+
+def load_error_summaries(db: Session, job_id: int, errors: ValidationErrors) -> None:
+    # Seeds a resumed job's accumulator with the summaries of its committed rows.
+    for summary in db.scalars(
+        select(ImportErrorSummary).where(ImportErrorSummary.job_id == job_id)
+    ):
+        errors.patterns[(summary.sheet_name, summary.column_name, summary.error_pattern)] = (
+            ErrorPattern(summary.occurrences, list(summary.sample_rows))
+        )
+
+
+def get_error_summaries(db: Session, job_id: int) -> list[ImportErrorSummary]:
+    return list(
+        db.scalars(
+            select(ImportErrorSummary)
+            .where(ImportErrorSummary.job_id == job_id)
+            .order_by(ImportErrorSummary.occurrences.desc(), ImportErrorSummary.id)
+        )
+    )
+
+
+def get_import_errors_page(
+    db: Session, job_id: int, after_id: int = 0, limit: int = 500
+) -> list[ImportError]:
+    # Keyset page on (job_id, id): cost depends on the page size, not the offset.
+    return list(
+        db.scalars(
+            select(ImportError)
+            .where(ImportError.job_id == job_id, ImportError.id > after_id)
+            .order_by(ImportError.id)
+            .limit(limit)
+        )
+    )
+
+
+def iter_import_errors(
+    db: Session, job_id: int, batch_size: int = 1000
+) -> Iterator[tuple[int, str | None, int, str | None, str]]:
+    # Streams from a server-side cursor, holding at most one batch of rows.
+    result = db.execute(
+        select(
+            ImportError.id,
+            ImportError.sheet_name,
+            ImportError.row_number,
+            ImportError.column_name,
+            ImportError.error_message,
+        )
+        .where(ImportError.job_id == job_id)
+        .order_by(ImportError.id)
+        .execution_options(yield_per=batch_size)
+    )
+    for row in result:
+        yield row.id, row.sheet_name, row.row_number, row.column_name, row.error_message
+
+
+def upsert_sales_records(
+    db: Session,
+    rows: ValidatedBatch | list[dict[str, Any]],
+    batch_size: int = 5000,
+    commit: bool = True,
+) -> UpsertResult:
+    if not isinstance(rows, ValidatedBatch):
+        rows = ValidatedBatch.from_rows(rows)
+    if not len(rows):
+        return UpsertResult()
+    if db.get_bind().dialect.name == "mssql":
+        result = _merge_sales_records(db, rows, batch_size)
+    else:
+        result = _upsert_sales_records_core(db, rows, batch_size)
+    if commit:
+        db.commit()
+    else:
+        db.flush()
+    return result
+
+
+def partition_rows(rows: ValidatedBatch, partitions: int) -> list[ValidatedBatch]:
+    # crc32 is stable across processes, so a business key always lands in the
+    # same partition and partitions never touch the same record. Row order is
+    # kept, so last-wins deduplication is unchanged.
+    buckets = np.fromiter(
+        (zlib.crc32(key.encode("utf-8")) % partitions for key in rows.columns["business_key"]),
+        dtype=np.int64,
+        count=len(rows),
+    )
+    return [rows.take(np.flatnonzero(buckets == partition)) for partition in range(partitions)]
+
+
+def upsert_sales_records_parallel(
+    engine: Engine,
+    rows: ValidatedBatch,
+    partitions: int,
+    executor: Executor,
+    batch_size: int = 5000,
+) -> UpsertResult:
+    # Writes each partition on its own session and connection at the same time.
+    # Partitions commit independently; the first failure is raised once all of
+    # them have finished, so no write is still running when the caller fails.
+    futures = [
+        executor.submit(_upsert_partition, engine, partition, batch_size)
+        for partition in partition_rows(rows, partitions)
+        if len(partition)
+    ]
+    wait(futures)
+    result = UpsertResult()
+    for future in futures:
+        result.add(future.result())
+    return result
+
+
+def _is_deadlock(exc: DBAPIError) -> bool:
+    # SQL Server error 1205: the transaction was chosen as a deadlock victim
+    # and rolled back.
+    return "(1205)" in str(exc.orig)
+
+
+def _upsert_partition(engine: Engine, rows: ValidatedBatch, batch_size: int) -> UpsertResult:
+    # Keys are disjoint across partitions, but MERGE's key-range locks also
+    # cover the gaps between keys, so concurrent partitions can still deadlock.
+    # Each partition commits as one transaction, so a victim is replayed whole.
+    attempt = 1
+    while True:
+        try:
+            with Session(engine) as db:
+                return upsert_sales_records(db, rows, batch_size=batch_size, commit=True)
+        except DBAPIError as exc:
+            if attempt >= DEADLOCK_ATTEMPTS or not _is_deadlock(exc):
+                raise
+        time.sleep(DEADLOCK_BACKOFF_SECONDS * attempt)
+        attempt += 1
+
+
+def _upsert_sales_records_core(db: Session, rows: ValidatedBatch, batch_size: int) -> UpsertResult:
+    # Fallback for dialects without MERGE. Rows sharing a business_key collapse
+    # onto one record (last row wins), matching the MERGE path, and records
+    # whose stored content hash matches are left alone. Parameters are named
+    # here so SQLAlchemy can apply its type conversions for the driver.
+    latest = {key: position for position, key in enumerate(rows.columns["business_key"])}
+    rows = rows.take(np.fromiter(latest.values(), dtype=np.intp, count=len(latest)))
+    keys = rows.columns["business_key"]
+    hashes = rows.columns["content_hash"]
+    is_new = np.ones(len(rows), dtype=bool)
+    is_changed = np.zeros(len(rows), dtype=bool)
+    for start in range(0, len(keys), LOOKUP_BATCH_SIZE):
+        batch_keys = keys[start : start + LOOKUP_BATCH_SIZE].tolist()
+        stored = {
+            key: digest
+            for key, digest in db.execute(
+                select(SalesRecord.business_key, SalesRecord.content_hash).where(
+                    SalesRecord.business_key.in_(batch_keys)
+                )
             )
-            for error in errors
+        }
+        for offset, key in enumerate(batch_keys):
+            if key in stored:
+                is_new[start + offset] = False
+                is_changed[start + offset] = stored[key] != hashes[start + offset]
+
+    table = SalesRecord.__table__
+    inserts = rows.take(np.flatnonzero(is_new))
+    updates = rows.take(np.flatnonzero(is_changed))
+    update_statement = (
+        update(table)
+        .where(table.c.business_key == bindparam("key"))
+        .values({name: bindparam(f"new_{name}") for name in UPDATABLE_FIELDS})
+    )
+    update_names = ["key", *(f"new_{name}" for name in UPDATABLE_FIELDS)]
+    for start in range(0, len(rows), batch_size):
+        insert_params = [
+            dict(zip(SALES_RECORD_FIELDS, values))
+            for values in inserts.tuples(SALES_RECORD_FIELDS, start, start + batch_size)
+        ]
+        if insert_params:
+            db.execute(insert(table), insert_params)
+        update_params = [
+            dict(zip(update_names, values))
+            for values in updates.tuples(SALES_RECORD_FIELDS, start, start + batch_size)
         ]
+        if update_params:
+            db.execute(update_statement, update_params)
+    return UpsertResult(
+        inserted=len(inserts),
+        updated=len(updates),
+        unchanged=len(rows) - len(inserts) - len(updates),
     )
-    db.commit()
 
 
-def upsert_sales_records(db: Session, rows: list[dict[str, Any]]) -> int:
-    imported = 0
-    updatable_fields = [
-        "name",
-        "amount",
-        "record_date",
-        "invoice_date",
-        "invoice_no",
-        "item_description",
-        "product_value",
-        "tax_value",
-        "total_value",
-        "vin_no",
-        "cancel_flag",
-        "cancel_product_value",
-        "cancel_tax_value",
-        "cancel_total_value",
-        "org_type_hq",
-        "org_type_branch_no",
-        "taxpayer_id",
-        "sale_price",
-        "com_fn",
-        "com_value",
-        "rule_applied",
-        "is_duplicate_tank",
-        "group_id",
-    ]
-    for row in rows:
-        existing = db.scalar(
-            select(SalesRecord).where(SalesRecord.business_key == row["business_key"])
+def _staging_column_type(db: Session, field_name: str) -> str:
+    column_type = SalesRecord.__table__.c[field_name].type
+    if isinstance(column_type, String):
+        # Temp tables live in tempdb, whose collation may differ from the database's.
+        return f"NVARCHAR({column_type.length}) COLLATE DATABASE_DEFAULT"
+    return column_type.compile(dialect=db.get_bind().dialect)
+
+
+def _merge_sales_records(db: Session, rows: ValidatedBatch, batch_size: int) -> UpsertResult:
+    # The staging table is a local temp table, so it is private to the session's
+    # connection and disappears with it.
+    columns = ", ".join(
+        f"{name} {_staging_column_type(db, name)} NULL" for name in SALES_RECORD_FIELDS
+    )
+    db.execute(
+        text(f"IF OBJECT_ID('tempdb..{STAGING_TABLE}') IS NOT NULL DROP TABLE {STAGING_TABLE}")
+    )
+    db.execute(text(f"CREATE TABLE {STAGING_TABLE} (row_no INT NOT NULL, {columns})"))
+
+    # Positional tuples go straight to pyodbc's (fast) executemany.
+    insert_staging = (
+        f"INSERT INTO {STAGING_TABLE} (row_no, {', '.join(SALES_RECORD_FIELDS)}) "
+        f"VALUES ({', '.join('?' * (len(SALES_RECORD_FIELDS) + 1))})"
+    )
+    connection = db.connection()
+    for start in range(0, len(rows), batch_size):
+        connection.exec_driver_sql(
+            insert_staging,
+            [
+                (start + offset, *values)
+                for offset, values in enumerate(
+                    rows.tuples(SALES_RECORD_FIELDS, start, start + batch_size)
+                )
+            ],
         )
-        if existing is None:
-            db.add(SalesRecord(**row))
-        else:
-            for field_name in updatable_fields:
-                setattr(existing, field_name, row.get(field_name))
-        imported += 1
-    db.commit()
-    return imported
+
+    target = SalesRecord.__tablename__
+    update_set = ", ".join(f"target.{name} = source.{name}" for name in UPDATABLE_FIELDS)
+    insert_columns = ", ".join(SALES_RECORD_FIELDS)
+    insert_values = ", ".join(f"source.{name}" for name in SALES_RECORD_FIELDS)
+    counts = db.execute(
+        text(
+            f"""
+            SET NOCOUNT ON;
+            DECLARE @merge_actions TABLE (merge_action NVARCHAR(10));
+            MERGE {target} WITH (HOLDLOCK) AS target
+            USING (
+                SELECT {insert_columns}
+                FROM (
+                    SELECT *, ROW_NUMBER() OVER (
+                        PARTITION BY business_key ORDER BY row_no DESC
+                    ) AS key_rank
+                    FROM {STAGING_TABLE}
+                ) AS ranked
+                WHERE key_rank = 1
+            ) AS source
+            ON target.business_key = source.business_key
+            WHEN MATCHED AND (
+                target.content_hash IS NULL OR target.content_hash <> source.content_hash
+            ) THEN
+                UPDATE SET {update_set}, target.updated_at = SYSUTCDATETIME()
+            WHEN NOT MATCHED BY TARGET THEN
+                INSERT ({insert_columns}, created_at, updated_at)
+                VALUES ({insert_values}, SYSUTCDATETIME(), SYSUTCDATETIME())
+            OUTPUT $action INTO @merge_actions;
+            SELECT
+                COALESCE(SUM(CASE WHEN merge_action = 'INSERT' THEN 1 ELSE 0 END), 0),
+                COALESCE(SUM(CASE WHEN merge_action = 'UPDATE' THEN 1 ELSE 0 END), 0)
+            FROM @merge_actions;
+            """
+        )
+    ).one()
+    db.execute(text(f"DROP TABLE {STAGING_TABLE}"))
+    # Matched rows with an equal hash produce no MERGE action.
+    distinct_keys = len(set(rows.columns["business_key"]))
+    inserted, updated = int(counts[0]), int(counts[1])
+    return UpsertResult(
+        inserted=inserted, updated=updated, unchanged=distinct_keys - inserted - updated
+    )
 
 
 def finalize_job(
@@ -96,9 +526,19 @@ def finalize_job(
     imported_rows: int,
     failed_rows: int,
     message: str | None = None,
+    inserted_rows: int = 0,
+    updated_rows: int = 0,
+    error_count: int = 0,
+    unchanged_rows: int = 0,
+    duplicate_rows: int = 0,
 ) -> ImportJob:
     job.total_rows = total_rows
     job.imported_rows = imported_rows
+    job.inserted_rows = inserted_rows
+    job.updated_rows = updated_rows
+    job.unchanged_rows = unchanged_rows
+    job.duplicate_rows = duplicate_rows
+    job.error_count = error_count
     job.failed_rows = failed_rows
     job.status = "success" if failed_rows == 0 else "completed_with_errors"
     job.message = message
@@ -0,0 +1,525 @@
+from __future__ import annotations
+
+import io
+import multiprocessing
+import threading
+from collections.abc import Callable, Iterator
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from pathlib import Path
+from typing import IO, Any
+
+import pandas as pd
+from sqlalchemy.orm import Session
+
+from app.core.config import get_settings
+from app.core.metrics import (
+    IMPORT_BYTES_PER_SECOND,
+    IMPORT_JOBS,
+    IMPORT_ROWS_PER_SECOND,
+    StageTimings,
+)
+from app.db.models import ImportJob
+from app.services.excel_service import (
+    DELIMITED_FORMATS,
+    KeyDeduplicator,
+    ParseCache,
+    SheetResult,
+    ValidatedBatch,
+    ValidationErrors,
+    apply_column_mapping,
+    file_extension,
+    iter_raw_chunks,
+    list_sheet_names,
+    open_upload_source,
+    parse_sheet,
+    select_sheets,
+    validate_and_transform_rows,
+    validate_and_transform_rows_sharded,
+    validate_required_columns,
+)
+from app.services.import_service import (
+    UpsertResult,
+    finalize_job,
+    load_error_summaries,
+    mark_job_running,
+    reset_import_errors,
+    save_error_summaries,
+    save_validation_errors,
+    set_job_failed,
+    upsert_sales_records,
+    upsert_sales_records_parallel,
+)
+from app.services.progress import JobProgress
+from app.services.sales_record_service import clear_sales_record_cache
+
+settings = get_settings()
+_executor: ThreadPoolExecutor | None = None
+_writer_executor: ThreadPoolExecutor | None = None
+_process_pools: dict[str, ProcessPoolExecutor] = {}
+_process_pools_lock = threading.Lock()
+
+
+def get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.import_workers, thread_name_prefix="import-worker"
+        )
+    return _executor
+
+
+def get_writer_pool() -> ThreadPoolExecutor:
+    global _writer_executor
+    if _writer_executor is None:
+        _writer_executor = ThreadPoolExecutor(
+            max_workers=settings.write_partitions, thread_name_prefix="import-writer"
+        )
+    return _writer_executor
+
+
+def _get_process_pool(name: str, max_workers: int) -> ProcessPoolExecutor:
+    # Spawned rather than forked: the parent is a threaded server process.
+    with _process_pools_lock:
+        pool = _process_pools.get(name)
+        if pool is None:
+            pool = _process_pools[name] = ProcessPoolExecutor(
+                max_workers=max_workers, mp_context=multiprocessing.get_context("spawn")
+            )
+        return pool
+
+
+def get_sheet_pool() -> ProcessPoolExecutor:
+    return _get_process_pool("sheets", settings.sheet_workers)
+
+
+def get_validation_pool() -> ProcessPoolExecutor:
+    return _get_process_pool("validation", settings.validation_workers)
+
+
+def shutdown_executor() -> None:
+    global _executor, _writer_executor
+    if _executor is not None:
+        _executor.shutdown(wait=True, cancel_futures=True)
+        _executor = None
+    if _writer_executor is not None:
+        _writer_executor.shutdown(wait=True, cancel_futures=True)
+        _writer_executor = None
+    with _process_pools_lock:
+        for pool in _process_pools.values():
+            pool.shutdown(wait=True, cancel_futures=True)
+        _process_pools.clear()
+
+
+def submit_import_job(
+    session_factory: Callable[[], Session],
+    job_id: int,
+    path: Path,
+    sheets: list[str] | None = None,
+) -> Future[None]:
+    return get_executor().submit(run_import_job, session_factory, job_id, path, sheets)
+
+
+def run_import_job(
+    session_factory: Callable[[], Session],
+    job_id: int,
+    path: Path,
+    sheets: list[str] | None = None,
+) -> None:
+    db = session_factory()
+    keep_source = False
+    try:
+        job = db.get(ImportJob, job_id)
+        if job is None:
+            return
+        try:
+            if sheets:
+                job = process_workbook_import(db, job, path, sheets)
+            else:
+                with open_upload_source(path) as source:
+                    job = process_import(db, job, source, extension=file_extension(path.name))
+        except Exception as exc:  # noqa: BLE001
+            db.rollback()
+            job = set_job_failed(db, job, f"Import failed: {exc}")
+            IMPORT_JOBS.inc(status=job.status)
+            JobProgress(job_id).finish(job)
+        # A failed job keeps its upload so it can be resumed from its checkpoint.
+        keep_source = job.status == "failed" and job.source_path is not None
+        if not keep_source and job.source_path:
+            job.source_path = None
+            db.commit()
+    finally:
+        db.close()
+        if not keep_source:
+            path.unlink(missing_ok=True)
+
+
+def process_import(
+    db: Session, job: ImportJob, source: IO[bytes], extension: str = ".xlsx"
+) -> ImportJob:
+    source.seek(0, io.SEEK_END)
+    size_bytes = source.tell()
+    source.seek(0)
+
+    progress = JobProgress(job.id)
+    timings = _stage_timings(job)
+    cache = ParseCache(max_entries=settings.parse_cache_size)
+    job, total_rows = _run_pipeline(db, job, source, extension, progress, timings, cache)
+    stats = _job_stats(timings, total_rows, size_bytes)
+    stats["parse_cache"] = cache.stats()
+    return _complete_job(db, job, progress, timings, stats)
+
+
+def process_workbook_import(
+    db: Session, job: ImportJob, path: Path, sheets: list[str]
+) -> ImportJob:
+    progress = JobProgress(job.id)
+    timings = _stage_timings(job)
+    job, results = _run_workbook_pipeline(db, job, path, sheets, progress, timings)
+    total_rows = sum(result.total_rows for result in results)
+    stats = _job_stats(timings, total_rows, path.stat().st_size)
+    stats["sheets"] = {result.sheet_name: result.total_rows for result in results}
+    counts = ParseCache()
+    for result in results:
+        counts.merge(result.parse_counts)
+    stats["parse_cache"] = counts.stats()
+    return _complete_job(db, job, progress, timings, stats)
+
+
+def _stage_timings(job: ImportJob) -> StageTimings:
+    # Continues the job's stored durations. Once a run has completed (a failed
+    # job being resumed) they were already observed by that run.
+    stats = job.stats or {}
+    return StageTimings(stats.get("stages"), reported="total_seconds" in stats)
+
+
+def _complete_job(
+    db: Session,
+    job: ImportJob,
+    progress: JobProgress,
+    timings: StageTimings,
+    stats: dict[str, Any],
+) -> ImportJob:
+    job.stats = stats
+    db.commit()
+    timings.observe()
+    IMPORT_JOBS.inc(status=job.status)
+    if stats["rows"]:
+        IMPORT_ROWS_PER_SECOND.observe(stats["rows_per_sec"])
+        IMPORT_BYTES_PER_SECOND.observe(stats["bytes_per_sec"])
+    # Published after the final commit, so a subscriber that finds the job still
+    # pending in the database is guaranteed to receive this event.
+    progress.finish(job)
+    return job
+
+
+def _job_stats(timings: StageTimings, total_rows: int, size_bytes: int) -> dict[str, Any]:
+    total_seconds = timings.total
+    return {
+        "stages": timings.as_dict(),
+        "total_seconds": round(total_seconds, 4),
+        "rows": total_rows,
+        "bytes": size_bytes,
+        "rows_per_sec": round(total_rows / total_seconds, 1) if total_seconds else 0.0,
+        "bytes_per_sec": round(size_bytes / total_seconds, 1) if total_seconds else 0.0,
+    }
+
+
+def _pipeline_chunk_size() -> int:
+    # In parallel mode a chunk is read large enough to give every worker a shard.
+    if settings.validation_workers > 1:
+        return max(
+            settings.excel_chunk_size,
+            settings.validation_workers * settings.validation_shard_size,
+        )
+    return settings.excel_chunk_size
+
+
+def _validate_chunk(
+    frame: pd.DataFrame, errors: ValidationErrors, cache: ParseCache
+) -> tuple[ValidatedBatch, ValidationErrors]:
+    if settings.validation_workers > 1:
+        return validate_and_transform_rows_sharded(
+            frame, get_validation_pool(), settings.validation_shard_size, errors, cache
+        )
+    return validate_and_transform_rows(frame, errors, cache)
+
+
+def _write_batches(
+    db: Session,
+    rows: ValidatedBatch,
+    upserted: UpsertResult,
+    timings: StageTimings,
+    on_commit: Callable[[int], None],
+) -> None:
+    # Each batch is its own transaction, so locks and log growth are bounded by
+    # `commit_batch_size` rows. `on_commit` receives the rows written so far and
+    # records the checkpoint in the same transaction. Cached sales_records reads
+    # are dropped after every batch, including one whose partitions partly
+    # committed before a failure.
+    size = settings.commit_batch_size
+    start = 0
+    for stop in [*range(size, len(rows), size), len(rows)]:
+        try:
+            with timings.stage("upsert"):
+                upserted.add(_upsert(db, rows[start:stop]))
+            on_commit(stop)
+            with timings.stage("commit"):
+                db.commit()
+        finally:
+            clear_sales_record_cache()
+        start = stop
+
+
+def _upsert(db: Session, rows: ValidatedBatch) -> UpsertResult:
+    if settings.write_partitions > 1 and len(rows):
+        # This session's pending work (the chunk's errors) is committed first so
+        # the partition sessions never wait on its locks.
+        db.commit()
+        return upsert_sales_records_parallel(
+            db.get_bind(),
+            rows,
+            settings.write_partitions,
+            get_writer_pool(),
+            batch_size=settings.upsert_batch_size,
+        )
+    return upsert_sales_records(db, rows, batch_size=settings.upsert_batch_size, commit=False)
+
+
+def _record_counts(job: ImportJob, upserted: UpsertResult) -> None:
+    job.imported_rows = upserted.total
+    job.inserted_rows = upserted.inserted
+    job.updated_rows = upserted.updated
+    job.unchanged_rows = upserted.unchanged
+
+
+def _reject(db: Session, job: ImportJob, message: str) -> ImportJob:
+    # The file itself is unusable, so there is nothing to resume.
+    job.source_path = None
+    return set_job_failed(db, job, message)
+
+
+def _format_label(extension: str) -> str:
+    return extension.lstrip(".") if extension in DELIMITED_FORMATS else "excel"
+
+
+def _next_chunk(chunks: Iterator[pd.DataFrame], timings: StageTimings) -> pd.DataFrame | None:
+    with timings.stage("parse"):
+        frame = next(chunks, None)
+    if frame is None:
+        return None
+    with timings.stage("map"):
+        return apply_column_mapping(frame)
+
+
+def _run_pipeline(
+    db: Session,
+    job: ImportJob,
+    source: IO[bytes],
+    extension: str,
+    progress: JobProgress,
+    timings: StageTimings,
+    cache: ParseCache,
+) -> tuple[ImportJob, int]:
+    mark_job_running(db, job)
+    progress.advance("parsing")
+    try:
+        chunks = iter_raw_chunks(source, extension, chunk_size=_pipeline_chunk_size())
+        frame = _next_chunk(chunks, timings)
+    except Exception as exc:  # noqa: BLE001
+        return _reject(db, job, f"Failed to parse {_format_label(extension)} file: {exc}"), 0
+
+    missing_columns = validate_required_columns(frame)
+    if missing_columns:
+        msg = f"Missing required columns: {', '.join(missing_columns)}"
+        return _reject(db, job, msg), 0
+
+    # A resumed job skips rows up to its checkpoint and carries on from the
+    # counts committed with it. Skipped rows are still validated so the
+    # duplicate policy knows which keys they wrote.
+    resume_row = job.checkpoint_row
+    base_total, base_errors, base_failed = job.total_rows, job.error_count, job.failed_rows
+    saved_errors = reset_import_errors(db, job.id, after_row=resume_row)
+    total_rows = base_total
+    upserted = UpsertResult(job.inserted_rows, job.updated_rows, job.unchanged_rows)
+    validation_errors = ValidationErrors(
+        max_details=max(settings.max_error_details - saved_errors, 0)
+    )
+    load_error_summaries(db, job.id, validation_errors)
+    dedup = KeyDeduplicator(settings.duplicate_key_policy, collapsed=job.duplicate_rows)
+    try:
+        while frame is not None:
+            if resume_row:
+                skipped = frame.index.to_numpy() + 2 <= resume_row
+                if skipped.any():
+                    with timings.stage("validate"):
+                        written, _ = _validate_chunk(
+                            frame[skipped], ValidationErrors(max_details=0), cache
+                        )
+                    dedup.remember(written)
+                frame = frame[~skipped]
+                if frame.empty:
+                    frame = _next_chunk(chunks, timings)
+                    continue
+            progress.advance("validating", parsed=len(frame))
+            with timings.stage("validate"):
+                valid_rows, _ = _validate_chunk(frame, validation_errors, cache)
+            with timings.stage("dedupe"):
+                valid_rows, rewrites = dedup.apply(valid_rows, validation_errors)
+            with timings.stage("save_errors"):
+                save_validation_errors(db, job.id, validation_errors, commit=False)
+            progress.advance("writing", validated=len(frame))
+            chunk_rows = len(frame)
+            last_row = int(frame.index[-1]) + 2 if chunk_rows else job.checkpoint_row
+            written_before = upserted.total
+
+            def checkpoint(written: int) -> None:
+                # Only a fully written chunk moves the checkpoint; an earlier
+                # batch of it is simply rewritten (as unchanged) on resume.
+                if written == len(valid_rows):
+                    job.checkpoint_row = last_row
+                    job.total_rows = total_rows + chunk_rows
+                    job.error_count = base_errors + validation_errors.total
+                    job.failed_rows = base_failed + validation_errors.failed_rows
+                    job.duplicate_rows = dedup.collapsed
+                    _record_counts(job, upserted)
+                    save_error_summaries(db, job.id, validation_errors)
+
+            if len(rewrites):
+                # Later rows of keys an earlier chunk wrote: last one wins, but
+                # they are counted as duplicates, not in the write totals.
+                _write_batches(db, rewrites, UpsertResult(), timings, lambda _: None)
+            _write_batches(db, valid_rows, upserted, timings, checkpoint)
+            total_rows += chunk_rows
+            progress.advance("parsing", written=upserted.total - written_before)
+            frame = _next_chunk(chunks, timings)
+    except Exception as exc:  # noqa: BLE001
+        db.rollback()
+        msg = (
+            f"Import failed after {total_rows} rows "
+            f"(committed through row {job.checkpoint_row}): {exc}"
+        )
+        return set_job_failed(db, job, msg), total_rows
+
+    job = finalize_job(
+        db,
+        job,
+        total_rows=total_rows,
+        imported_rows=upserted.total,
+        failed_rows=base_failed + validation_errors.failed_rows,
+        message="Import finished",
+        inserted_rows=upserted.inserted,
+        updated_rows=upserted.updated,
+        unchanged_rows=upserted.unchanged,
+        duplicate_rows=dedup.collapsed,
+        error_count=base_errors + validation_errors.total,
+    )
+    return job, total_rows
+
+
+def _run_workbook_pipeline(
+    db: Session,
+    job: ImportJob,
+    path: Path,
+    sheets: list[str],
+    progress: JobProgress,
+    timings: StageTimings,
+) -> tuple[ImportJob, list[SheetResult]]:
+    # Sheets are parsed and validated concurrently in worker processes, then
+    # written as one stream so the job costs about as much as its largest sheet.
+    mark_job_running(db, job)
+    progress.advance("parsing")
+    try:
+        sheet_names = select_sheets(list_sheet_names(path), sheets)
+    except Exception as exc:  # noqa: BLE001
+        return _reject(db, job, f"Failed to parse excel file: {exc}"), []
+
+    pool = get_sheet_pool()
+    futures = {
+        pool.submit(
+            parse_sheet,
+            path,
+            name,
+            settings.excel_chunk_size,
+            settings.max_error_details,
+            settings.parse_cache_size,
+        ): position
+        for position, name in enumerate(sheet_names)
+    }
+    results: list[SheetResult | None] = [None] * len(sheet_names)
+    try:
+        with timings.stage("parse_validate"):
+            for future in as_completed(futures):
+                result = future.result()
+                results[futures[future]] = result
+                progress.advance(
+                    "validating", parsed=result.total_rows, validated=result.total_rows
+                )
+    except Exception as exc:  # noqa: BLE001
+        for future in futures:
+            future.cancel()
+        return set_job_failed(db, job, f"Failed to parse excel file: {exc}"), []
+    sheet_results = [result for result in results if result is not None]
+
+    missing = [
+        f"{result.sheet_name} ({', '.join(result.missing_columns)})"
+        for result in sheet_results
+        if result.missing_columns
+    ]
+    if missing:
+        msg = f"Missing required columns: {'; '.join(missing)}"
+        return _reject(db, job, msg), []
+
+    # "First" and "last" follow the workbook's sheet order. Rejections are
+    # found sheet by sheet so each is reported against its own sheet.
+    dedup = KeyDeduplicator(settings.duplicate_key_policy)
+    with timings.stage("dedupe"):
+        if dedup.policy == "reject":
+            for result in sheet_results:
+                result.rows, _ = dedup.apply(result.rows, result.errors)
+        valid_rows = ValidatedBatch.concat(result.rows for result in sheet_results)
+        if dedup.policy != "reject":
+            valid_rows, _ = dedup.apply(valid_rows, ValidationErrors())
+    validation_errors = ValidationErrors(max_details=settings.max_error_details)
+    for result in sheet_results:
+        validation_errors.merge(result.errors)
+    total_rows = sum(result.total_rows for result in sheet_results)
+    # Re-parsing is deterministic, so a resumed job skips the valid rows it has
+    # already committed; its errors were saved with the first batch.
+    resume_row = job.checkpoint_row
+    upserted = UpsertResult(job.inserted_rows, job.updated_rows, job.unchanged_rows)
+
+    def checkpoint(written: int) -> None:
+        job.checkpoint_row = resume_row + written
+        _record_counts(job, upserted)
+
+    try:
+        if not resume_row:
+            with timings.stage("save_errors"):
+                reset_import_errors(db, job.id)
+                save_validation_errors(db, job.id, validation_errors, commit=False)
+                save_error_summaries(db, job.id, validation_errors)
+        progress.advance("writing")
+        _write_batches(db, valid_rows[resume_row:], upserted, timings, checkpoint)
+        progress.advance("writing", written=upserted.total)
+    except Exception as exc:  # noqa: BLE001
+        db.rollback()
+        msg = (
+            f"Import failed after parsing {total_rows} rows "
+            f"(committed {job.checkpoint_row} valid rows): {exc}"
+        )
+        return set_job_failed(db, job, msg), []
+
+    job = finalize_job(
+        db,
+        job,
+        total_rows=total_rows,
+        imported_rows=upserted.total,
+        failed_rows=validation_errors.failed_rows,
+        message=f"Imported {len(sheet_results)} sheets",
+        inserted_rows=upserted.inserted,
+        updated_rows=upserted.updated,
+        unchanged_rows=upserted.unchanged,
+        duplicate_rows=dedup.collapsed,
+        error_count=validation_errors.total,
+    )
+    return job, sheet_results
@@ -0,0 +1,130 @@
+from __future__ import annotations
+
+import asyncio
+import threading
+import time
+from dataclasses import asdict, dataclass
+
+from app.db.models import ImportJob
+from app.services.import_service import PENDING_STATUSES
+
+
+@dataclass
+class ProgressEvent:
+    job_id: int
+    status: str
+    stage: str
+    rows_parsed: int = 0
+    rows_validated: int = 0
+    rows_written: int = 0
+    rows_per_sec: float = 0.0
+    message: str | None = None
+
+    @property
+    def done(self) -> bool:
+        return self.status not in PENDING_STATUSES
+
+    def as_dict(self) -> dict[str, object]:
+        return asdict(self)
+
+    @classmethod
+    def from_job(cls, job: ImportJob) -> ProgressEvent:
+        return cls(
+            job_id=job.id,
+            status=job.status,
+            stage=job.status if job.status in PENDING_STATUSES else "finished",
+            rows_parsed=job.total_rows,
+            rows_validated=job.total_rows,
+            rows_written=job.imported_rows,
+            message=job.message,
+        )
+
+
+class Subscription:
+    def __init__(self, broker: ProgressBroker, job_id: int) -> None:
+        self.job_id = job_id
+        self.loop = asyncio.get_running_loop()
+        self.queue: asyncio.Queue[ProgressEvent] = asyncio.Queue()
+        self._broker = broker
+
+    async def get(self) -> ProgressEvent:
+        return await self.queue.get()
+
+    def close(self) -> None:
+        self._broker.unsubscribe(self)
+
+
+class ProgressBroker:
+    # In-process pub/sub: import workers publish from their threads and each
+    # SSE client gets events on its own asyncio queue.
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._latest: dict[int, ProgressEvent] = {}
+        self._subscribers: dict[int, list[Subscription]] = {}
+
+    def publish(self, event: ProgressEvent) -> None:
+        with self._lock:
+            if event.done:
+                self._latest.pop(event.job_id, None)
+            else:
+                self._latest[event.job_id] = event
+            subscribers = list(self._subscribers.get(event.job_id, []))
+        for subscription in subscribers:
+            subscription.loop.call_soon_threadsafe(subscription.queue.put_nowait, event)
+
+    def latest(self, job_id: int) -> ProgressEvent | None:
+        with self._lock:
+            return self._latest.get(job_id)
+
+    def subscribe(self, job_id: int) -> Subscription:
+        subscription = Subscription(self, job_id)
+        with self._lock:
+            self._subscribers.setdefault(job_id, []).append(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.job_id, [])
+            if subscription in subscribers:
+                subscribers.remove(subscription)
+            if not subscribers:
+                self._subscribers.pop(subscription.job_id, None)
+
+
+progress_broker = ProgressBroker()
+
+
+class JobProgress:
+    def __init__(self, job_id: int, broker: ProgressBroker = progress_broker) -> None:
+        self.job_id = job_id
+        self.broker = broker
+        self.started = time.perf_counter()
+        self.rows_parsed = 0
+        self.rows_validated = 0
+        self.rows_written = 0
+
+    def advance(
+        self, stage: str, parsed: int = 0, validated: int = 0, written: int = 0
+    ) -> None:
+        self.rows_parsed += parsed
+        self.rows_validated += validated
+        self.rows_written += written
+        elapsed = time.perf_counter() - self.started
+        self.broker.publish(
+            ProgressEvent(
+                job_id=self.job_id,
+                status="running",
+                stage=stage,
+                rows_parsed=self.rows_parsed,
+                rows_validated=self.rows_validated,
+                rows_written=self.rows_written,
+                rows_per_sec=round(self.rows_validated / elapsed, 1) if elapsed > 0 else 0.0,
+            )
+        )
+
+    def finish(self, job: ImportJob) -> None:
+        event = ProgressEvent.from_job(job)
+        elapsed = time.perf_counter() - self.started
+        if elapsed > 0:
+            event.rows_per_sec = round(self.rows_validated / elapsed, 1)
+        self.broker.publish(event)
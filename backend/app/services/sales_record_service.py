@@ -0,0 +1,135 @@
+from __future__ import annotations
+
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Hashable
+from dataclasses import dataclass, field
+from datetime import date
+from typing import Any
+
+from sqlalchemy import and_, or_, select
+from sqlalchemy.orm import Session
+
+from app.core.config import get_settings
+from app.db.models import SALES_RECORD_LIST_FIELDS, SalesRecord
+
+settings = get_settings()
+
+SALES_RECORD_TABLE = SalesRecord.__table__
+READABLE_FIELDS = [
+    column.name for column in SALES_RECORD_TABLE.columns if column.name != "content_hash"
+]
+# Always returned: the next page is requested from the last row's keyset values.
+KEYSET_FIELDS = ["id", "record_date"]
+# Covered by the listing indexes; other fields cost a key lookup per row.
+DEFAULT_FIELDS = SALES_RECORD_LIST_FIELDS
+
+
+@dataclass(frozen=True)
+class SalesRecordFilter:
+    group_id: str | None = None
+    record_date_from: date | None = None
+    record_date_to: date | None = None
+    vin_no: str | None = None
+    invoice_no: str | None = None
+
+
+@dataclass
+class ResultCache:
+    # Short-lived, in-process memo of query results. Entries expire after
+    # `ttl_seconds`; the oldest is evicted beyond `max_entries`. Imports clear
+    # it whenever they commit writes to sales_records. Each clear bumps the
+    # generation, so a result read before a clear is not stored after it.
+    ttl_seconds: float = 30.0
+    max_entries: int = 512
+    _generation: int = field(default=0, repr=False)
+    _entries: OrderedDict[Hashable, tuple[float, Any]] = field(
+        default_factory=OrderedDict, repr=False
+    )
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def get(self, key: Hashable) -> Any | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    @property
+    def generation(self) -> int:
+        with self._lock:
+            return self._generation
+
+    def put(self, key: Hashable, value: Any, generation: int) -> None:
+        if self.ttl_seconds <= 0:
+            return
+        with self._lock:
+            if generation != self._generation:
+                return
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._generation += 1
+
+
+sales_record_cache = ResultCache(
+    ttl_seconds=settings.sales_record_cache_ttl_seconds,
+    max_entries=settings.sales_record_cache_size,
+)
+
+
+def clear_sales_record_cache() -> None:
+    sales_record_cache.clear()
+
+
+def resolve_fields(fields: list[str] | None) -> list[str]:
+    if not fields:
+        return DEFAULT_FIELDS
+    unknown = [name for name in fields if name not in READABLE_FIELDS]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+    requested = [name for name in dict.fromkeys(fields) if name not in KEYSET_FIELDS]
+    return [*KEYSET_FIELDS, *requested]
+
+
+def list_sales_records(
+    db: Session,
+    filters: SalesRecordFilter,
+    fields: list[str],
+    limit: int,
+    after: tuple[date, int] | None = None,
+) -> list[dict[str, Any]]:
+    # Ordered by (record_date, id) and continued from the last row seen, so each
+    # page is an index seek rather than an OFFSET scan.
+    table = SALES_RECORD_TABLE
+    query = select(*(table.c[name] for name in fields))
+    if filters.group_id is not None:
+        query = query.where(table.c.group_id == filters.group_id)
+    if filters.vin_no is not None:
+        query = query.where(table.c.vin_no == filters.vin_no)
+    if filters.invoice_no is not None:
+        query = query.where(table.c.invoice_no == filters.invoice_no)
+    if filters.record_date_from is not None:
+        query = query.where(table.c.record_date >= filters.record_date_from)
+    if filters.record_date_to is not None:
+        query = query.where(table.c.record_date <= filters.record_date_to)
+    if after is not None:
+        after_date, after_id = after
+        query = query.where(
+            or_(
+                table.c.record_date > after_date,
+                and_(table.c.record_date == after_date, table.c.id > after_id),
+            )
+        )
+    query = query.order_by(table.c.record_date, table.c.id).limit(limit)
+    return [dict(row._mapping) for row in db.execute(query)]
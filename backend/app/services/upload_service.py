@@ -0,0 +1,243 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import re
+import shutil
+import tempfile
+import time
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import IO
+from uuid import uuid4
+
+SESSION_METADATA = "session.json"
+COMPLETION_LOCK = "complete.lock"
+UPLOAD_ID_PATTERN = re.compile(r"[0-9a-f]{32}")
+
+
+class UploadTooLargeError(Exception):
+    pass
+
+
+class UploadSessionError(Exception):
+    pass
+
+
+def spool_upload(
+    source: IO[bytes],
+    directory: Path,
+    suffix: str,
+    max_bytes: int,
+    chunk_size: int = 1024 * 1024,
+) -> tuple[Path, int, str]:
+    # Copies the upload to disk one chunk at a time, so a request never holds
+    # more than `chunk_size` bytes of it in memory. Returns the path, size and
+    # SHA-256 of the content, hashed as it streams through.
+    directory.mkdir(parents=True, exist_ok=True)
+    size = 0
+    digest = hashlib.sha256()
+    with tempfile.NamedTemporaryFile(dir=directory, suffix=suffix, delete=False) as target:
+        path = Path(target.name)
+        try:
+            while chunk := source.read(chunk_size):
+                size += len(chunk)
+                if size > max_bytes:
+                    raise UploadTooLargeError(f"Upload exceeds {max_bytes} bytes.")
+                target.write(chunk)
+                digest.update(chunk)
+        except BaseException:
+            target.close()
+            path.unlink(missing_ok=True)
+            raise
+    return path, size, digest.hexdigest()
+
+
+@dataclass
+class UploadSession:
+    # A chunked upload in progress: its metadata plus one file per received
+    # chunk, all in `directory`. Chunks are numbered from 0.
+    upload_id: str
+    directory: Path = field(repr=False)
+    filename: str
+    size: int
+    chunk_size: int
+    sheets: list[str] | None = None
+    job_id: int | None = None
+
+    @property
+    def total_chunks(self) -> int:
+        return -(-self.size // self.chunk_size)
+
+    def chunk_path(self, index: int) -> Path:
+        return self.directory / f"{index:06d}.part"
+
+    def expected_size(self, index: int) -> int:
+        return min(self.chunk_size, self.size - index * self.chunk_size)
+
+    def received(self) -> list[int]:
+        return sorted(int(path.stem) for path in self.directory.glob("*.part"))
+
+    def missing(self) -> list[int]:
+        received = set(self.received())
+        return [index for index in range(self.total_chunks) if index not in received]
+
+    def save(self) -> None:
+        metadata = asdict(self)
+        del metadata["upload_id"], metadata["directory"]
+        (self.directory / SESSION_METADATA).write_text(json.dumps(metadata), encoding="utf-8")
+
+
+def create_upload_session(
+    root: Path, filename: str, size: int, chunk_size: int, sheets: list[str] | None = None
+) -> UploadSession:
+    upload_id = uuid4().hex
+    directory = root / upload_id
+    directory.mkdir(parents=True)
+    session = UploadSession(upload_id, directory, filename, size, chunk_size, sheets)
+    session.save()
+    return session
+
+
+def load_upload_session(root: Path, upload_id: str) -> UploadSession | None:
+    # The id becomes a path, so anything but a generated id is unknown.
+    if not UPLOAD_ID_PATTERN.fullmatch(upload_id):
+        return None
+    metadata = root / upload_id / SESSION_METADATA
+    if not metadata.exists():
+        return None
+    return UploadSession(
+        upload_id, metadata.parent, **json.loads(metadata.read_text(encoding="utf-8"))
+    )
+
+
+class UploadChunkWriter:
+    # Streams one chunk to a partial file as it arrives, so a request holds at
+    # most one network read of it in memory. The file is renamed into place
+    # only when complete, so an interrupted write never counts as received and
+    # a retried chunk simply replaces the earlier copy.
+    def __init__(self, session: UploadSession, index: int) -> None:
+        if not 0 <= index < session.total_chunks:
+            raise UploadSessionError(
+                f"Chunk {index} is out of range; expected 0 to {session.total_chunks - 1}."
+            )
+        self.index = index
+        self.expected = session.expected_size(index)
+        self.size = 0
+        self._target = session.chunk_path(index)
+        self._partial = self._target.with_name(f"{self._target.name}.{uuid4().hex}.tmp")
+        self._file: IO[bytes] = self._partial.open("wb")
+
+    def write(self, data: bytes) -> None:
+        # Stops as soon as the chunk is longer than expected.
+        self.size += len(data)
+        if self.size > self.expected:
+            raise UploadSessionError(
+                f"Chunk {self.index} must be {self.expected} bytes, got more."
+            )
+        self._file.write(data)
+
+    def commit(self) -> None:
+        self._file.close()
+        if self.size != self.expected:
+            self.discard()
+            raise UploadSessionError(
+                f"Chunk {self.index} must be {self.expected} bytes, got {self.size}."
+            )
+        self._partial.replace(self._target)
+
+    def discard(self) -> None:
+        self._file.close()
+        self._partial.unlink(missing_ok=True)
+
+
+def write_upload_chunk(session: UploadSession, index: int, data: bytes) -> None:
+    writer = UploadChunkWriter(session, index)
+    try:
+        writer.write(data)
+        writer.commit()
+    except BaseException:
+        writer.discard()
+        raise
+
+
+class _ChunkReader:
+    # Reads a session's chunk files back to back as one stream.
+    def __init__(self, paths: list[Path]) -> None:
+        self._paths = iter(paths)
+        self._current: IO[bytes] | None = None
+
+    def read(self, size: int = -1) -> bytes:
+        while True:
+            if self._current is None:
+                path = next(self._paths, None)
+                if path is None:
+                    return b""
+                self._current = path.open("rb")
+            data = self._current.read(size)
+            if data:
+                return data
+            self._current.close()
+            self._current = None
+
+
+def assemble_upload(
+    session: UploadSession,
+    directory: Path,
+    suffix: str,
+    max_bytes: int,
+    chunk_size: int = 1024 * 1024,
+) -> tuple[Path, int, str]:
+    # Produces the same spooled file, size and hash as a single-request upload.
+    missing = session.missing()
+    if missing:
+        shown = ", ".join(str(index) for index in missing[:20])
+        raise UploadSessionError(
+            f"Missing {len(missing)} of {session.total_chunks} chunks: {shown}"
+        )
+    paths = [session.chunk_path(index) for index in range(session.total_chunks)]
+    return spool_upload(_ChunkReader(paths), directory, suffix, max_bytes, chunk_size)
+
+
+def claim_upload_completion(session: UploadSession) -> bool:
+    # Creating the lock file is atomic, so of several concurrent complete
+    # requests only one assembles the upload and creates a job.
+    try:
+        os.close(os.open(session.directory / COMPLETION_LOCK, os.O_CREAT | os.O_EXCL))
+    except FileExistsError:
+        return False
+    return True
+
+
+def release_upload_completion(session: UploadSession) -> None:
+    # Lets complete be retried after an attempt that did not create a job.
+    (session.directory / COMPLETION_LOCK).unlink(missing_ok=True)
+
+
+def finish_upload_session(session: UploadSession, job_id: int) -> None:
+    # Chunks are dropped but the metadata is kept until it expires, so a
+    # repeated complete request finds the job it created.
+    for path in session.directory.glob("*.part"):
+        path.unlink(missing_ok=True)
+    session.job_id = job_id
+    session.save()
+
+
+def purge_upload_sessions(root: Path, max_age_seconds: float) -> int:
+    # Removes sessions with no activity for `max_age_seconds`.
+    if not root.exists():
+        return 0
+    cutoff = time.time() - max_age_seconds
+    purged = 0
+    for directory in root.iterdir():
+        if not directory.is_dir():
+            continue
+        last_activity = max(
+            (path.stat().st_mtime for path in directory.iterdir()),
+            default=directory.stat().st_mtime,
+        )
+        if last_activity < cutoff:
+            shutil.rmtree(directory, ignore_errors=True)
+            purged += 1
+    return purged
@@ -0,0 +1,199 @@
+from __future__ import annotations
+
+import argparse
+import json
+import multiprocessing
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any
+
+from benchmarks.workbook_generator import LAYOUTS, write_workbook
+
+STAGES = ["parse", "map", "validate", "upsert"]
+DEFAULT_BASELINE = Path(__file__).resolve().parent / "baseline.json"
+
+
+def _peak_rss_mb() -> float:
+    try:
+        import resource
+    except ImportError:  # Windows
+        import ctypes
+        from ctypes import wintypes
+
+        class ProcessMemoryCounters(ctypes.Structure):
+            _fields_ = [
+                ("cb", wintypes.DWORD),
+                ("PageFaultCount", wintypes.DWORD),
+                ("PeakWorkingSetSize", ctypes.c_size_t),
+                ("WorkingSetSize", ctypes.c_size_t),
+                ("QuotaPeakPagedPoolUsage", ctypes.c_size_t),
+                ("QuotaPagedPoolUsage", ctypes.c_size_t),
+                ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t),
+                ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+                ("PagefileUsage", ctypes.c_size_t),
+                ("PeakPagefileUsage", ctypes.c_size_t),
+            ]
+
+        counters = ProcessMemoryCounters()
+        counters.cb = ctypes.sizeof(counters)
+        ctypes.windll.psapi.GetProcessMemoryInfo(
+            ctypes.windll.kernel32.GetCurrentProcess(), ctypes.byref(counters), counters.cb
+        )
+        return counters.PeakWorkingSetSize / (1024 * 1024)
+    # ru_maxrss is reported in KiB on Linux.
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def run_case(workbook: Path, chunk_size: int) -> dict[str, Any]:
+    # Runs in a fresh process so peak RSS belongs to this case alone.
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+
+    from app.db.models import Base
+    from app.services.excel_service import (
+        ValidationErrors,
+        apply_column_mapping,
+        iter_raw_excel_chunks,
+        validate_and_transform_rows,
+    )
+    from app.services.import_service import upsert_sales_records
+
+    with tempfile.TemporaryDirectory() as db_dir:
+        engine = create_engine(f"sqlite:///{db_dir}/bench.db")
+        Base.metadata.create_all(bind=engine)
+        db = sessionmaker(autocommit=False, autoflush=False, bind=engine)()
+
+        seconds = dict.fromkeys(STAGES, 0.0)
+        rows = 0
+        errors = ValidationErrors(max_details=1000)
+        with workbook.open("rb") as source:
+            chunks = iter_raw_excel_chunks(source, chunk_size=chunk_size)
+            while True:
+                started = time.perf_counter()
+                frame = next(chunks, None)
+                seconds["parse"] += time.perf_counter() - started
+                if frame is None:
+                    break
+                started = time.perf_counter()
+                frame = apply_column_mapping(frame)
+                seconds["map"] += time.perf_counter() - started
+                started = time.perf_counter()
+                valid_rows, _ = validate_and_transform_rows(frame, errors)
+                seconds["validate"] += time.perf_counter() - started
+                started = time.perf_counter()
+                upsert_sales_records(db, valid_rows)
+                seconds["upsert"] += time.perf_counter() - started
+                rows += len(frame)
+        db.close()
+        engine.dispose()
+
+    total = sum(seconds.values())
+    return {
+        "rows": rows,
+        "failed_rows": errors.failed_rows,
+        "stages": {
+            stage: {
+                "seconds": round(elapsed, 4),
+                "rows_per_sec": round(rows / elapsed, 1) if elapsed else None,
+            }
+            for stage, elapsed in seconds.items()
+        },
+        "total_seconds": round(total, 4),
+        "rows_per_sec": round(rows / total, 1) if total else None,
+        "peak_rss_mb": round(_peak_rss_mb(), 1),
+    }
+
+
+def compare_to_baseline(
+    results: dict[str, Any], baseline: dict[str, Any], threshold: float
+) -> list[str]:
+    regressions: list[str] = []
+    for case, current in results["cases"].items():
+        expected = baseline.get("cases", {}).get(case)
+        if expected is None:
+            continue
+        for stage in STAGES:
+            now = current["stages"][stage]["rows_per_sec"]
+            before = expected["stages"][stage]["rows_per_sec"]
+            if now and before and now < before * (1 - threshold):
+                regressions.append(
+                    f"{case} {stage}: {now:,.0f} rows/s vs baseline {before:,.0f} rows/s"
+                )
+        if current["peak_rss_mb"] > expected["peak_rss_mb"] * (1 + threshold):
+            regressions.append(
+                f"{case} peak RSS: {current['peak_rss_mb']} MB "
+                f"vs baseline {expected['peak_rss_mb']} MB"
+            )
+    return regressions
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Import pipeline throughput benchmark.")
+    parser.add_argument("--rows", type=int, nargs="+", default=[1_000, 100_000, 500_000])
+    parser.add_argument("--layouts", nargs="+", choices=sorted(LAYOUTS), default=sorted(LAYOUTS))
+    parser.add_argument("--error-rate", type=float, default=0.02)
+    parser.add_argument("--duplicate-ratio", type=float, default=0.1)
+    parser.add_argument("--chunk-size", type=int, default=5000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--workdir", type=Path, default=Path(tempfile.gettempdir()) / "import-bench")
+    parser.add_argument("--output", type=Path, default=None)
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE)
+    parser.add_argument("--threshold", type=float, default=0.2)
+    parser.add_argument("--update-baseline", action="store_true")
+    args = parser.parse_args(argv)
+
+    results: dict[str, Any] = {
+        "settings": {
+            "error_rate": args.error_rate,
+            "duplicate_ratio": args.duplicate_ratio,
+            "chunk_size": args.chunk_size,
+            "seed": args.seed,
+        },
+        "cases": {},
+    }
+    context = multiprocessing.get_context("spawn")
+    for rows in args.rows:
+        for layout in args.layouts:
+            case = f"{layout}-{rows}"
+            workbook = args.workdir / (
+                f"{case}-e{args.error_rate}-d{args.duplicate_ratio}-s{args.seed}.xlsx"
+            )
+            if not workbook.exists():
+                write_workbook(
+                    workbook, rows, layout, args.error_rate, args.duplicate_ratio, args.seed
+                )
+            with context.Pool(1) as pool:
+                result = pool.apply(run_case, (workbook, args.chunk_size))
+            results["cases"][case] = result
+            print(
+                f"{case}: {result['rows_per_sec']:,.0f} rows/s end to end, "
+                f"peak {result['peak_rss_mb']} MB, "
+                + ", ".join(
+                    f"{stage} {values['seconds']}s" for stage, values in result["stages"].items()
+                ),
+                flush=True,
+            )
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        args.output.write_text(output + "\n", encoding="utf-8")
+    if args.update_baseline:
+        args.baseline.write_text(output + "\n", encoding="utf-8")
+        print(f"Baseline written to {args.baseline}")
+        return 0
+    if not args.baseline.exists():
+        print(f"No baseline at {args.baseline}; run with --update-baseline to create one.")
+        return 0
+
+    regressions = compare_to_baseline(
+        results, json.loads(args.baseline.read_text(encoding="utf-8")), args.threshold
+    )
+    for regression in regressions:
+        print(f"REGRESSION {regression}", file=sys.stderr)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,140 @@
+from __future__ import annotations
+
+import random
+from collections.abc import Iterator
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Any
+
+from openpyxl import Workbook
+
+# Column layouts of `finance-screening-output.xlsx`, in sheet order. The
+# positional fallbacks in `FINANCE_SCREENING_TARGETS` rely on this order.
+ENGLISH_HEADERS = [
+    "doc_date",
+    "invoice_no",
+    "customer_name",
+    "item",
+    "gross",
+    "tax",
+    "total",
+    "vin",
+    "cancel_flag",
+    "cancel_gross",
+    "cancel_tax",
+    "cancel_total",
+    "tax_branch",
+    "tax_sub_branch",
+    "citizen_id",
+    "sale_price",
+    "com_fn",
+    "com",
+    "rule_applied",
+    "is_duplicate_tank",
+    "group_id",
+]
+THAI_HEADERS = [
+    "วันที่ใบกำกับ",
+    "เลขที่ใบกำกับ",
+    "ชื่อ-นามสกุล",
+    "รายการ",
+    "มูลค่าสินค้า",
+    "ภาษี",
+    "มูลค่ารวม",
+    "เลขตัวถัง",
+    "ยกเลิก",
+    "มูลค่าสินค้ายกเลิก",
+    "ภาษียกเลิก",
+    "มูลค่ารวมยกเลิก",
+    "ประเภทองค์กร สนญ.",
+    "ประเภทองค์กร สาขาที่",
+    "เลขประจำตัวผู้เสียภาษี",
+    "ราคาขาย",
+    "COM F/N",
+    "COM",
+    "rule_applied",
+    "is_duplicate_tank",
+    "group_id",
+]
+LAYOUTS = {"english": ENGLISH_HEADERS, "thai": THAI_HEADERS}
+FIRST_NAMES = ["สมชาย", "สมหญิง", "Alice", "Bob", "วิชัย", "Nok"]
+LAST_NAMES = ["ใจดี", "รักไทย", "Smith", "Tan", "ศรีสุข"]
+ITEMS = ["รถยนต์", "Pickup 4WD", "Sedan 1.5", "EV Compact"]
+RULES = ["finance_sent", "cash", "leasing", "finance_pending"]
+
+
+def generate_rows(
+    rows: int,
+    error_rate: float = 0.0,
+    duplicate_ratio: float = 0.0,
+    seed: int = 42,
+) -> Iterator[list[Any]]:
+    # Values are positional so the same rows fit both header layouts. A
+    # `duplicate_ratio` share of rows reuse an earlier VIN (and so business_key);
+    # an `error_rate` share get one invalid required field.
+    rng = random.Random(seed)
+    start = date(2026, 1, 1)
+    for index in range(rows):
+        if index and rng.random() < duplicate_ratio:
+            vin_number = rng.randrange(index)
+        else:
+            vin_number = index
+        vin = f"VIN{vin_number:09d}"
+        gross = rng.randrange(150_000, 2_500_000, 500)
+        tax = round(gross * 0.07)
+        total = gross + tax
+        record_date: Any = start + timedelta(days=rng.randrange(365))
+        name = f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+        sale_price: Any = total
+        if rng.random() < error_rate:
+            broken = rng.randrange(3)
+            if broken == 0:
+                record_date = "not-a-date"
+            elif broken == 1:
+                sale_price = "n/a"
+                total = "n/a"
+                gross = "n/a"
+            else:
+                name = ""
+        yield [
+            record_date,
+            f"INV{index:09d}",
+            name,
+            rng.choice(ITEMS),
+            gross,
+            tax,
+            total,
+            vin,
+            None,
+            0,
+            0,
+            0,
+            "X",
+            rng.randrange(0, 40),
+            f"'{rng.randrange(10**12, 10**13)}",
+            sale_price,
+            gross,
+            tax,
+            rng.choice(RULES),
+            False,
+            f"TANK::{vin}",
+        ]
+
+
+def write_workbook(
+    path: Path,
+    rows: int,
+    layout: str = "english",
+    error_rate: float = 0.0,
+    duplicate_ratio: float = 0.0,
+    seed: int = 42,
+) -> Path:
+    # Write-only mode streams rows to disk, so 500k-row workbooks stay cheap to build.
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet()
+    sheet.append(LAYOUTS[layout])
+    for values in generate_rows(rows, error_rate, duplicate_ratio, seed):
+        sheet.append(values)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    workbook.save(path)
+    return path
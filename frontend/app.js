@@ -4,22 +4,35 @@ const statusCard = document.getElementById("status-card");
 const errorsCard = document.getElementById("errors-card");
 const summaryEl = document.getElementById("summary");
 const errorsBody = document.querySelector("#errors-table tbody");
+const errorsExport = document.getElementById("errors-export");
 
 const setBusy = (busy) => {
   submitBtn.disabled = busy;
   submitBtn.textContent = busy ? "Importing..." : "Upload and Import";
 };
 
+const PENDING_STATUSES = ["queued", "running"];
+const POLL_INTERVAL_MS = 1000;
+const CHUNK_ATTEMPTS = 4;
+const CHUNK_RETRY_DELAY_MS = 1000;
+
+const sleep = (ms) => new Promise((resolve) => setTimeout(resolve, ms));
+
 const showSummary = (payload) => {
   statusCard.classList.remove("hidden");
   summaryEl.textContent = JSON.stringify(
     {
-      job_id: payload.job_id,
+      job_id: payload.id,
       status: payload.status,
       filename: payload.filename,
       total_rows: payload.total_rows,
       imported_rows: payload.imported_rows,
+      inserted_rows: payload.inserted_rows,
+      updated_rows: payload.updated_rows,
+      unchanged_rows: payload.unchanged_rows,
+      duplicate_rows: payload.duplicate_rows,
       failed_rows: payload.failed_rows,
+      error_count: payload.error_count,
       message: payload.message,
     },
     null,
@@ -38,7 +51,7 @@ const showErrors = (errors) => {
   for (const item of errors) {
     const row = document.createElement("tr");
     row.innerHTML = `
-      <td>${item.row_number}</td>
+      <td>${item.sheet_name ? `${item.sheet_name}!${item.row_number}` : item.row_number}</td>
       <td>${item.column_name || "-"}</td>
       <td>${item.error_message}</td>
     `;
@@ -46,6 +59,116 @@ const showErrors = (errors) => {
   }
 };
 
+const fetchJson = async (url, options) => {
+  const response = await fetch(url, options);
+  const payload = await response.json();
+  if (!response.ok) {
+    throw new Error(payload.detail || "Request failed.");
+  }
+  return payload;
+};
+
+// Chunked upload: each chunk is retried on its own, and the session id is kept
+// so submitting the same file again after a failure sends only missing chunks,
+// or just picks up the job if the upload had already been completed.
+const sessionKey = (file, sheets) =>
+  `upload:${file.name}:${file.size}:${file.lastModified}:${sheets || ""}`;
+
+const openUploadSession = async (file, sheets) => {
+  const stored = localStorage.getItem(sessionKey(file, sheets));
+  if (stored) {
+    try {
+      return await fetchJson(`/api/imports/uploads/${stored}`);
+    } catch {
+      // Expired or unknown; start a new session.
+    }
+  }
+  const session = await fetchJson("/api/imports/uploads", {
+    method: "POST",
+    headers: { "Content-Type": "application/json" },
+    body: JSON.stringify({ filename: file.name, size: file.size, sheets }),
+  });
+  localStorage.setItem(sessionKey(file, sheets), session.upload_id);
+  return session;
+};
+
+const putChunk = async (uploadId, index, blob) => {
+  for (let attempt = 1; ; attempt += 1) {
+    try {
+      return await fetchJson(`/api/imports/uploads/${uploadId}/chunks/${index}`, {
+        method: "PUT",
+        body: blob,
+      });
+    } catch (error) {
+      if (attempt >= CHUNK_ATTEMPTS) {
+        throw error;
+      }
+      await sleep(CHUNK_RETRY_DELAY_MS * 2 ** (attempt - 1));
+    }
+  }
+};
+
+const uploadFile = async (file, sheets) => {
+  const session = await openUploadSession(file, sheets);
+  if (session.job_id !== null) {
+    localStorage.removeItem(sessionKey(file, sheets));
+    return fetchJson(`/api/imports/${session.job_id}`);
+  }
+  const received = new Set(session.received);
+  for (let index = 0; index < session.total_chunks; index += 1) {
+    if (received.has(index)) {
+      continue;
+    }
+    submitBtn.textContent = `Uploading ${index + 1}/${session.total_chunks}`;
+    const start = index * session.chunk_size;
+    await putChunk(session.upload_id, index, file.slice(start, start + session.chunk_size));
+  }
+  const queued = await fetchJson(`/api/imports/uploads/${session.upload_id}/complete`, {
+    method: "POST",
+  });
+  localStorage.removeItem(sessionKey(file, sheets));
+  return queued;
+};
+
+const showProgress = (event) => {
+  const rows = event.rows_validated.toLocaleString();
+  const rate = Math.round(event.rows_per_sec).toLocaleString();
+  submitBtn.textContent = `${event.stage}: ${rows} rows (${rate} rows/s)`;
+};
+
+const watchJob = (jobId) =>
+  new Promise((resolve, reject) => {
+    const source = new EventSource(`/api/imports/${jobId}/events`);
+    source.addEventListener("progress", (message) => {
+      const event = JSON.parse(message.data);
+      showProgress(event);
+      if (!PENDING_STATUSES.includes(event.status)) {
+        source.close();
+        resolve();
+      }
+    });
+    source.onerror = () => {
+      source.close();
+      reject(new Error("Progress stream closed."));
+    };
+  });
+
+const waitForJob = async (jobId) => {
+  try {
+    await watchJob(jobId);
+  } catch {
+    // Fall back to polling if the event stream is unavailable.
+  }
+
+  let job = await fetchJson(`/api/imports/${jobId}`);
+  while (PENDING_STATUSES.includes(job.status)) {
+    showSummary(job);
+    await sleep(POLL_INTERVAL_MS);
+    job = await fetchJson(`/api/imports/${jobId}`);
+  }
+  return job;
+};
+
 uploadForm.addEventListener("submit", async (event) => {
   event.preventDefault();
   const fileInput = document.getElementById("excel-file");
@@ -55,22 +178,17 @@ uploadForm.addEventListener("submit", async (event) => {
     return;
   }
 
-  const formData = new FormData();
-  formData.append("file", file);
+  const sheets = document.getElementById("all-sheets").checked ? ["*"] : null;
 
   setBusy(true);
   try {
-    const response = await fetch("/api/imports/upload", {
-      method: "POST",
-      body: formData,
-    });
-    const payload = await response.json();
-    if (!response.ok) {
-      throw new Error(payload.detail || "Upload failed.");
-    }
-
-    showSummary(payload);
-    showErrors(payload.errors || []);
+    const queued = await uploadFile(file, sheets);
+    const job = await waitForJob(queued.id);
+    showSummary(job);
+    const errorsPage =
+      job.error_count > 0 ? await fetchJson(`/api/imports/${job.id}/errors`) : { items: [] };
+    showErrors(errorsPage.items);
+    errorsExport.href = `/api/imports/${job.id}/errors/export?format=csv`;
   } catch (error) {
     statusCard.classList.remove("hidden");
     summaryEl.textContent = error.message;
@@ -35,6 +35,7 @@ BEGIN
         rule_applied NVARCHAR(100) NULL,
         is_duplicate_tank BIT NULL,
         group_id NVARCHAR(150) NULL,
+        content_hash CHAR(32) NULL,
         created_at DATETIME2 NOT NULL DEFAULT SYSUTCDATETIME(),
         updated_at DATETIME2 NOT NULL DEFAULT SYSUTCDATETIME()
     );
@@ -81,13 +82,93 @@ IF COL_LENGTH('dbo.sales_records', 'is_duplicate_tank') IS NULL
     ALTER TABLE dbo.sales_records ADD is_duplicate_tank BIT NULL;
 IF COL_LENGTH('dbo.sales_records', 'group_id') IS NULL
     ALTER TABLE dbo.sales_records ADD group_id NVARCHAR(150) NULL;
+IF COL_LENGTH('dbo.sales_records', 'content_hash') IS NULL
+    ALTER TABLE dbo.sales_records ADD content_hash CHAR(32) NULL;
+-- Listing indexes for GET /sales-records. They include the default columns so a
+-- page is read from the index alone; older copies without them are rebuilt.
 IF NOT EXISTS (
+    SELECT 1
+    FROM sys.indexes AS i
+    JOIN sys.index_columns AS ic
+      ON ic.object_id = i.object_id AND ic.index_id = i.index_id AND ic.is_included_column = 1
+    WHERE i.name = 'IX_sales_records_record_date_id'
+      AND i.object_id = OBJECT_ID('dbo.sales_records')
+)
+BEGIN
+    IF EXISTS (
+        SELECT 1
+        FROM sys.indexes
+        WHERE name = 'IX_sales_records_record_date_id'
+          AND object_id = OBJECT_ID('dbo.sales_records')
+    )
+        DROP INDEX IX_sales_records_record_date_id ON dbo.sales_records;
+    CREATE INDEX IX_sales_records_record_date_id ON dbo.sales_records(record_date, id)
+        INCLUDE (business_key, name, amount, invoice_no, vin_no, total_value, group_id);
+END
+IF NOT EXISTS (
+    SELECT 1
+    FROM sys.indexes AS i
+    JOIN sys.index_columns AS ic
+      ON ic.object_id = i.object_id AND ic.index_id = i.index_id AND ic.is_included_column = 1
+    WHERE i.name = 'IX_sales_records_group_id_record_date'
+      AND i.object_id = OBJECT_ID('dbo.sales_records')
+)
+BEGIN
+    IF EXISTS (
+        SELECT 1
+        FROM sys.indexes
+        WHERE name = 'IX_sales_records_group_id_record_date'
+          AND object_id = OBJECT_ID('dbo.sales_records')
+    )
+        DROP INDEX IX_sales_records_group_id_record_date ON dbo.sales_records;
+    CREATE INDEX IX_sales_records_group_id_record_date ON dbo.sales_records(group_id, record_date, id)
+        INCLUDE (business_key, name, amount, invoice_no, vin_no, total_value);
+END
+IF NOT EXISTS (
+    SELECT 1
+    FROM sys.indexes AS i
+    JOIN sys.index_columns AS ic
+      ON ic.object_id = i.object_id AND ic.index_id = i.index_id AND ic.is_included_column = 1
+    WHERE i.name = 'IX_sales_records_vin_no_record_date'
+      AND i.object_id = OBJECT_ID('dbo.sales_records')
+)
+BEGIN
+    IF EXISTS (
+        SELECT 1
+        FROM sys.indexes
+        WHERE name = 'IX_sales_records_vin_no_record_date'
+          AND object_id = OBJECT_ID('dbo.sales_records')
+    )
+        DROP INDEX IX_sales_records_vin_no_record_date ON dbo.sales_records;
+    CREATE INDEX IX_sales_records_vin_no_record_date ON dbo.sales_records(vin_no, record_date, id)
+        INCLUDE (business_key, name, amount, invoice_no, total_value, group_id);
+END
+IF NOT EXISTS (
+    SELECT 1
+    FROM sys.indexes AS i
+    JOIN sys.index_columns AS ic
+      ON ic.object_id = i.object_id AND ic.index_id = i.index_id AND ic.is_included_column = 1
+    WHERE i.name = 'IX_sales_records_invoice_no_record_date'
+      AND i.object_id = OBJECT_ID('dbo.sales_records')
+)
+BEGIN
+    IF EXISTS (
+        SELECT 1
+        FROM sys.indexes
+        WHERE name = 'IX_sales_records_invoice_no_record_date'
+          AND object_id = OBJECT_ID('dbo.sales_records')
+    )
+        DROP INDEX IX_sales_records_invoice_no_record_date ON dbo.sales_records;
+    CREATE INDEX IX_sales_records_invoice_no_record_date ON dbo.sales_records(invoice_no, record_date, id)
+        INCLUDE (business_key, name, amount, vin_no, total_value, group_id);
+END
+IF EXISTS (
     SELECT 1
     FROM sys.indexes
     WHERE name = 'IX_sales_records_group_id'
       AND object_id = OBJECT_ID('dbo.sales_records')
 )
-    CREATE INDEX IX_sales_records_group_id ON dbo.sales_records(group_id);
+    DROP INDEX IX_sales_records_group_id ON dbo.sales_records;
 GO
 
 IF OBJECT_ID('dbo.import_jobs', 'U') IS NULL
@@ -96,30 +177,111 @@ BEGIN
         id INT IDENTITY(1,1) PRIMARY KEY,
         correlation_id NVARCHAR(64) NOT NULL,
         filename NVARCHAR(255) NOT NULL,
+        content_hash CHAR(64) NULL,
         status NVARCHAR(20) NOT NULL,
+        instance_id NVARCHAR(100) NULL,
         total_rows INT NOT NULL DEFAULT 0,
         imported_rows INT NOT NULL DEFAULT 0,
+        inserted_rows INT NOT NULL DEFAULT 0,
+        updated_rows INT NOT NULL DEFAULT 0,
+        unchanged_rows INT NOT NULL DEFAULT 0,
+        duplicate_rows INT NOT NULL DEFAULT 0,
         failed_rows INT NOT NULL DEFAULT 0,
+        error_count INT NOT NULL DEFAULT 0,
+        checkpoint_row INT NOT NULL DEFAULT 0,
+        source_path NVARCHAR(500) NULL,
+        source_sheets NVARCHAR(MAX) NULL,
         message NVARCHAR(MAX) NULL,
+        stats NVARCHAR(MAX) NULL,
         created_at DATETIME2 NOT NULL DEFAULT SYSUTCDATETIME(),
         updated_at DATETIME2 NOT NULL DEFAULT SYSUTCDATETIME()
     );
     CREATE INDEX IX_import_jobs_status ON dbo.import_jobs(status);
     CREATE INDEX IX_import_jobs_correlation_id ON dbo.import_jobs(correlation_id);
+    CREATE INDEX IX_import_jobs_content_hash ON dbo.import_jobs(content_hash);
 END
 GO
 
+IF COL_LENGTH('dbo.import_jobs', 'inserted_rows') IS NULL
+    ALTER TABLE dbo.import_jobs ADD inserted_rows INT NOT NULL DEFAULT 0;
+IF COL_LENGTH('dbo.import_jobs', 'updated_rows') IS NULL
+    ALTER TABLE dbo.import_jobs ADD updated_rows INT NOT NULL DEFAULT 0;
+IF COL_LENGTH('dbo.import_jobs', 'error_count') IS NULL
+    ALTER TABLE dbo.import_jobs ADD error_count INT NOT NULL DEFAULT 0;
+IF COL_LENGTH('dbo.import_jobs', 'unchanged_rows') IS NULL
+    ALTER TABLE dbo.import_jobs ADD unchanged_rows INT NOT NULL DEFAULT 0;
+IF COL_LENGTH('dbo.import_jobs', 'duplicate_rows') IS NULL
+    ALTER TABLE dbo.import_jobs ADD duplicate_rows INT NOT NULL DEFAULT 0;
+IF COL_LENGTH('dbo.import_jobs', 'stats') IS NULL
+    ALTER TABLE dbo.import_jobs ADD stats NVARCHAR(MAX) NULL;
+IF COL_LENGTH('dbo.import_jobs', 'checkpoint_row') IS NULL
+    ALTER TABLE dbo.import_jobs ADD checkpoint_row INT NOT NULL DEFAULT 0;
+IF COL_LENGTH('dbo.import_jobs', 'source_path') IS NULL
+    ALTER TABLE dbo.import_jobs ADD source_path NVARCHAR(500) NULL;
+IF COL_LENGTH('dbo.import_jobs', 'source_sheets') IS NULL
+    ALTER TABLE dbo.import_jobs ADD source_sheets NVARCHAR(MAX) NULL;
+IF COL_LENGTH('dbo.import_jobs', 'content_hash') IS NULL
+    ALTER TABLE dbo.import_jobs ADD content_hash CHAR(64) NULL;
+IF COL_LENGTH('dbo.import_jobs', 'instance_id') IS NULL
+    ALTER TABLE dbo.import_jobs ADD instance_id NVARCHAR(100) NULL;
+GO
+
+IF NOT EXISTS (
+    SELECT 1
+    FROM sys.indexes
+    WHERE name = 'IX_import_jobs_content_hash'
+      AND object_id = OBJECT_ID('dbo.import_jobs')
+)
+    CREATE INDEX IX_import_jobs_content_hash ON dbo.import_jobs(content_hash);
+GO
+
 IF OBJECT_ID('dbo.import_errors', 'U') IS NULL
 BEGIN
     CREATE TABLE dbo.import_errors (
         id INT IDENTITY(1,1) PRIMARY KEY,
         job_id INT NOT NULL,
+        sheet_name NVARCHAR(100) NULL,
         row_number INT NOT NULL,
         column_name NVARCHAR(100) NULL,
         error_message NVARCHAR(MAX) NOT NULL,
         created_at DATETIME2 NOT NULL DEFAULT SYSUTCDATETIME(),
         CONSTRAINT FK_import_errors_job FOREIGN KEY (job_id) REFERENCES dbo.import_jobs(id)
     );
-    CREATE INDEX IX_import_errors_job_id ON dbo.import_errors(job_id);
+    CREATE INDEX IX_import_errors_job_id_id ON dbo.import_errors(job_id, id);
+END
+GO
+
+IF COL_LENGTH('dbo.import_errors', 'sheet_name') IS NULL
+    ALTER TABLE dbo.import_errors ADD sheet_name NVARCHAR(100) NULL;
+
+IF NOT EXISTS (
+    SELECT 1
+    FROM sys.indexes
+    WHERE name = 'IX_import_errors_job_id_id'
+      AND object_id = OBJECT_ID('dbo.import_errors')
+)
+    CREATE INDEX IX_import_errors_job_id_id ON dbo.import_errors(job_id, id);
+IF EXISTS (
+    SELECT 1
+    FROM sys.indexes
+    WHERE name = 'IX_import_errors_job_id'
+      AND object_id = OBJECT_ID('dbo.import_errors')
+)
+    DROP INDEX IX_import_errors_job_id ON dbo.import_errors;
+GO
+
+IF OBJECT_ID('dbo.import_error_summaries', 'U') IS NULL
+BEGIN
+    CREATE TABLE dbo.import_error_summaries (
+        id INT IDENTITY(1,1) PRIMARY KEY,
+        job_id INT NOT NULL,
+        sheet_name NVARCHAR(100) NULL,
+        column_name NVARCHAR(100) NULL,
+        error_pattern NVARCHAR(255) NOT NULL,
+        occurrences INT NOT NULL,
+        sample_rows NVARCHAR(MAX) NOT NULL,
+        CONSTRAINT FK_import_error_summaries_job FOREIGN KEY (job_id) REFERENCES dbo.import_jobs(id)
+    );
+    CREATE INDEX IX_import_error_summaries_job_id ON dbo.import_error_summaries(job_id);
 END
 GO
@@ -0,0 +1,32 @@
+from pathlib import Path
+
+from benchmarks.run_benchmarks import compare_to_baseline
+from benchmarks.workbook_generator import write_workbook
+from app.services.excel_service import parse_excel_bytes, validate_and_transform_rows
+
+
+def test_generated_workbooks_map_in_both_layouts(tmp_path: Path) -> None:
+    for layout in ("english", "thai"):
+        path = write_workbook(
+            tmp_path / f"{layout}.xlsx", rows=200, layout=layout, error_rate=0.1, duplicate_ratio=0.2
+        )
+
+        frame = parse_excel_bytes(path.read_bytes())
+        valid, errors = validate_and_transform_rows(frame)
+
+        assert len(frame) == 200
+        assert 0 < errors.failed_rows < 60
+        assert len({row["business_key"] for row in valid}) < len(valid)
+        assert frame.iloc[0]["business_key"] == "TANK::VIN000000000"
+
+
+def test_compare_to_baseline_flags_slower_stages_and_memory() -> None:
+    def case(rows_per_sec: float, peak: float) -> dict:
+        stages = {stage: {"rows_per_sec": rows_per_sec} for stage in ("parse", "map", "validate", "upsert")}
+        return {"stages": stages, "peak_rss_mb": peak}
+
+    baseline = {"cases": {"english-1000": case(1000, 100)}}
+
+    assert compare_to_baseline({"cases": {"english-1000": case(900, 110)}}, baseline, 0.2) == []
+    regressions = compare_to_baseline({"cases": {"english-1000": case(700, 130)}}, baseline, 0.2)
+    assert len(regressions) == 5
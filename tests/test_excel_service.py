@@ -1,12 +1,32 @@
+import gzip
+import pickle
+from concurrent.futures import ProcessPoolExecutor
 from datetime import date
 from decimal import Decimal
 from io import BytesIO
+from pathlib import Path
 
 import pandas as pd
+from openpyxl import Workbook
 
 from app.services.excel_service import (
+    ErrorPattern,
+    KeyDeduplicator,
+    ParseCache,
+    ValidatedBatch,
+    ValidationErrors,
+    apply_column_mapping,
+    compile_mapping_plan,
+    file_extension,
+    iter_excel_chunks,
+    iter_raw_excel_chunks,
+    iter_raw_delimited_chunks,
+    parse_sheet,
+    select_sheets,
     parse_excel_bytes,
+    parse_excel_file,
     validate_and_transform_rows,
+    validate_and_transform_rows_sharded,
     validate_required_columns,
 )
 
@@ -113,3 +133,364 @@ def test_parse_excel_bytes_maps_finance_screening_thai_headers() -> None:
     assert str(parsed.loc[0, "amount"]) == "267500"
     assert parsed.loc[0, "taxpayer_id"] == "'0101234567890"
     assert str(pd.to_datetime(parsed.loc[0, "record_date"]).date()) == "2026-02-10"
+
+
+def test_iter_excel_chunks_streams_fixed_size_chunks_with_sheet_row_index() -> None:
+    source = pd.DataFrame(
+        [
+            {" Business_Key ": f"K-{i}", "Name": f"N{i}", "Amount": i, "Record_Date": "2026-01-01"}
+            for i in range(5)
+        ]
+    )
+    buffer = BytesIO()
+    source.to_excel(buffer, index=False)
+
+    chunks = list(iter_excel_chunks(BytesIO(buffer.getvalue()), chunk_size=2))
+
+    assert [len(chunk) for chunk in chunks] == [2, 2, 1]
+    assert list(chunks[0].columns) == ["business_key", "name", "amount", "record_date"]
+    assert [list(chunk.index) for chunk in chunks] == [[0, 1], [2, 3], [4]]
+    assert chunks[2].loc[4, "business_key"] == "K-4"
+
+
+def test_iter_excel_chunks_yields_header_for_empty_sheet() -> None:
+    buffer = BytesIO()
+    pd.DataFrame(columns=["business_key", "name"]).to_excel(buffer, index=False)
+
+    chunks = list(iter_excel_chunks(BytesIO(buffer.getvalue())))
+
+    assert len(chunks) == 1
+    assert chunks[0].empty
+    assert validate_required_columns(chunks[0]) == ["amount", "record_date"]
+
+
+def test_iter_raw_excel_chunks_keeps_data_under_blank_headers() -> None:
+    workbook = Workbook()
+    for row in (["a", "b", None], [1, 2, 3], [4, None, None], [5, 6, 7, 8]):
+        workbook.active.append(row)
+    buffer = BytesIO()
+    workbook.save(buffer)
+
+    chunks = list(iter_raw_excel_chunks(BytesIO(buffer.getvalue()), chunk_size=2))
+
+    assert list(chunks[0].columns) == ["a", "b", "unnamed: 2"]
+    assert chunks[0].loc[0].tolist() == [1, 2, 3]
+    assert list(chunks[1].columns) == ["a", "b", "unnamed: 2", "unnamed: 3"]
+    assert chunks[1].loc[2].tolist() == [5, 6, 7, 8]
+
+
+def test_validate_and_transform_rows_parses_optional_columns() -> None:
+    frame = pd.DataFrame(
+        [
+            {
+                "business_key": " A-001 ",
+                "name": "Alice",
+                "amount": "1,070.00",
+                "record_date": "2026-01-28",
+                "invoice_date": "2026-01-29",
+                "product_value": "1,000",
+                "org_type_branch_no": "3.0",
+                "taxpayer_id": "'0101234567890",
+                "is_duplicate_tank": "yes",
+                "cancel_flag": "nan",
+            },
+            {"business_key": "A-002", "name": "Bob", "amount": "1", "record_date": None},
+        ]
+    )
+
+    valid, errors = validate_and_transform_rows(frame)
+
+    assert len(valid) == 1
+    row = valid[0]
+    assert row["business_key"] == "A-001"
+    assert row["amount"] == Decimal("1070.00")
+    assert row["invoice_date"] == date(2026, 1, 29)
+    assert row["product_value"] == Decimal("1000")
+    assert row["org_type_branch_no"] == 3
+    assert row["taxpayer_id"] == "0101234567890"
+    assert row["is_duplicate_tank"] is True
+    assert row["cancel_flag"] is None
+    assert [(e.row_number, e.column_name) for e in errors] == [(3, "record_date")]
+
+
+def test_validate_and_transform_rows_rejects_non_finite_decimals() -> None:
+    frame = pd.DataFrame(
+        [
+            {"business_key": f"A-{n}", "name": "Alice", "amount": amount, "record_date": "2026-01-28"}
+            for n, amount in enumerate(["sNaN", "NaN", "Infinity", "-inf", "12.5"])
+        ]
+        + [
+            {
+                "business_key": "A-9",
+                "name": "Bob",
+                "amount": "1",
+                "record_date": "2026-01-28",
+                "product_value": "Infinity",
+            }
+        ]
+    )
+
+    valid, errors = validate_and_transform_rows(frame)
+
+    assert [row["business_key"] for row in valid] == ["A-4", "A-9"]
+    assert valid[1]["product_value"] is None
+    assert [(e.row_number, e.column_name) for e in errors] == [
+        (2, "amount"),
+        (3, "amount"),
+        (4, "amount"),
+        (5, "amount"),
+    ]
+
+
+def test_validate_and_transform_rows_accepts_dates_with_mixed_offsets() -> None:
+    frame = pd.DataFrame(
+        [
+            {"business_key": "A-1", "name": "Alice", "amount": "1", "record_date": value}
+            for value in ["2024-01-01T00:00:00+07:00", "2024-01-03", "2024-01-04T23:00:00-05:00", "bad"]
+        ]
+    )
+
+    valid, errors = validate_and_transform_rows(frame)
+
+    assert [row["record_date"] for row in valid] == [
+        date(2024, 1, 1),
+        date(2024, 1, 3),
+        date(2024, 1, 4),
+    ]
+    assert [(e.row_number, e.column_name) for e in errors] == [(5, "record_date")]
+
+
+def test_validation_errors_caps_details_but_counts_exactly() -> None:
+    frame = pd.DataFrame(
+        [{"business_key": f"K-{i}", "name": "", "amount": "x", "record_date": "2026-01-01"} for i in range(5)]
+    )
+    errors = ValidationErrors(max_details=3)
+
+    valid, returned = validate_and_transform_rows(frame, errors)
+
+    assert len(valid) == 0
+    assert returned is errors
+    assert errors.total == 10
+    assert errors.failed_rows == 5
+    assert errors.patterns[(None, "amount", "amount is invalid")] == ErrorPattern(5, [2, 3, 4, 5, 6])
+    assert len(errors) == 3
+    assert errors.truncated
+    assert len(errors.take_unsaved()) == 3
+    assert errors.take_unsaved() == []
+
+
+def test_parse_excel_file_reads_workbook_from_disk(tmp_path: Path) -> None:
+    path = tmp_path / "sales.xlsx"
+    pd.DataFrame(
+        [{"business_key": "A-001", "name": "Alice", "amount": 10, "record_date": "2026-01-01"}]
+    ).to_excel(path, index=False)
+
+    parsed = parse_excel_file(path)
+
+    assert parsed.loc[0, "business_key"] == "A-001"
+    assert validate_required_columns(parsed) == []
+
+
+def test_file_extension_recognises_compound_suffixes() -> None:
+    assert file_extension("Feed.CSV.GZ") == ".csv.gz"
+    assert file_extension("sales.2026.xlsx") == ".xlsx"
+    assert file_extension("archive.tar.gz") == ".gz"
+    assert file_extension("no-extension") == ""
+
+
+def test_iter_raw_delimited_chunks_reads_gzipped_thai_csv_with_bom() -> None:
+    content = (
+        "\ufeffเลขตัวถัง,ชื่อ-นามสกุล, ราคาขาย ,วันที่ใบกำกับ,ยกเลิก\n"
+        "VIN-001,สมชาย,\"1,250.50\",2026-01-05,NA\n"
+        "VIN-002,สมหญิง,990,2026-01-06,\n"
+        "VIN-003,สมศักดิ์,abc,2026-01-07,Y\n"
+    )
+    payload = BytesIO(gzip.compress(content.encode("utf-8")))
+
+    chunks = list(iter_raw_delimited_chunks(payload, ".csv.gz", chunk_size=2))
+
+    assert [chunk.index.tolist() for chunk in chunks] == [[0, 1], [2]]
+    assert chunks[0].columns[2] == "ราคาขาย"
+    frame = apply_column_mapping(pd.concat(chunks))
+    assert frame.loc[0, "business_key"] == "VIN-001"
+    assert frame.loc[0, "cancel_flag"] == "NA"
+    valid, errors = validate_and_transform_rows(frame)
+    assert [row["amount"] for row in valid] == [Decimal("1250.50"), Decimal("990")]
+    assert [(error.row_number, error.column_name) for error in errors] == [(4, "amount")]
+
+
+def test_parse_sheet_tags_errors_with_sheet_name(tmp_path: Path) -> None:
+    path = tmp_path / "branches.xlsx"
+    with pd.ExcelWriter(path) as writer:
+        pd.DataFrame([{"notes": "ignore me"}]).to_excel(writer, sheet_name="Notes", index=False)
+        pd.DataFrame(
+            [
+                {"business_key": "B-1", "name": "Ann", "amount": "5", "record_date": "2026-02-01"},
+                {"business_key": "B-2", "name": "Ben", "amount": "x", "record_date": "2026-02-01"},
+            ]
+        ).to_excel(writer, sheet_name="Branch B", index=False)
+
+    result = parse_sheet(path, "Branch B", max_details=10)
+    notes = parse_sheet(path, "Notes")
+
+    assert result.total_rows == 2 and [row["business_key"] for row in result.rows] == ["B-1"]
+    assert [(e.sheet_name, e.row_number, e.column_name) for e in result.errors] == [
+        ("Branch B", 3, "amount")
+    ]
+    assert notes.missing_columns == ["business_key", "name", "amount", "record_date"]
+    assert select_sheets(["Notes", "Branch B"], ["*"]) == ["Notes", "Branch B"]
+
+
+def test_validation_errors_merge_keeps_cap_and_per_sheet_rows() -> None:
+    first = ValidationErrors(max_details=2, sheet_name="A")
+    second = ValidationErrors(max_details=2, sheet_name="B")
+    first.add(2, "amount", "bad")
+    second.add(2, "amount", "bad")
+    second.add(2, "name", "missing")
+
+    merged = ValidationErrors(max_details=2)
+    merged.merge(first)
+    merged.merge(second)
+
+    assert (merged.total, merged.failed_rows, len(merged)) == (3, 2, 2)
+    assert [item.sheet_name for item in merged] == ["A", "B"]
+    assert {key: summary.occurrences for key, summary in merged.patterns.items()} == {
+        ("A", "amount", "bad"): 1,
+        ("B", "amount", "bad"): 1,
+        ("B", "name", "missing"): 1,
+    }
+
+
+def test_compile_mapping_plan_resolves_existing_sources_once() -> None:
+    columns = ("วันที่ใบกำกับ", "เลขที่ใบกำกับ", "ลูกค้า", "รายการ", "ยอดก่อนภาษี")
+    compile_mapping_plan.cache_clear()
+
+    plan = compile_mapping_plan(columns)
+    again = compile_mapping_plan(columns)
+
+    sources = {target.name: target.sources for target in plan.targets}
+    assert again is plan and compile_mapping_plan.cache_info().hits == 1
+    assert plan.layout == "finance_screening"
+    assert sources["business_key"] == ("เลขที่ใบกำกับ",)
+    assert sources["name"] == ("ลูกค้า",)
+    assert sources["amount"] == ("ยอดก่อนภาษี",)
+    assert sources["tax_value"] == ()
+    assert plan.missing_columns == []
+
+    frame = pd.DataFrame([["2026-01-05", "INV-1", " Ann ", "car", 100]], columns=list(columns))
+    mapped = plan.apply(frame)
+    assert mapped.loc[0, ["business_key", "name", "amount"]].tolist() == ["INV-1", "Ann", "100"]
+    assert mapped.loc[0, "tax_value"] is None
+
+
+def test_sharded_validation_matches_serial_output_byte_for_byte() -> None:
+    frame = pd.DataFrame(
+        [
+            {
+                "business_key": f"K-{i}" if i % 7 else "",
+                "name": f"Name {i}",
+                "amount": "x" if i % 11 == 0 else f"{i}.25",
+                "record_date": "2026-01-01" if i % 13 else "bad",
+                "invoice_no": f"INV-{i}" if i % 2 else None,
+                "org_type_branch_no": str(i % 5),
+            }
+            for i in range(250)
+        ],
+        index=range(1000, 1250),
+    )
+
+    serial_rows, serial_errors = validate_and_transform_rows(frame, ValidationErrors(max_details=40))
+    with ProcessPoolExecutor(max_workers=2) as executor:
+        sharded_rows, sharded_errors = validate_and_transform_rows_sharded(
+            frame, executor, shard_size=60, errors=ValidationErrors(max_details=40)
+        )
+
+    assert [pickle.dumps(row) for row in sharded_rows] == [pickle.dumps(row) for row in serial_rows]
+    assert [pickle.dumps(item) for item in sharded_errors] == [
+        pickle.dumps(item) for item in serial_errors
+    ]
+    assert (sharded_errors.total, sharded_errors.failed_rows) == (
+        serial_errors.total,
+        serial_errors.failed_rows,
+    )
+    assert sharded_errors.patterns == serial_errors.patterns
+
+
+def test_parse_cache_memoises_values_across_chunks_and_interns_strings() -> None:
+    def chunk(start: int) -> pd.DataFrame:
+        return pd.DataFrame(
+            [
+                {"business_key": f"K-{i}", "name": "Ann", "amount": "1,000", "record_date": "2026-01-05",
+                 "cancel_flag": "N"}
+                for i in range(start, start + 4)
+            ],
+            index=range(start, start + 4),
+        )
+    cache = ParseCache(max_entries=10)
+
+    first, _ = validate_and_transform_rows(chunk(0), cache=cache)
+    second, _ = validate_and_transform_rows(chunk(4), cache=cache)
+
+    assert first[0]["cancel_flag"] is second[3]["cancel_flag"]
+    assert [row["amount"] for row in second] == [Decimal("1000")] * 4
+    stats = cache.stats()
+    assert stats["date"] == {"cells": 8, "parsed": 1, "hit_rate": 0.875}
+    assert stats["decimal"] == {"cells": 8, "parsed": 1, "hit_rate": 0.875}
+    assert "int" not in stats
+
+
+def test_validated_batch_is_columnar_and_yields_writer_tuples() -> None:
+    frame = pd.DataFrame(
+        [
+            {"business_key": "A", "name": "Ann", "amount": "1", "record_date": "2026-01-01"},
+            {"business_key": "B", "name": "", "amount": "2", "record_date": "2026-01-01"},
+            {"business_key": "C", "name": "Cat", "amount": "3", "record_date": "2026-01-01"},
+        ]
+    )
+
+    batch, _ = validate_and_transform_rows(frame)
+    combined = ValidatedBatch.concat([batch, ValidatedBatch.from_rows([{"business_key": "D"}])])
+
+    assert isinstance(batch, ValidatedBatch) and len(batch) == 2
+    assert list(batch.tuples(["business_key", "amount"])) == [("A", Decimal("1")), ("C", Decimal("3"))]
+    assert batch.columns["record_date"][0] is batch.columns["record_date"][1]
+    assert [row["business_key"] for row in combined] == ["A", "C", "D"]
+    assert combined[2]["amount"] is None
+    assert [row["business_key"] for row in combined[1:]] == ["C", "D"]
+
+
+def _keyed_rows(*pairs: tuple[str, int]) -> ValidatedBatch:
+    return ValidatedBatch.from_rows(
+        [{"business_key": key, "amount": Decimal(amount), "row_number": amount + 1} for key, amount in pairs]
+    )
+
+
+def test_key_deduplicator_applies_each_policy_within_and_across_batches() -> None:
+    first = _keyed_rows(("A", 1), ("B", 2), ("A", 3))
+    second = _keyed_rows(("B", 4), ("C", 5))
+
+    last = KeyDeduplicator("last_wins")
+    fresh, rewrites = last.apply(first, ValidationErrors())
+    assert [(r["business_key"], r["amount"]) for r in fresh] == [("B", 2), ("A", 3)]
+    assert len(rewrites) == 0
+    fresh, rewrites = last.apply(second, ValidationErrors())
+    assert [r["business_key"] for r in fresh] == ["C"]
+    assert [(r["business_key"], r["amount"]) for r in rewrites] == [("B", 4)]
+    assert last.collapsed == 2
+
+    earliest = KeyDeduplicator("first_wins")
+    assert [r["amount"] for r in earliest.apply(first, ValidationErrors())[0]] == [1, 2]
+    fresh, rewrites = earliest.apply(second, ValidationErrors())
+    assert ([r["amount"] for r in fresh], len(rewrites)) == ([5], 0)
+    assert earliest.collapsed == 2
+
+    errors = ValidationErrors(sheet_name="North")
+    rejecting = KeyDeduplicator("reject")
+    rejecting.apply(first, errors)
+    rejecting.apply(second, errors)
+    assert rejecting.collapsed == 2
+    assert [(e.row_number, e.error_message) for e in errors] == [
+        (4, "business_key is duplicated: A (first seen in North row 2)"),
+        (5, "business_key is duplicated: B (first seen in North row 3)"),
+    ]
+    assert errors.patterns[("North", "business_key", "business_key is duplicated")].occurrences == 2
@@ -0,0 +1,237 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from pathlib import Path
+
+import pytest
+from sqlalchemy import func, select
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+
+from app.db.models import ImportError, ImportJob, SalesRecord
+from app.services.excel_service import ValidatedBatch, ValidationErrors
+from app.services import import_service
+from app.services.import_service import (
+    create_job,
+    expire_failed_job_sources,
+    fail_interrupted_jobs,
+    find_finished_job,
+    get_error_summaries,
+    get_import_errors_page,
+    iter_import_errors,
+    load_error_summaries,
+    partition_rows,
+    queue_job_resume,
+    save_error_summaries,
+    save_validation_errors,
+    upsert_sales_records,
+    upsert_sales_records_parallel,
+)
+
+
+def _row(business_key: str, amount: str = "10.00", **overrides) -> dict:
+    row = {
+        "business_key": business_key,
+        "name": f"Customer {business_key}",
+        "amount": Decimal(amount),
+        "record_date": date(2026, 1, 28),
+    }
+    row.update(overrides)
+    return row
+
+
+def test_upsert_sales_records_reports_inserted_and_updated(db: Session) -> None:
+    first = upsert_sales_records(db, [_row("A-001"), _row("A-002")])
+    assert (first.inserted, first.updated) == (2, 0)
+
+    second = upsert_sales_records(db, [_row("A-002", amount="99.50"), _row("A-003")])
+    assert (second.inserted, second.updated) == (1, 1)
+    assert second.total == 2
+
+    record = db.scalar(select(SalesRecord).where(SalesRecord.business_key == "A-002"))
+    assert record.amount == Decimal("99.50")
+    assert db.scalar(select(func.count()).select_from(SalesRecord)) == 3
+
+
+def test_upsert_sales_records_skips_rows_with_unchanged_content(db: Session) -> None:
+    upsert_sales_records(db, [_row("A-001"), _row("A-002")])
+    stamp = db.scalar(select(SalesRecord.updated_at).where(SalesRecord.business_key == "A-001"))
+
+    again = upsert_sales_records(
+        db, [_row("A-001", amount="10.0"), _row("A-002", name="Renamed"), _row("A-003")]
+    )
+
+    assert (again.inserted, again.updated, again.unchanged) == (1, 1, 1)
+    assert again.total == 3
+    db.expire_all()
+    unchanged = db.scalar(select(SalesRecord).where(SalesRecord.business_key == "A-001"))
+    assert unchanged.updated_at == stamp
+    assert unchanged.content_hash is not None
+    assert db.scalar(select(SalesRecord.name).where(SalesRecord.business_key == "A-002")) == "Renamed"
+
+
+def test_upsert_sales_records_collapses_duplicate_keys_last_wins(db: Session) -> None:
+    result = upsert_sales_records(
+        db, [_row("A-001", amount="1.00"), _row("A-001", amount="2.00")]
+    )
+
+    assert (result.inserted, result.updated) == (1, 0)
+    record = db.scalar(select(SalesRecord).where(SalesRecord.business_key == "A-001"))
+    assert record.amount == Decimal("2.00")
+
+
+def test_partition_rows_splits_keys_into_stable_disjoint_partitions() -> None:
+    rows = ValidatedBatch.from_rows([_row(f"A-{n:03}") for n in range(50)] + [_row("A-007")])
+
+    partitions = partition_rows(rows, 4)
+
+    keys = [list(partition.columns["business_key"]) for partition in partitions]
+    assert sum(len(partition) for partition in partitions) == 51
+    assert all(len(partition) for partition in partitions)
+    assert [k for k in keys if "A-007" in k][0].count("A-007") == 2
+    assert keys == [list(p.columns["business_key"]) for p in partition_rows(rows, 4)]
+
+
+def test_upsert_sales_records_parallel_combines_partition_results(db: Session) -> None:
+    upsert_sales_records(db, [_row("A-001"), _row("A-002")])
+    rows = ValidatedBatch.from_rows(
+        [_row(f"A-{n:03}") for n in range(1, 9)] + [_row("A-002", amount="5.00")]
+    )
+
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        result = upsert_sales_records_parallel(db.get_bind(), rows, 3, executor)
+
+    assert (result.inserted, result.updated, result.unchanged) == (6, 1, 1)
+    assert db.scalar(select(SalesRecord.amount).where(SalesRecord.business_key == "A-002")) == Decimal("5.00")
+    assert db.scalar(select(func.count()).select_from(SalesRecord)) == 8
+
+
+def test_upsert_sales_records_parallel_retries_deadlock_victims(
+    db: Session, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    upsert = import_service.upsert_sales_records
+    calls = []
+
+    def deadlock_once(*args, **kwargs):
+        calls.append(1)
+        if len(calls) == 1:
+            raise OperationalError(
+                "MERGE", {}, Exception("[40001] chosen as the deadlock victim. (1205)")
+            )
+        return upsert(*args, **kwargs)
+
+    monkeypatch.setattr(import_service, "upsert_sales_records", deadlock_once)
+    monkeypatch.setattr(import_service, "DEADLOCK_BACKOFF_SECONDS", 0)
+    rows = ValidatedBatch.from_rows([_row("A-001"), _row("A-002")])
+
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        result = upsert_sales_records_parallel(db.get_bind(), rows, 1, executor)
+
+    assert len(calls) == 2
+    assert result.inserted == 2
+    assert db.scalar(select(func.count()).select_from(SalesRecord)) == 2
+
+
+def _job_with_errors(db: Session, count: int) -> ImportJob:
+    job = create_job(db, filename="bad.xlsx", correlation_id="c-1")
+    errors = ValidationErrors()
+    for row_number in range(2, count + 2):
+        errors.add(row_number, "amount", f"amount is invalid: x{row_number}")
+    save_validation_errors(db, job.id, errors)
+    return job
+
+
+def test_get_import_errors_page_uses_keyset_cursor(db: Session) -> None:
+    job = _job_with_errors(db, 5)
+    other = _job_with_errors(db, 2)
+
+    first = get_import_errors_page(db, job.id, limit=3)
+    second = get_import_errors_page(db, job.id, after_id=first[-1].id, limit=3)
+
+    assert [error.row_number for error in first] == [2, 3, 4]
+    assert [error.row_number for error in second] == [5, 6]
+    assert all(error.job_id == job.id for error in first + second)
+    assert len(get_import_errors_page(db, other.id)) == 2
+
+
+def test_iter_import_errors_streams_rows_in_id_order(db: Session) -> None:
+    job = _job_with_errors(db, 4)
+
+    rows = list(iter_import_errors(db, job.id, batch_size=2))
+
+    assert [row[2] for row in rows] == [2, 3, 4, 5]
+    assert rows[0][1] is None
+    assert rows[0][3:] == ("amount", "amount is invalid: x2")
+
+
+def test_error_summaries_count_every_error_beyond_the_detail_cap(db: Session) -> None:
+    job = create_job(db, filename="bad.xlsx", correlation_id="c-1")
+    errors = ValidationErrors(max_details=2)
+    for row_number in range(2, 12):
+        errors.add(row_number, "amount", f"amount is invalid: x{row_number}", "amount is invalid")
+    errors.add(12, "name", "name is required")
+    save_validation_errors(db, job.id, errors, commit=False)
+    save_error_summaries(db, job.id, errors)
+    db.commit()
+
+    summaries = get_error_summaries(db, job.id)
+    resumed = ValidationErrors()
+    load_error_summaries(db, job.id, resumed)
+
+    assert db.scalar(select(func.count()).select_from(ImportError)) == 2
+    assert [(s.column_name, s.error_pattern, s.occurrences) for s in summaries] == [
+        ("amount", "amount is invalid", 10),
+        ("name", "name is required", 1),
+    ]
+    assert summaries[0].sample_rows == [2, 3, 4, 5, 6]
+    assert resumed.patterns == errors.patterns
+
+
+def test_find_finished_job_matches_content_hash_and_sheet_selection(db: Session) -> None:
+    done = create_job(db, "a.xlsx", "c-1", status="success", content_hash="h1")
+    create_job(db, "a.xlsx", "c-2", status="failed", content_hash="h1")
+    sheets = create_job(
+        db, "a.xlsx", "c-3", status="completed_with_errors", content_hash="h1", source_sheets=["*"]
+    )
+
+    assert find_finished_job(db, "h1").id == done.id
+    assert find_finished_job(db, "h1", ["*"]).id == sheets.id
+    assert find_finished_job(db, "h1", ["North"]) is None
+    assert find_finished_job(db, "h2") is None
+
+
+def test_queue_job_resume_moves_a_failed_job_to_queued_only_once(db: Session) -> None:
+    job = create_job(db, filename="feed.csv", correlation_id="c-1", status="failed")
+
+    assert queue_job_resume(db, job, "web-1") is job
+    assert (job.status, job.instance_id) == ("queued", "web-1")
+    assert queue_job_resume(db, job, "web-2") is None
+
+
+def test_fail_interrupted_jobs_only_fails_this_instances_jobs(db: Session) -> None:
+    own = create_job(db, filename="a.csv", correlation_id="c-1", status="running", instance_id="web-1")
+    other = create_job(db, filename="b.csv", correlation_id="c-2", status="queued", instance_id="web-2")
+
+    assert fail_interrupted_jobs(db, "web-1") == 1
+    db.refresh(own)
+    db.refresh(other)
+    assert (own.status, other.status) == ("failed", "queued")
+
+
+def test_expire_failed_job_sources_deletes_only_old_failed_uploads(
+    db: Session, tmp_path: Path
+) -> None:
+    paths = [tmp_path / f"{n}.csv" for n in range(3)]
+    for path in paths:
+        path.write_text("x", encoding="utf-8")
+    old = create_job(db, filename="a.csv", correlation_id="c-1", status="failed", source_path=str(paths[0]))
+    recent = create_job(db, filename="b.csv", correlation_id="c-2", status="failed", source_path=str(paths[1]))
+    queued = create_job(db, filename="c.csv", correlation_id="c-3", status="queued", source_path=str(paths[2]))
+    old.updated_at = queued.updated_at = datetime.utcnow() - timedelta(days=10)
+    db.commit()
+
+    assert expire_failed_job_sources(db, max_age_seconds=86400) == 1
+    for job in (old, recent, queued):
+        db.refresh(job)
+    assert (old.source_path, recent.source_path) == (None, str(paths[1]))
+    assert [path.exists() for path in paths] == [False, True, True]
@@ -0,0 +1,191 @@
+from io import BytesIO
+from pathlib import Path
+
+import pandas as pd
+import pytest
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session, sessionmaker
+
+from app.db.models import ImportError, ImportJob, SalesRecord
+from app.services.import_service import create_job
+from app.services import job_runner
+from app.services.job_runner import process_import, run_import_job
+
+
+def _workbook(rows: list[dict]) -> bytes:
+    buffer = BytesIO()
+    pd.DataFrame(rows).to_excel(buffer, index=False)
+    return buffer.getvalue()
+
+
+def test_process_import_runs_pipeline_and_finalizes_job(db: Session) -> None:
+    job = create_job(db, filename="sales.xlsx", correlation_id="c-1", status="queued")
+    payload = _workbook(
+        [
+            {"business_key": "A-001", "name": "Alice", "amount": "10", "record_date": "2026-01-01"},
+            {"business_key": "A-002", "name": "", "amount": "x", "record_date": "2026-01-01"},
+        ]
+    )
+
+    finished = process_import(db, job, BytesIO(payload))
+
+    assert finished.status == "completed_with_errors"
+    assert (finished.total_rows, finished.imported_rows, finished.failed_rows) == (2, 1, 1)
+    assert finished.error_count == 2
+    assert {"parse", "validate", "save_errors", "upsert", "commit"} <= set(finished.stats["stages"])
+    assert finished.stats["bytes"] == len(payload)
+    assert finished.stats["parse_cache"]["date"]["cells"] == 2
+    assert db.scalar(select(func.count()).select_from(SalesRecord)) == 1
+    assert db.scalar(select(func.count()).select_from(ImportError)) == 2
+
+
+def test_process_import_fails_job_on_missing_columns(db: Session) -> None:
+    job = create_job(db, filename="sales.xlsx", correlation_id="c-2", status="queued")
+
+    finished = process_import(db, job, BytesIO(_workbook([{"business_key": "A-001"}])))
+
+    assert finished.status == "failed"
+    assert finished.message == "Missing required columns: name, amount, record_date"
+
+
+def test_run_import_job_marks_unreadable_file_failed(
+    session_factory: sessionmaker[Session], tmp_path: Path
+) -> None:
+    path = tmp_path / "broken.xlsx"
+    with session_factory() as db:
+        job_id = create_job(
+            db, filename="broken.xlsx", correlation_id="c-3", status="queued", source_path=str(path)
+        ).id
+    path.write_bytes(b"not a workbook")
+
+    run_import_job(session_factory, job_id, path)
+
+    with session_factory() as db:
+        job = db.get(ImportJob, job_id)
+        assert job.status == "failed"
+        assert job.message.startswith("Failed to parse excel file")
+    assert not path.exists()
+
+
+def test_run_import_job_imports_tsv_upload(
+    session_factory: sessionmaker[Session], tmp_path: Path
+) -> None:
+    with session_factory() as db:
+        job_id = create_job(db, filename="feed.tsv", correlation_id="c-4", status="queued").id
+    path = tmp_path / "upload.tsv"
+    path.write_text(
+        "business_key\tname\tamount\trecord_date\nA-001\tAlice\t10\t2026-01-01\n",
+        encoding="utf-8",
+    )
+
+    run_import_job(session_factory, job_id, path)
+
+    with session_factory() as db:
+        job = db.get(ImportJob, job_id)
+        assert (job.status, job.imported_rows) == ("success", 1)
+        assert db.scalar(select(SalesRecord.name)) == "Alice"
+
+
+def test_repeated_key_across_chunks_counts_as_duplicate_and_last_row_wins(
+    session_factory: sessionmaker[Session], tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(job_runner.settings, "excel_chunk_size", 2)
+    path = tmp_path / "upload.csv"
+    path.write_text(
+        "business_key,name,amount,record_date\n"
+        "K,First,1,2026-01-01\n"
+        "B,Other,2,2026-01-01\n"
+        "K,Second,3,2026-01-01\n"
+        "K,Third,4,2026-01-01\n",
+        encoding="utf-8",
+    )
+    with session_factory() as db:
+        job_id = create_job(db, filename="feed.csv", correlation_id="c-7", status="queued").id
+
+    run_import_job(session_factory, job_id, path)
+
+    with session_factory() as db:
+        job = db.get(ImportJob, job_id)
+        assert job.status == "success"
+        assert (job.imported_rows, job.inserted_rows, job.updated_rows) == (2, 2, 0)
+        assert job.duplicate_rows == 2
+        assert db.scalar(select(SalesRecord.name).where(SalesRecord.business_key == "K")) == "Third"
+
+
+def test_run_import_job_imports_selected_sheets_in_one_upsert(
+    session_factory: sessionmaker[Session], tmp_path: Path
+) -> None:
+    with session_factory() as db:
+        job_id = create_job(db, filename="monthly.xlsx", correlation_id="c-5", status="queued").id
+    path = tmp_path / "upload.xlsx"
+    with pd.ExcelWriter(path) as writer:
+        for branch, amount in (("North", "10"), ("South", "bad"), ("East", "30")):
+            pd.DataFrame(
+                [
+                    {"business_key": f"{branch}-1", "name": branch, "amount": amount,
+                     "record_date": "2026-03-01"},
+                    {"business_key": "SHARED", "name": branch, "amount": "1",
+                     "record_date": "2026-03-01"},
+                ]
+            ).to_excel(writer, sheet_name=branch, index=False)
+
+    run_import_job(session_factory, job_id, path, sheets=["North", "South"])
+
+    with session_factory() as db:
+        job = db.get(ImportJob, job_id)
+        assert job.status == "completed_with_errors"
+        assert (job.total_rows, job.imported_rows, job.failed_rows) == (4, 2, 1)
+        assert job.duplicate_rows == 1
+        assert job.stats["sheets"] == {"North": 2, "South": 2}
+        error = db.scalars(select(ImportError)).one()
+        assert (error.sheet_name, error.row_number, error.column_name) == ("South", 2, "amount")
+        assert db.scalar(select(SalesRecord.name).where(SalesRecord.business_key == "SHARED")) == "South"
+
+
+def test_failed_job_resumes_from_its_checkpoint(
+    session_factory: sessionmaker[Session], tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(job_runner.settings, "excel_chunk_size", 3)
+    monkeypatch.setattr(job_runner.settings, "commit_batch_size", 1)
+    path = tmp_path / "upload.csv"
+    path.write_text(
+        "business_key,name,amount,record_date\n"
+        + "".join(f"A-00{n},Row {n},{'x' if n == 4 else n},2026-01-01\n" for n in range(1, 7)),
+        encoding="utf-8",
+    )
+    with session_factory() as db:
+        job_id = create_job(
+            db, filename="feed.csv", correlation_id="c-6", status="queued", source_path=str(path)
+        ).id
+
+    upsert = job_runner.upsert_sales_records
+
+    def failing_upsert(db, rows, **kwargs):
+        if any(row["business_key"] == "A-006" for row in rows):
+            raise RuntimeError("deadlock")
+        return upsert(db, rows, **kwargs)
+
+    monkeypatch.setattr(job_runner, "upsert_sales_records", failing_upsert)
+    run_import_job(session_factory, job_id, path)
+
+    with session_factory() as db:
+        job = db.get(ImportJob, job_id)
+        assert job.status == "failed"
+        assert (job.checkpoint_row, job.total_rows, job.inserted_rows) == (4, 3, 3)
+        # A-005 was committed in its own batch, ahead of the chunk's checkpoint.
+        assert db.scalar(select(func.count()).select_from(SalesRecord)) == 4
+    assert path.exists()
+
+    monkeypatch.setattr(job_runner, "upsert_sales_records", upsert)
+    run_import_job(session_factory, job_id, path)
+
+    with session_factory() as db:
+        job = db.get(ImportJob, job_id)
+        assert job.status == "completed_with_errors"
+        assert (job.total_rows, job.failed_rows, job.error_count) == (6, 1, 1)
+        assert (job.inserted_rows, job.unchanged_rows, job.imported_rows) == (4, 1, 5)
+        assert (job.checkpoint_row, job.source_path) == (7, None)
+        error = db.scalars(select(ImportError)).one()
+        assert (error.row_number, error.column_name) == (5, "amount")
+        assert db.scalar(select(func.count()).select_from(SalesRecord)) == 5
+    assert not path.exists()
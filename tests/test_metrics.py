@@ -0,0 +1,49 @@
+from app.core.metrics import IMPORT_STAGE_SECONDS, Counter, Histogram, StageTimings
+
+
+def test_histogram_renders_cumulative_prometheus_buckets() -> None:
+    histogram = Histogram("stage_seconds", "Stage latency.", (0.1, 1.0))
+    histogram.observe(0.05, stage="parse")
+    histogram.observe(0.5, stage="parse")
+    histogram.observe(5, stage="parse")
+
+    lines = list(histogram.render())
+
+    assert lines[:2] == ["# HELP stage_seconds Stage latency.", "# TYPE stage_seconds histogram"]
+    assert 'stage_seconds_bucket{stage="parse",le="0.1"} 1' in lines
+    assert 'stage_seconds_bucket{stage="parse",le="1"} 2' in lines
+    assert 'stage_seconds_bucket{stage="parse",le="+Inf"} 3' in lines
+    assert 'stage_seconds_sum{stage="parse"} 5.55' in lines
+    assert 'stage_seconds_count{stage="parse"} 3' in lines
+    assert histogram.totals(stage="parse") == (3, 5.55)
+    assert histogram.totals(stage="write") == (0, 0.0)
+
+
+def test_counter_and_stage_timings_accumulate() -> None:
+    counter = Counter("jobs_total", "Jobs.")
+    counter.inc(status="success")
+    counter.inc(status="success")
+    assert 'jobs_total{status="success"} 2' in list(counter.render())
+    assert (counter.value(status="success"), counter.value(status="failed")) == (2, 0)
+
+    timings = StageTimings({"upload_read": 0.5})
+    with timings.stage("validate"):
+        pass
+    with timings.stage("validate"):
+        pass
+    assert set(timings.as_dict()) == {"upload_read", "validate"}
+    assert timings.total >= 0.5
+
+
+def test_stage_timings_observe_only_durations_not_yet_reported() -> None:
+    resumed = StageTimings({"resume_test_parse": 2.0, "resume_test_write": 1.0}, reported=True)
+    with resumed.stage("resume_test_parse"):
+        pass
+
+    resumed.observe()
+    resumed.observe()
+
+    count, total = IMPORT_STAGE_SECONDS.totals(stage="resume_test_parse")
+    assert count == 1 and total < 1.0
+    assert IMPORT_STAGE_SECONDS.totals(stage="resume_test_write") == (0, 0.0)
+    assert resumed.as_dict()["resume_test_parse"] >= 2.0
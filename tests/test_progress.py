@@ -0,0 +1,27 @@
+import asyncio
+import threading
+
+from app.services.progress import ProgressBroker, ProgressEvent
+
+
+def test_progress_broker_delivers_events_published_from_worker_threads() -> None:
+    broker = ProgressBroker()
+
+    async def scenario() -> list[ProgressEvent]:
+        subscription = broker.subscribe(7)
+        events = [
+            ProgressEvent(job_id=7, status="running", stage="writing", rows_written=10),
+            ProgressEvent(job_id=7, status="success", stage="finished", rows_written=20),
+        ]
+        worker = threading.Thread(target=lambda: [broker.publish(event) for event in events])
+        worker.start()
+        received = [await subscription.get(), await subscription.get()]
+        worker.join()
+        subscription.close()
+        return received
+
+    received = asyncio.run(scenario())
+
+    assert [event.rows_written for event in received] == [10, 20]
+    assert received[-1].done
+    assert broker.latest(7) is None
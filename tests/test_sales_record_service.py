@@ -0,0 +1,118 @@
+from datetime import date
+from decimal import Decimal
+
+import pytest
+from sqlalchemy.orm import Session
+
+from app.services.import_service import upsert_sales_records
+from app.db.models import SalesRecord
+from app.services.sales_record_service import (
+    DEFAULT_FIELDS,
+    KEYSET_FIELDS,
+    ResultCache,
+    SalesRecordFilter,
+    list_sales_records,
+    resolve_fields,
+)
+
+
+def _row(business_key: str, day: int, **overrides) -> dict:
+    row = {
+        "business_key": business_key,
+        "name": f"Customer {business_key}",
+        "amount": Decimal("10.00"),
+        "record_date": date(2026, 1, day),
+    }
+    row.update(overrides)
+    return row
+
+
+def test_list_sales_records_pages_by_record_date_then_id(db: Session) -> None:
+    upsert_sales_records(
+        db,
+        [
+            _row("A-001", 3, group_id="g1"),
+            _row("A-002", 1, group_id="g1"),
+            _row("A-003", 3, group_id="g1"),
+            _row("A-004", 2, group_id="g2"),
+            _row("A-005", 1, group_id="g1"),
+        ],
+    )
+    filters = SalesRecordFilter(group_id="g1")
+    fields = resolve_fields(["business_key"])
+
+    first = list_sales_records(db, filters, fields, limit=2)
+    last = first[-1]
+    after = (last["record_date"], last["id"])
+    second = list_sales_records(db, filters, fields, limit=2, after=after)
+
+    assert [row["business_key"] for row in first + second] == ["A-002", "A-005", "A-001", "A-003"]
+    assert set(first[0]) == {"id", "record_date", "business_key"}
+
+
+def test_list_sales_records_filters_on_date_range_vin_and_invoice(db: Session) -> None:
+    upsert_sales_records(
+        db,
+        [
+            _row("A-001", 1, vin_no="V1", invoice_no="INV-1"),
+            _row("A-002", 5, vin_no="V1", invoice_no="INV-2"),
+            _row("A-003", 9, vin_no="V2", invoice_no="INV-2"),
+        ],
+    )
+    fields = resolve_fields(None)
+
+    dated = SalesRecordFilter(record_date_from=date(2026, 1, 2), record_date_to=date(2026, 1, 9))
+    by_vin = SalesRecordFilter(vin_no="V1", invoice_no="INV-2")
+
+    assert [row["business_key"] for row in list_sales_records(db, dated, fields, 10)] == [
+        "A-002",
+        "A-003",
+    ]
+    assert [row["business_key"] for row in list_sales_records(db, by_vin, fields, 10)] == ["A-002"]
+    assert "content_hash" not in fields
+
+
+def test_resolve_fields_keeps_keyset_columns_and_rejects_unknown_names() -> None:
+    assert resolve_fields(["amount", "id", "amount"]) == [*KEYSET_FIELDS, "amount"]
+    with pytest.raises(ValueError, match="content_hash"):
+        resolve_fields(["content_hash"])
+
+
+def test_listing_indexes_cover_the_default_fields() -> None:
+    assert resolve_fields(None) == DEFAULT_FIELDS
+    assert DEFAULT_FIELDS[:2] == KEYSET_FIELDS
+    for index in SalesRecord.__table__.indexes:
+        if index.name.startswith("IX_sales_records_"):
+            covered = {column.name for column in index.columns}
+            covered |= set(index.dialect_options["mssql"]["include"])
+            assert covered == set(DEFAULT_FIELDS), index.name
+
+
+def test_result_cache_expires_evicts_and_clears(monkeypatch: pytest.MonkeyPatch) -> None:
+    now = [100.0]
+    monkeypatch.setattr("app.services.sales_record_service.time.monotonic", lambda: now[0])
+    cache = ResultCache(ttl_seconds=5, max_entries=2)
+
+    cache.put("a", 1, cache.generation)
+    cache.put("b", 2, cache.generation)
+    cache.put("c", 3, cache.generation)
+    assert (cache.get("a"), cache.get("b")) == (None, 2)
+
+    now[0] += 5
+    assert cache.get("b") is None
+
+    cache.put("d", 4, cache.generation)
+    cache.clear()
+    assert cache.get("d") is None
+
+
+def test_result_cache_skips_results_read_before_a_clear() -> None:
+    cache = ResultCache(ttl_seconds=5)
+
+    generation = cache.generation
+    cache.clear()
+    cache.put("stale", 1, generation)
+    assert cache.get("stale") is None
+
+    cache.put("fresh", 2, cache.generation)
+    assert cache.get("fresh") == 2
@@ -0,0 +1,99 @@
+import hashlib
+from io import BytesIO
+from pathlib import Path
+
+import pytest
+
+from app.services.upload_service import (
+    UploadChunkWriter,
+    UploadSessionError,
+    UploadTooLargeError,
+    assemble_upload,
+    claim_upload_completion,
+    create_upload_session,
+    finish_upload_session,
+    load_upload_session,
+    purge_upload_sessions,
+    release_upload_completion,
+    spool_upload,
+    write_upload_chunk,
+)
+
+
+def test_spool_upload_copies_in_chunks(tmp_path: Path) -> None:
+    path, size, digest = spool_upload(
+        BytesIO(b"x" * 10), tmp_path, ".xlsx", max_bytes=10, chunk_size=3
+    )
+
+    assert size == 10
+    assert digest == hashlib.sha256(b"x" * 10).hexdigest()
+    assert path.parent == tmp_path and path.suffix == ".xlsx"
+    assert path.read_bytes() == b"x" * 10
+
+
+def test_spool_upload_rejects_oversized_stream_and_cleans_up(tmp_path: Path) -> None:
+    with pytest.raises(UploadTooLargeError):
+        spool_upload(BytesIO(b"x" * 11), tmp_path, ".xlsx", max_bytes=10, chunk_size=4)
+
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_upload_session_assembles_chunks_received_in_any_order(tmp_path: Path) -> None:
+    payload = b"0123456789abcdefghij!"
+    session = create_upload_session(tmp_path / "sessions", "feed.csv", len(payload), 8, ["*"])
+
+    for index in (2, 0):
+        write_upload_chunk(session, index, payload[index * 8 : index * 8 + 8])
+    with pytest.raises(UploadSessionError, match="must be 8 bytes"):
+        write_upload_chunk(session, 1, b"short")
+    with pytest.raises(UploadSessionError, match="Missing 1 of 3 chunks: 1"):
+        assemble_upload(session, tmp_path, ".csv", max_bytes=100)
+    write_upload_chunk(session, 1, payload[8:16])
+
+    loaded = load_upload_session(tmp_path / "sessions", session.upload_id)
+    path, size, digest = assemble_upload(loaded, tmp_path, ".csv", max_bytes=100, chunk_size=5)
+
+    assert (loaded.total_chunks, loaded.received(), loaded.sheets) == (3, [0, 1, 2], ["*"])
+    assert (path.read_bytes(), size) == (payload, len(payload))
+    assert digest == hashlib.sha256(payload).hexdigest()
+
+    finish_upload_session(loaded, job_id=7)
+    again = load_upload_session(tmp_path / "sessions", session.upload_id)
+    assert (again.job_id, again.received()) == (7, [])
+    assert load_upload_session(tmp_path / "sessions", "../" + session.upload_id) is None
+
+
+def test_upload_chunk_writer_stops_at_the_expected_size(tmp_path: Path) -> None:
+    session = create_upload_session(tmp_path, "a.csv", 10, 4)
+
+    writer = UploadChunkWriter(session, 2)
+    writer.write(b"x")
+    with pytest.raises(UploadSessionError, match="must be 2 bytes, got more"):
+        writer.write(b"yz")
+    writer.discard()
+
+    writer = UploadChunkWriter(session, 0)
+    writer.write(b"ab")
+    writer.write(b"cd")
+    writer.commit()
+    assert session.received() == [0]
+    assert sorted(path.name for path in session.directory.iterdir()) == ["000000.part", "session.json"]
+
+
+def test_upload_completion_can_only_be_claimed_once_until_released(tmp_path: Path) -> None:
+    session = create_upload_session(tmp_path, "a.csv", 10, 4)
+    again = load_upload_session(tmp_path, session.upload_id)
+
+    assert claim_upload_completion(session) is True
+    assert claim_upload_completion(again) is False
+    release_upload_completion(session)
+    assert claim_upload_completion(again) is True
+    assert again.received() == []
+
+
+def test_purge_upload_sessions_removes_only_idle_sessions(tmp_path: Path) -> None:
+    create_upload_session(tmp_path, "a.csv", 10, 4)
+
+    assert purge_upload_sessions(tmp_path, max_age_seconds=3600) == 0
+    assert purge_upload_sessions(tmp_path, max_age_seconds=-1) == 1
+    assert list(tmp_path.iterdir()) == []